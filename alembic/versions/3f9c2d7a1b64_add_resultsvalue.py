@@ -0,0 +1,99 @@
+"""Add _resultsvalue, flattened values of _results._result
+
+Revision ID: 3f9c2d7a1b64
+Revises: 0ce451affd40
+Create Date: 2026-10-18 10:12:41.207316
+
+"""
+from json import loads as jloads
+from math import isfinite
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2d7a1b64'
+down_revision = '0ce451affd40'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+PATH_SEPARATOR = "\x1f"
+
+
+def _as_number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    return number if isfinite(number) else None
+
+
+def _flatten(result):
+    """
+    Same walk as ResultsValue.flatten, copied so this migration doesn't change with the models.
+    """
+    position = 0
+
+    def _walk(data, path):
+        nonlocal position
+        for key, value in data.items():
+            if isinstance(value, dict):
+                yield from _walk(value, path + [str(key)])
+                continue
+            yield dict(path=PATH_SEPARATOR.join(path), depth=len(path), key=str(key), position=position,
+                       number=_as_number(value), value=value)
+            position += 1
+
+    if isinstance(result, dict):
+        yield from _walk(result, [])
+
+
+def upgrade() -> None:
+    resultsvalue = op.create_table('_resultsvalue',
+        sa.Column('id', sa.INTEGER(), autoincrement=True, nullable=False),
+        sa.Column('results_id', sa.INTEGER(), nullable=False),
+        sa.Column('path', sa.String(length=255), nullable=False),
+        sa.Column('depth', sa.INTEGER(), nullable=False),
+        sa.Column('key', sa.String(length=128), nullable=False),
+        sa.Column('position', sa.INTEGER(), nullable=False),
+        sa.Column('number', sa.FLOAT(), nullable=True),
+        sa.Column('value', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['results_id'], ['_results.id'], name='fk_RV_results_id', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_resultsvalue_results_path', '_resultsvalue', ['results_id', 'path'], unique=False)
+    op.create_index('ix_resultsvalue_key_number', '_resultsvalue', ['key', 'number'], unique=False)
+    # NOTE: Backfill from the existing payloads, a batch of results at a time.
+    connection = op.get_bind()
+    results = sa.table('_results', sa.column('id', sa.INTEGER()), sa.column('_result', sa.JSON()))
+    last_id = 0
+    while True:
+        batch = connection.execute(
+            sa.select(results.c.id, results.c._result)
+            .where(results.c.id > last_id)
+            .order_by(results.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not batch:
+            break
+        rows = []
+        for results_id, result in batch:
+            if isinstance(result, str):
+                try:
+                    result = jloads(result)
+                except ValueError:
+                    continue
+            rows.extend(dict(results_id=results_id, **row) for row in _flatten(result))
+        if rows:
+            op.bulk_insert(resultsvalue, rows)
+        last_id = batch[-1][0]
+
+
+def downgrade() -> None:
+    op.drop_index('ix_resultsvalue_key_number', table_name='_resultsvalue')
+    op.drop_index('ix_resultsvalue_results_path', table_name='_resultsvalue')
+    op.drop_table('_resultsvalue')
@@ -0,0 +1,31 @@
+"""Add version_id to records edited by several users at once
+
+Revision ID: 5d8a1e6c3b27
+Revises: 7b2e4c9d1f35
+Create Date: 2026-10-18 16:02:41.208377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d8a1e6c3b27'
+down_revision = '7b2e4c9d1f35'
+branch_labels = None
+depends_on = None
+
+TABLES = ('_clientsubmission', '_run', '_procedure', '_reagentlot')
+
+
+def upgrade() -> None:
+    # NOTE: Existing rows start at version 1, same as new ones.
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('version_id', sa.INTEGER(), nullable=False, server_default=sa.text('1')))
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('version_id')
@@ -0,0 +1,29 @@
+"""Add _idsequence, counters for plate numbers and association ids
+
+Revision ID: 7b2e4c9d1f35
+Revises: 3f9c2d7a1b64
+Create Date: 2026-10-18 14:36:08.512904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2e4c9d1f35'
+down_revision = '3f9c2d7a1b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # NOTE: Counters start lazily from the existing data the first time each one is used.
+    op.create_table('_idsequence',
+        sa.Column('name', sa.String(length=128), nullable=False),
+        sa.Column('value', sa.INTEGER(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('_idsequence')
@@ -0,0 +1,46 @@
+"""Add _importledger, hashes of imported files and the records they became
+
+Revision ID: 9c4f7e2a6d18
+Revises: 5d8a1e6c3b27
+Create Date: 2026-10-19 09:12:37.640215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4f7e2a6d18'
+down_revision = '5d8a1e6c3b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # NOTE: Starts empty; files imported before this are not recognised when dropped in again.
+    op.create_table('_importledger',
+        sa.Column('id', sa.INTEGER(), nullable=False),
+        sa.Column('digest', sa.String(length=64), nullable=False),
+        sa.Column('kind', sa.String(length=64), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=True),
+        sa.Column('size', sa.INTEGER(), nullable=True),
+        sa.Column('clientsubmission_id', sa.INTEGER(), nullable=True),
+        sa.Column('procedure_id', sa.INTEGER(), nullable=True),
+        sa.Column('results', sa.JSON(), nullable=True),
+        sa.Column('user', sa.String(length=64), nullable=True),
+        sa.Column('imported', sa.TIMESTAMP(), nullable=True),
+        sa.ForeignKeyConstraint(['clientsubmission_id'], ['_clientsubmission.id'], name='fk_IL_clientsubmission_id',
+                                ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['procedure_id'], ['_procedure.id'], name='fk_IL_procedure_id', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix__importledger_digest', '_importledger', ['digest'], unique=False)
+    op.create_index('ix__importledger_clientsubmission_id', '_importledger', ['clientsubmission_id'], unique=False)
+    op.create_index('ix__importledger_procedure_id', '_importledger', ['procedure_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix__importledger_procedure_id', table_name='_importledger')
+    op.drop_index('ix__importledger_clientsubmission_id', table_name='_importledger')
+    op.drop_index('ix__importledger_digest', table_name='_importledger')
+    op.drop_table('_importledger')
@@ -0,0 +1,251 @@
+"""
+Pytest harness for the performance benchmarks.
+
+Run with ``python -m pytest benchmarks`` from the repository root; the normal test
+run (``testpaths = tests`` in pytest.ini) never collects these.
+
+How the harness works
+---------------------
+* Databases are generated with ``scripts/make_dummy_db.py``'s seed functions -- the
+  same generator behind the ``graph`` fixture in ``tests/`` -- at the scales named in
+  ``BENCH_SCALES`` (comma separated, default ``1k``; ``10k`` and ``100k`` are also
+  defined). Each one is written once to ``benchmarks/.cache`` and reused until the
+  models change, because seeding the larger scales takes a long time.
+* The generated file is opened the way the app opens its database: a write engine
+  and session, plus the query-only read engine and session the reports use.
+* ``measure`` runs a callable once to warm Python-level caches, then ``BENCH_ROUNDS``
+  (default 3) times against a fresh session and an empty report cache, recording the
+  best wall time and the most SQL statements any round issued.
+* Each measurement is checked against ``benchmarks/baseline.json``. More SQL than the
+  baseline (beyond ``BENCH_SQL_TOLERANCE``, default 10%) always fails. Wall time is
+  only compared (with ``BENCH_TIME_TOLERANCE``, default 50%) when the baseline was
+  recorded on the same machine, since timings don't travel.
+* ``BENCH_UPDATE_BASELINE=1`` writes this run's numbers into the baseline instead of
+  checking them. The latest results always land in ``benchmarks/.cache/results.json``.
+"""
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import json
+import os
+import platform
+import sys
+from pathlib import Path
+from random import Random
+from time import perf_counter
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SRC = REPO_ROOT / "src" / "submissions"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+CACHE = Path(__file__).resolve().parent / ".cache"
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+# NOTE: Submissions to generate per scale; the generator averages ~18 samples a submission.
+SCALES = {"1k": 55, "10k": 545, "100k": 5450}
+SEED = 20260818
+
+
+def _load_generator():
+    """Import ``scripts/make_dummy_db.py`` as a module without running its CLI."""
+    path = REPO_ROOT / "scripts" / "make_dummy_db.py"
+    spec = importlib.util.spec_from_file_location("_make_dummy_db", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+generator = _load_generator()
+# NOTE: tools.ctx is built at import time and needs a config to read.
+generator.ensure_minimal_config()
+
+
+def _machine() -> str:
+    return f"{platform.node()}|{platform.machine()}|{platform.processor()}|{platform.python_version()}"
+
+
+def _schema_key() -> str:
+    """Short hash of the mapped schema, so a model change regenerates the cached databases."""
+    from backend.db.models import Base
+
+    digest = hashlib.sha1()
+    for table in sorted(Base.metadata.tables.values(), key=lambda t: t.name):
+        digest.update(table.name.encode())
+        for column in table.columns:
+            digest.update(f"{column.name}:{column.type}".encode())
+    return digest.hexdigest()[:10]
+
+
+def _generate(target: Path, submissions: int) -> None:
+    """Seed a fresh database file the same way ``make_dummy_db.main`` does."""
+    from sqlalchemy import text
+
+    generator.make_lot_fk_resolvable()
+    engine, session = generator.build_schema(target, enforce_fks=True)
+    rng = Random(SEED)
+    try:
+        generator.seed_config_items(session)
+        labs, contacts = generator.seed_organizations(session, rng)
+        reagent_roles, reagents, reagent_lots = generator.seed_reagents(session, rng)
+        (equipment_roles, equipment, processes,
+         processversions, tips, tipslots) = generator.seed_equipment(session, rng)
+        (submissiontypes, proceduretypes, resultstypes,
+         submissiontype_specs) = generator.seed_types(session, reagent_roles, equipment_roles)
+        generator.seed_discounts(session, labs, proceduretypes)
+        generator.seed_submissions(session, rng, labs, contacts, submissiontypes,
+                                   submissiontype_specs, proceduretypes, reagent_roles,
+                                   reagent_lots, equipment_roles, equipment, processversions,
+                                   tipslots, resultstypes, submissions)
+    finally:
+        session.commit()
+    # NOTE: Fold the WAL back in so the cached file is self-contained.
+    session.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+    session.commit()
+    session.remove()
+    engine.dispose()
+
+
+def _scales() -> list[str]:
+    requested = [item.strip() for item in os.environ.get("BENCH_SCALES", "1k").split(",") if item.strip()]
+    unknown = set(requested) - set(SCALES)
+    if unknown:
+        raise pytest.UsageError(f"Unknown BENCH_SCALES {sorted(unknown)}, choose from {list(SCALES)}")
+    return requested
+
+
+@pytest.fixture(scope="session", params=_scales())
+def bench_db(request):
+    """
+    Point ``ctx.database`` at a generated database of the requested scale.
+
+    Yields a dict with the scale name, the write session and the engine.
+    """
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import scoped_session, sessionmaker
+
+    import tools
+    import backend.db  # noqa: F401 -- registers the connect listener (pragmas)
+
+    scale = request.param
+    CACHE.mkdir(exist_ok=True)
+    target = CACHE / f"{scale}-{SEED}-{_schema_key()}.db"
+    if not target.exists():
+        partial = target.with_suffix(".partial")
+        partial.unlink(missing_ok=True)
+        _generate(partial, SCALES[scale])
+        partial.replace(target)
+
+    previous = {key: tools.ctx.database.get(key) for key in
+                ("engine", "session", "read_engine", "read_session", "schema", "path", "name")}
+    engine = create_engine(f"sqlite:///{target}")
+    read_engine = create_engine(f"sqlite:///{target}")
+    event.listen(read_engine, "connect", tools.set_sqlite_query_only)
+    session = scoped_session(sessionmaker(bind=engine))
+    tools.ctx.database.update(engine=engine, session=session, read_engine=read_engine,
+                              read_session=scoped_session(sessionmaker(bind=read_engine, autoflush=False)),
+                              schema="sqlite", path=str(target.parent), name=target.stem)
+    try:
+        yield dict(scale=scale, session=session, engine=engine, read_engine=read_engine)
+    finally:
+        tools.ctx.database.read_session.remove()
+        session.remove()
+        read_engine.dispose()
+        engine.dispose()
+        tools.ctx.database.update(previous)
+
+
+class _Recorder(object):
+    """Collects measurements for the whole run and checks them against the baseline."""
+
+    def __init__(self):
+        self.machine = _machine()
+        self.results = {}
+        try:
+            self.baseline = json.loads(BASELINE.read_text())
+        except FileNotFoundError:
+            self.baseline = {}
+        self.update = os.environ.get("BENCH_UPDATE_BASELINE", "") not in ("", "0")
+        self.sql_tolerance = float(os.environ.get("BENCH_SQL_TOLERANCE", 0.10))
+        self.time_tolerance = float(os.environ.get("BENCH_TIME_TOLERANCE", 0.50))
+
+    def record(self, key: str, seconds: float, statements: int) -> list[str]:
+        self.results[key] = dict(seconds=round(seconds, 4), statements=statements, machine=self.machine)
+        if self.update:
+            return []
+        baseline = self.baseline.get(key)
+        if baseline is None:
+            return []
+        failures = []
+        allowed = baseline["statements"] * (1 + self.sql_tolerance)
+        if statements > allowed:
+            failures.append(f"{key}: {statements} SQL statements, baseline {baseline['statements']}")
+        if baseline.get("machine") == self.machine:
+            allowed = baseline["seconds"] * (1 + self.time_tolerance)
+            if seconds > allowed:
+                failures.append(f"{key}: {seconds:.3f}s, baseline {baseline['seconds']:.3f}s")
+        return failures
+
+    def write(self):
+        CACHE.mkdir(exist_ok=True)
+        CACHE.joinpath("results.json").write_text(json.dumps(self.results, indent=2, sort_keys=True))
+        if self.update and self.results:
+            self.baseline.update(self.results)
+            BASELINE.write_text(json.dumps(self.baseline, indent=2, sort_keys=True) + "\n")
+
+
+@pytest.fixture(scope="session")
+def recorder():
+    recorder = _Recorder()
+    yield recorder
+    recorder.write()
+
+
+@pytest.fixture()
+def measure(bench_db, recorder, request):
+    """
+    Return ``measure(fn, name=None)``: time ``fn`` and count its SQL, then check the baseline.
+
+    The baseline key is ``<scale>::<test name>`` unless a name is given.
+    """
+    from sqlalchemy import event
+
+    import tools
+    from backend.excel.reports import report_cache
+
+    rounds = int(os.environ.get("BENCH_ROUNDS", 3))
+    engines = {bench_db["engine"], bench_db["read_engine"]}
+
+    def _measure(fn, name: str | None = None):
+        key = f"{bench_db['scale']}::{name or request.node.originalname}"
+        statements = []
+
+        def _count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        fn()
+        best, most = None, 0
+        for _ in range(rounds):
+            tools.ctx.database.session.remove()
+            tools.ctx.database.read_session.remove()
+            report_cache.clear()
+            statements.clear()
+            for engine in engines:
+                event.listen(engine, "before_cursor_execute", _count)
+            try:
+                start = perf_counter()
+                fn()
+                elapsed = perf_counter() - start
+            finally:
+                for engine in engines:
+                    event.remove(engine, "before_cursor_execute", _count)
+            best = elapsed if best is None else min(best, elapsed)
+            most = max(most, len(statements))
+        failures = recorder.record(key, best, most)
+        assert not failures, "performance regression:\n" + "\n".join(failures)
+        return best, most
+
+    return _measure
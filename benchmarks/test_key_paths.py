@@ -0,0 +1,112 @@
+"""
+Timings and SQL counts for the paths users wait on.
+
+Each test picks its inputs from the generated database, then hands ``measure`` a
+callable that does the work exactly the way the app does. Paths that go through
+``backend.managers`` or ``frontend.widgets`` need the full Qt stack (WebEngine
+included) and skip where it can't be imported.
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+from io import BytesIO
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def span(bench_db):
+    """The whole date range the generated submissions occupy."""
+    from sqlalchemy import func
+    from backend.db.models import ClientSubmission
+
+    first, last = bench_db["session"].query(func.min(ClientSubmission.submitted_date),
+                                            func.max(ClientSubmission.submitted_date)).one()
+    return first.date() - timedelta(days=1), last.date() + timedelta(days=30)
+
+
+@pytest.fixture(scope="module")
+def managers():
+    return pytest.importorskip("backend.managers", exc_type=ImportError)
+
+
+def _first_run_id(session):
+    from backend.db.models import Run
+
+    return session.query(Run.id).order_by(Run.id).limit(1).scalar()
+
+
+def test_import_submission_workbook(bench_db, measure, managers, tmp_path):
+    from openpyxl.workbook import Workbook
+    from backend.db.models import ClientSubmission
+
+    submission = bench_db["session"].query(ClientSubmission).order_by(ClientSubmission.id).first()
+    workbook = managers.DefaultClientSubmissionManager(parent=None, input_object=submission).write(Workbook())
+    # NOTE: Lets the namer read the type from the file properties rather than asking.
+    workbook.properties.category = submission.submissiontype.name
+    path = tmp_path.joinpath("synthetic.xlsx")
+    workbook.save(path)
+
+    def _import():
+        return managers.DefaultClientSubmissionManager(parent=None, input_object=path).to_pydantic()
+
+    measure(_import)
+
+
+def test_export_run(bench_db, measure, managers):
+    from backend.db.models import Run
+
+    run_id = _first_run_id(bench_db["session"])
+
+    def _export():
+        run = Run.query(id=run_id)
+        managers.DefaultRunManager(parent=None, input_object=run).write().save(BytesIO())
+
+    measure(_export)
+
+
+def test_submissions_tree_set_data(bench_db, measure):
+    widgets = pytest.importorskip("frontend.widgets", exc_type=ImportError)
+    from PyQt6.QtWidgets import QApplication, QWidget
+
+    application = QApplication.instance() or QApplication([])
+    parent = QWidget()
+    parent.app = None
+    tree = widgets.SubmissionsTree(parent=parent, model=widgets.ClientSubmissionRunModel(parent))
+    measure(tree.set_data)
+    assert application is not None
+
+
+def test_report_maker(measure, span):
+    from backend.excel.reports import ReportMaker
+
+    start, end = span
+    measure(lambda: ReportMaker(start_date=start, end_date=end).html)
+
+
+def test_turnaround_maker(measure, span):
+    from backend.excel.reports import TurnaroundMaker
+
+    start, end = span
+    measure(lambda: TurnaroundMaker(start_date=start, end_date=end, submission_types=None))
+
+
+def test_pcr_maker(measure, span):
+    from backend.excel.reports import PCRMaker
+
+    start, end = span
+    measure(lambda: PCRMaker(start_date=start, end_date=end, submission_types=None,
+                             include=["Positive", "Negative", "Samples"]))
+
+
+def test_run_to_html(bench_db, measure):
+    from backend.db.models import Run
+
+    run_id = _first_run_id(bench_db["session"])
+    measure(lambda: Run.query(id=run_id).to_pydantic().to_html())
+
+
+def test_sample_fuzzy_search(measure):
+    from backend.db.models import Sample
+
+    measure(lambda: Sample.fuzzy_search(sample_id="CTRL"))
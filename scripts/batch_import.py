@@ -0,0 +1,63 @@
+"""
+Import a backlog of client submission workbooks without the GUI.
+
+Each workbook is parsed the way the import form parses it, in a pool of worker
+processes. This process is the only one that writes: results are committed in
+batches, each file inside its own savepoint, so a workbook that fails to parse or
+to save is reported and skipped without rolling back the others.
+
+Usage::
+
+    QT_QPA_PLATFORM=offscreen python scripts/batch_import.py ~/historical/2025/
+    QT_QPA_PLATFORM=offscreen python scripts/batch_import.py a.xlsx b.xlsx --workers 4 --report import.csv
+
+The database is whichever one the app's config points at. Workbooks are imported
+as-is; nothing is asked of the user, so review the report for failures.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from collections import Counter
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SRC = REPO_ROOT / "src" / "submissions"
+
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", type=Path,
+                        help="workbooks, or directories to search for *.xlsx")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="parser processes (default: one per CPU, 0: parse in this process)")
+    parser.add_argument("--batch-size", type=int, default=25,
+                        help="files committed per transaction")
+    parser.add_argument("--report", type=Path, default=None,
+                        help="write the per-file outcome to this csv")
+    args = parser.parse_args()
+
+    from backend.excel.batch_import import batch_import, find_workbooks, write_report
+
+    total = len(find_workbooks(args.paths))
+    if not total:
+        print("No workbooks found.", file=sys.stderr)
+        return 1
+    outcomes = []
+    for outcome in batch_import(args.paths, workers=args.workers, batch_size=args.batch_size):
+        outcomes.append(outcome)
+        detail = outcome.submission if outcome.status == "imported" else f"{outcome.stage}: {outcome.message}"
+        print(f"[{len(outcomes)}/{total}] {outcome.status:8} {outcome.file} ({detail})")
+    if args.report:
+        print(f"\nWrote report to {write_report(outcomes, args.report)}")
+    counts = Counter(outcome.status for outcome in outcomes)
+    print(f"\n{counts['imported']} imported, {counts['duplicate']} duplicate, {counts['failed']} failed, of {total}.")
+    return 0 if not counts['failed'] else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
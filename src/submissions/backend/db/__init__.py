@@ -7,8 +7,13 @@ from datetime import datetime
 from getpass import getuser
 from sqlalchemy import event as sql_event, inspect as sql_inspect
 from sqlalchemy.engine import Engine
-from tools import ctx
+from sqlalchemy.pool import Pool
+from tools import ctx, database_concurrency, database_performance, DotDict
 from .models import *
+from .models import BaseClass
+from .backup import *
+from .images import *
+from .purge import *
 
 
 @sql_event.listens_for(Engine, "connect")
@@ -22,16 +27,61 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
         dbapi_connection (_type_): _description_
         connection_record (_type_): _description_
     """
+    concurrency = DotDict({**database_concurrency, **(ctx.database.get("concurrency") or {})})
+    if ctx.database.schema == "mssql+pyodbc":
+        # NOTE: Give up on a blocked lock after a while rather than waiting forever.
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET LOCK_TIMEOUT {int(concurrency.busy_timeout_ms)}")
+        cursor.close()
+        return
     if ctx.database.schema != "sqlite":
         return
+    performance = DotDict({**database_performance, **(ctx.database.get("performance") or {})})
     cursor = dbapi_connection.cursor()
     cursor.execute("PRAGMA foreign_keys=ON")
     cursor.execute("PRAGMA journal_mode=WAL")    # crash-safe; no large rollback journal
     cursor.execute("PRAGMA synchronous=NORMAL")  # durable across app/process crashes
-    cursor.execute("PRAGMA busy_timeout=5000")   # wait on locks instead of erroring out
+    cursor.execute(f"PRAGMA busy_timeout={int(concurrency.busy_timeout_ms)}")  # wait on locks, BaseClass.save waits less and retries
+    cursor.execute(f"PRAGMA cache_size={int(performance.cache_size)}")
+    cursor.execute(f"PRAGMA mmap_size={int(performance.mmap_size)}")
+    cursor.execute(f"PRAGMA temp_store={performance.temp_store}")
     cursor.close()
 
 
+@sql_event.listens_for(Pool, "checkin")
+def restore_lock_timeout(dbapi_connection, connection_record):
+    """
+    Puts a connection that BaseClass.save gave a short lock timeout back to the usual wait
+    as it returns to the pool.
+
+    Args:
+        dbapi_connection (_type_): Driver connection, None if it was invalidated.
+        connection_record (_type_): Pool's record of the connection.
+    """
+    if connection_record.info.pop("lock_timeout_ms", None) is None or dbapi_connection is None:
+        return
+    concurrency = DotDict({**database_concurrency, **(ctx.database.get("concurrency") or {})})
+    statement = BaseClass.lock_timeout_statement(concurrency.busy_timeout_ms)
+    if statement:
+        cursor = dbapi_connection.cursor()
+        cursor.execute(statement)
+        cursor.close()
+
+
+def maintain_database():
+    """
+    Periodic housekeeping: refreshes query planner statistics and folds the WAL back
+    into the main database file so it doesn't grow without bound. No-op for non-sqlite.
+    """
+    if ctx.database.schema != "sqlite":
+        return
+    performance = DotDict({**database_performance, **(ctx.database.get("performance") or {})})
+    with ctx.database.engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA optimize")
+        result = connection.exec_driver_sql(f"PRAGMA wal_checkpoint({performance.checkpoint_mode})").first()
+    logger.info(f"Database maintenance complete, checkpoint (busy, log, checkpointed): {tuple(result)}")
+
+
 def update_log(mapper, connection, target):
     """
     Updates log table whenever an object with LogMixin is updated.
@@ -0,0 +1,247 @@
+"""
+Database backups: paged sqlite online backups, compressed and verified, with retention.
+"""
+from __future__ import annotations
+from logging import getLogger
+logger = getLogger(f"submissions.{__name__}")
+import gzip, sqlite3
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from shutil import copyfileobj
+from tempfile import TemporaryDirectory
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from tools import database_backup, DotDict
+
+
+def backup_settings(database: DotDict) -> DotDict:
+    """
+    Defaults from tools.database_backup, overridden by 'database: backup:' in config.yml.
+
+    Args:
+        database (DotDict): ctx.database
+
+    Returns:
+        DotDict: Backup settings.
+    """
+    return DotDict({**database_backup, **(database.get("backup") or {})})
+
+
+def backup_sqlite(source: Path, destination: Path, pages: int = 256, sleep_ms: int = 50,
+                  compresslevel: int = 6) -> Path:
+    """
+    Copies a live sqlite database with the online backup API and gzips the copy.
+
+    In WAL mode (which the app always uses) the copy is made pages at a time with a pause
+    between steps, from a read snapshot pinned for the duration. Writers carry on into
+    the WAL meanwhile, and the backup doesn't restart every time one of them commits,
+    which it otherwise would. Without WAL a pinned snapshot would block writers, so the
+    file is copied in one step instead. The copy is checked with PRAGMA integrity_check
+    before it is compressed and only published (by rename) once complete.
+
+    Args:
+        source (Path): The database file.
+        destination (Path): The .db.gz to write.
+        pages (int, optional): Pages copied per step. Defaults to 256.
+        sleep_ms (int, optional): Pause between steps. Defaults to 50.
+        compresslevel (int, optional): gzip level. Defaults to 6.
+
+    Raises:
+        sqlite3.DatabaseError: If the copy fails its integrity check.
+
+    Returns:
+        Path: destination
+    """
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    partial = destination.with_name(f"{destination.name}.partial")
+    with TemporaryDirectory(dir=destination.parent) as scratch:
+        copy = Path(scratch).joinpath(source.name)
+        # NOTE: Own connections, sqlite3 connections can't be shared with the app's threads.
+        src = sqlite3.connect(str(source), timeout=30.0, isolation_level=None)
+        dst = sqlite3.connect(str(copy))
+        try:
+            if src.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+                src.execute("BEGIN")
+                src.execute("SELECT count(*) FROM sqlite_master").fetchone()
+            else:
+                pages = -1
+            src.backup(dst, pages=pages, sleep=sleep_ms / 1000,
+                       progress=lambda status, remaining, total: logger.debug(
+                           f"Backup of {source.name}: {total - remaining}/{total} pages"))
+            check_integrity(dst)
+        finally:
+            dst.close()
+            src.close()
+        try:
+            with copy.open("rb") as raw, gzip.open(partial, "wb", compresslevel=compresslevel) as compressed:
+                copyfileobj(raw, compressed, length=1024 * 1024)
+            partial.replace(destination)
+        except Exception:
+            partial.unlink(missing_ok=True)
+            raise
+    return destination
+
+
+def check_integrity(connection: sqlite3.Connection):
+    """
+    Runs PRAGMA integrity_check on a sqlite connection.
+
+    Args:
+        connection (sqlite3.Connection): Connection to check.
+
+    Raises:
+        sqlite3.DatabaseError: Listing the problems found.
+    """
+    problems = [row[0] for row in connection.execute("PRAGMA integrity_check")]
+    if problems != ["ok"]:
+        raise sqlite3.DatabaseError(f"Integrity check failed: {'; '.join(problems[:10])}")
+
+
+def verify_backup(backup: Path) -> bool:
+    """
+    Decompresses a sqlite backup to a scratch folder and checks it. Also catches truncated
+    or corrupt gzip files, which fail their CRC on the way out.
+
+    Args:
+        backup (Path): A .db.gz written by backup_sqlite.
+
+    Returns:
+        bool: True if the backup can be restored.
+    """
+    try:
+        with TemporaryDirectory() as scratch:
+            copy = Path(scratch).joinpath(backup.name.removesuffix(".gz"))
+            with gzip.open(backup, "rb") as compressed, copy.open("wb") as raw:
+                copyfileobj(compressed, raw, length=1024 * 1024)
+            connection = sqlite3.connect(str(copy))
+            try:
+                check_integrity(connection)
+            finally:
+                connection.close()
+    except (OSError, EOFError, sqlite3.DatabaseError) as e:
+        logger.error(f"Backup {backup} failed verification: {e}")
+        return False
+    return True
+
+
+def backup_mssql(engine: Engine, destination: str) -> str:
+    """
+    Runs a native BACKUP DATABASE with compression and checksums, then RESTORE VERIFYONLY.
+
+    The path is resolved by the SQL Server service, not this machine, so the backup
+    directory has to be one the server can write to.
+
+    Args:
+        engine (Engine): The application's engine.
+        destination (str): .bak path as seen by the server.
+
+    Returns:
+        str: destination
+    """
+    # NOTE: BACKUP refuses to run inside a transaction.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        database = connection.execute(text("SELECT DB_NAME()")).scalar()
+        connection.execute(
+            text(f"BACKUP DATABASE [{database.replace(']', ']]')}] TO DISK = :destination "
+                 f"WITH COMPRESSION, CHECKSUM, INIT, STATS = 10"),
+            dict(destination=destination))
+        connection.execute(text("RESTORE VERIFYONLY FROM DISK = :destination WITH CHECKSUM"),
+                           dict(destination=destination))
+    return destination
+
+
+def prune_backups(directory: Path, pattern: str, keep: int = 14, max_age_days: int = 90,
+                  today: date | None = None) -> list[Path]:
+    """
+    Removes old backups. A backup is kept if it is among the newest 'keep' and younger than
+    'max_age_days'; the newest is always kept. Either limit can be 0 to switch it off.
+
+    Args:
+        directory (Path): Backup directory.
+        pattern (str): Glob for this database's backups, e.g. 'submissions_*.db.gz'.
+        keep (int, optional): Number of backups to keep. Defaults to 14.
+        max_age_days (int, optional): Age after which backups are removed. Defaults to 90.
+        today (date | None, optional): Reference date. Defaults to today.
+
+    Returns:
+        list[Path]: Files removed.
+    """
+    today = today or date.today()
+    backups = sorted(directory.glob(pattern), key=lambda item: item.stat().st_mtime, reverse=True)
+    removed = []
+    for position, backup in enumerate(backups):
+        if position == 0:
+            continue
+        age = today - datetime.fromtimestamp(backup.stat().st_mtime).date()
+        if (keep and position >= keep) or (max_age_days and age > timedelta(days=max_age_days)):
+            backup.unlink(missing_ok=True)
+            removed.append(backup)
+    if removed:
+        logger.info(f"Removed {len(removed)} old backup(s) from {directory}")
+    return removed
+
+
+def backup_database(ctx) -> Path | str | None:
+    """
+    Makes today's backup of the application database and applies retention.
+
+    One backup per calendar day; if today's exists nothing is copied. sqlite databases are
+    copied with backup_sqlite, MSSQL ones with a native BACKUP. Failures are logged and
+    swallowed so they never disrupt startup or teardown.
+
+    Args:
+        ctx (Settings): The application settings.
+
+    Returns:
+        Path | str | None: The backup, or None if none was made.
+    """
+    try:
+        database = ctx.database
+        settings = backup_settings(database)
+        backup_root = ctx.directories.get("backup")
+        if not backup_root:
+            logger.error("ctx.directories.backup is not set; skipping backup.")
+            return None
+        backup_dir = Path(backup_root)
+        engine = database.get("engine")
+        if engine is None:
+            logger.error("No database engine on ctx.database; skipping backup.")
+            return None
+        today = date.today().isoformat()
+        match database.get("schema"):
+            case "sqlite":
+                db_path = Path(engine.url.database) if engine.url.database else None
+                if db_path is None or not db_path.exists():
+                    logger.error(f"Could not locate sqlite file (got {db_path}); skipping backup.")
+                    return None
+                db_name = database.get("name") or db_path.stem
+                backup_file = backup_dir.joinpath(f"{db_name}_{today}.db.gz")
+                if backup_file.exists():
+                    logger.info(f"Backup for {today} already exists at {backup_file}; skipping.")
+                    return backup_file
+                backup_sqlite(db_path, backup_file, pages=settings.pages, sleep_ms=settings.sleep_ms,
+                              compresslevel=settings.compresslevel)
+                if settings.verify and not verify_backup(backup_file):
+                    backup_file.unlink(missing_ok=True)
+                    return None
+                suffix = ".db.gz"
+            case "mssql+pyodbc":
+                db_name = database.get("name") or engine.url.database
+                backup_file = str(backup_dir.joinpath(f"{db_name}_{today}.bak"))
+                backup_mssql(engine, backup_file)
+                suffix = ".bak"
+            case schema:
+                logger.info(f"No backup method for {schema}; skipping backup.")
+                return None
+        logger.info(f"Database backed up to {backup_file}")
+        # NOTE: The server's backup folder may not be visible from here; then the DBA's job prunes it.
+        if backup_dir.exists():
+            prune_backups(backup_dir, f"{db_name}_*{suffix}", keep=settings.keep, max_age_days=settings.max_age_days)
+        return backup_file
+    except Exception as e:
+        logger.error(f"Database backup failed: {e}", exc_info=True)
+        return None
+
+
+__all__ = ["backup_database", "backup_mssql", "backup_settings", "backup_sqlite", "check_integrity",
+           "prune_backups", "verify_backup"]
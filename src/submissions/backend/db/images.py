@@ -0,0 +1,181 @@
+"""
+Downsampled image pyramids for viewing large gel scans, cached next to the image archive.
+"""
+from __future__ import annotations
+from logging import getLogger
+logger = getLogger(f"submissions.{__name__}")
+import json
+from hashlib import sha1
+from pathlib import Path
+from shutil import rmtree
+from tempfile import mkdtemp
+from typing import List, Tuple
+import numpy as np
+from PIL import Image
+from tools import ctx
+
+
+class ImagePyramid(object):
+    """
+    An image stored as a stack of levels, each half the size of the one before, down to
+    the first that fits in min_size. Levels are .npy files, so they are opened memory
+    mapped and slicing one only reads the rows it needs from disk.
+
+    Levels are stored transposed (x first), which is how pyqtgraph's ImageView expects
+    its data, so nothing has to be rotated or flipped when the viewer opens.
+
+    The pyramid is built the first time an image is opened and reused while the file's
+    size and modification time are unchanged.
+
+    Args:
+        source (Path | str): The image.
+        cache (Path | None, optional): Where pyramids are kept. Defaults to 'submission_imgs_pyramids'
+            beside submission_imgs.zip in the main directory.
+        min_size (int, optional): Largest side of the coarsest level. Defaults to 1024.
+    """
+
+    def __init__(self, source: Path | str, cache: Path | None = None, min_size: int = 1024):
+        self.source = Path(source)
+        if cache is None:
+            cache = self.default_cache()
+        self.min_size = min_size
+        stat = self.source.stat()
+        key = sha1(f"{self.source.resolve()}|{stat.st_size}|{stat.st_mtime_ns}|{min_size}".encode()).hexdigest()
+        self.directory = Path(cache).joinpath(key)
+        manifest = self.directory.joinpath("manifest.json")
+        if not manifest.exists():
+            self.build()
+        self.manifest = json.loads(manifest.read_text())
+
+    @classmethod
+    def default_cache(cls) -> Path:
+        """
+        The pyramid cache beside the submission image archive.
+
+        Returns:
+            Path: Cache directory.
+        """
+        try:
+            return Path(ctx.directories.main).joinpath("submission_imgs_pyramids")
+        except (AttributeError, KeyError, TypeError):
+            return Path.home().joinpath(".submissions_tng", "submission_imgs_pyramids")
+
+    def build(self):
+        """
+        Decodes the image once and writes every level, into a scratch directory that is
+        only renamed into place when complete.
+        """
+        logger.info(f"Building image pyramid for {self.source}")
+        self.directory.parent.mkdir(parents=True, exist_ok=True)
+        scratch = Path(mkdtemp(dir=self.directory.parent, prefix=".partial-"))
+        try:
+            with Image.open(self.source) as img:
+                if img.mode in ("1", "P", "CMYK", "YCbCr", "LAB", "HSV"):
+                    img = img.convert("RGB" if img.mode != "1" else "L")
+                level = np.swapaxes(np.asarray(img), 0, 1)
+            shapes = []
+            while True:
+                np.save(scratch.joinpath(f"{len(shapes)}.npy"), np.ascontiguousarray(level))
+                shapes.append(list(level.shape))
+                if max(level.shape[:2]) <= self.min_size or min(level.shape[:2]) < 2:
+                    break
+                level = self.halve(level)
+            scratch.joinpath("manifest.json").write_text(json.dumps(dict(
+                source=str(self.source), shapes=shapes, dtype=str(level.dtype))))
+            try:
+                scratch.rename(self.directory)
+            except OSError:
+                # NOTE: Someone else built it first.
+                rmtree(scratch, ignore_errors=True)
+        except Exception:
+            rmtree(scratch, ignore_errors=True)
+            raise
+
+    @classmethod
+    def halve(cls, array: np.ndarray) -> np.ndarray:
+        """
+        Averages 2x2 blocks, dropping an odd last row/column.
+
+        Args:
+            array (np.ndarray): A level, 2D or with a trailing channel axis.
+
+        Returns:
+            np.ndarray: The next level, in the same dtype.
+        """
+        width, height = array.shape[0] // 2, array.shape[1] // 2
+        blocks = array[:width * 2, :height * 2].reshape(width, 2, height, 2, *array.shape[2:])
+        return blocks.mean(axis=(1, 3), dtype=np.float64).astype(array.dtype)
+
+    @property
+    def shapes(self) -> List[Tuple[int, ...]]:
+        return [tuple(shape) for shape in self.manifest['shapes']]
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """
+        Full resolution (width, height).
+        """
+        return self.shapes[0][0], self.shapes[0][1]
+
+    def level(self, index: int) -> np.ndarray:
+        """
+        A level, memory mapped. 0 is full resolution, each one after is half the last.
+
+        Args:
+            index (int): Level, negative counts from the coarsest.
+
+        Returns:
+            np.ndarray: Read-only array, x first.
+        """
+        index = range(len(self.shapes))[index]
+        return np.load(self.directory.joinpath(f"{index}.npy"), mmap_mode="r")
+
+    def overview(self) -> Tuple[np.ndarray, int]:
+        """
+        The coarsest level, what the viewer shows first.
+
+        Returns:
+            Tuple[np.ndarray, int]: The level read into memory, and its scale relative to full resolution.
+        """
+        index = len(self.shapes) - 1
+        return np.asarray(self.level(index)), 2 ** index
+
+    def level_for(self, pixels_per_screen_pixel: float) -> int:
+        """
+        The coarsest level that still has at least one pixel per screen pixel.
+
+        Args:
+            pixels_per_screen_pixel (float): Full resolution pixels covered by one screen pixel.
+
+        Returns:
+            int: Level index.
+        """
+        index = 0
+        while index + 1 < len(self.shapes) and 2 ** (index + 1) <= pixels_per_screen_pixel:
+            index += 1
+        return index
+
+    def region(self, index: int, x0: float, y0: float, x1: float, y1: float) -> Tuple[np.ndarray, Tuple[int, int, int, int]]:
+        """
+        Reads the part of a level covering a full resolution rectangle.
+
+        Args:
+            index (int): Level.
+            x0 (float): Left, in full resolution pixels.
+            y0 (float): Top, in full resolution pixels.
+            x1 (float): Right, in full resolution pixels.
+            y1 (float): Bottom, in full resolution pixels.
+
+        Returns:
+            Tuple[np.ndarray, Tuple[int, int, int, int]]: The pixels, and the full resolution
+                (x, y, width, height) they cover once snapped to the level's grid.
+        """
+        scale = 2 ** index
+        width, height = self.shapes[index][:2]
+        left, top = max(0, int(x0 // scale)), max(0, int(y0 // scale))
+        right, bottom = min(width, int(-(-x1 // scale))), min(height, int(-(-y1 // scale)))
+        pixels = np.asarray(self.level(index)[left:max(left, right), top:max(top, bottom)])
+        return pixels, (left * scale, top * scale, pixels.shape[0] * scale, pixels.shape[1] * scale)
+
+
+__all__ = ["ImagePyramid"]
@@ -4,22 +4,30 @@ Contains all models for sqlalchemy
 from __future__ import annotations
 from logging import getLogger
 logger = getLogger(f"submissions.{__name__}")
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
 from inspect import getmembers, getattr_static, isroutine
+from itertools import chain
 from json import dumps as jdumps
 from re import sub as rsub
 from datetime import datetime, date, timedelta
-from sqlalchemy import Column, INTEGER, String, JSON, TIMESTAMP, inspect as sql_inspect, event
+from random import uniform
+from time import sleep
+from sqlalchemy import Column, INTEGER, String, JSON, TIMESTAMP, inspect as sql_inspect, event, text
 from sqlalchemy.ext.mutable import MutableDict
 from sqlalchemy.ext.associationproxy import AssociationProxy, _AssociationList
 from sqlalchemy.orm import DeclarativeMeta, declarative_base, Query, Session, ColumnProperty, RelationshipProperty, reconstructor
-from sqlalchemy.orm.attributes import InstrumentedAttribute, set_committed_value
+from sqlalchemy.orm.attributes import InstrumentedAttribute, set_attribute, set_committed_value
+from sqlalchemy.orm.exc import StaleDataError
 from sqlalchemy.orm.collections import InstrumentedList
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.exc import ArgumentError, IntegrityError, OperationalError, StatementError
 from typing import Any, Generator, List, ClassVar, Tuple, TYPE_CHECKING
 from pathlib import Path
-from tools import TimeFill, report_result, Report, Alert, ctx, is_internal_attr_key, trace
+from tools import TimeFill, report_result, Report, Alert, ctx, is_internal_attr_key, trace, setup_lookup, \
+    database_concurrency, DotDict
 if TYPE_CHECKING:
     from pydantic import BaseModel
     from backend.validators import PydSample
@@ -28,6 +36,92 @@ if TYPE_CHECKING:
 # NOTE: For inheriting in LogMixin
 Base: DeclarativeMeta = declarative_base()
 
+# NOTE: Set by read_only_session so queries in reports and charts go through the read-only session.
+_reading: ContextVar[bool] = ContextVar("_reading", default=False)
+
+
+@contextmanager
+def read_only_session() -> Generator[Session, None, None]:
+    """
+    Route model queries made inside the block through the read-only session.
+
+    Reports and charts use this so long reads never block, or get blocked by, form saves
+    on the main session. The read transaction is closed on exit so it doesn't pin the WAL.
+    Falls back on the main session (left untouched on exit) if no read-only session is configured.
+
+    :return: The read-only session.
+    :rtype: :class:`sqlalchemy.orm.Session`
+    """
+    token = _reading.set(True)
+    session = BaseClass.__database_session__
+    try:
+        yield session
+    finally:
+        _reading.reset(token)
+        if session is not ctx.database.session:
+            session.rollback()
+
+
+# NOTE: Set by render_scope, what has already been serialized in the current render.
+_rendering: ContextVar[dict | None] = ContextVar("_rendering", default=None)
+
+
+@contextmanager
+def render_scope() -> Generator[dict, None, None]:
+    """
+    Serialize each row only once while building a detail view.
+
+    Inside the block, methods decorated with :func:`rendered_once` (to_pydantic, details_dict,
+    improved_dict_expand_fields) hand back what they built the first time for the same row and
+    arguments. A reagent lot, piece of equipment or sample shared by many procedures is then
+    converted once and the same result reused wherever it appears. A nested scope uses the
+    outer one; everything is dropped on exit, so results obtained inside are for display only.
+
+    :return: The identity map, keyed by method, class, row identity and arguments.
+    :rtype: dict
+    """
+    memo = _rendering.get()
+    if memo is not None:
+        yield memo
+        return
+    memo = {}
+    token = _rendering.set(memo)
+    try:
+        yield memo
+    finally:
+        _rendering.reset(token)
+
+
+def rendered_once(func):
+    """
+    Decorator memoizing a serializer per database row inside a :func:`render_scope`.
+
+    Works on model methods and on pydantic models, which are keyed by their sql_instance.
+    Outside a scope, or for rows not yet flushed, the method runs as usual. Dicts are handed
+    out as shallow copies since callers add keys to them.
+
+    :param func: Method of a row taking hashable, repr-stable arguments.
+    :type func: Callable
+    :return: Memoized method.
+    :rtype: Callable
+    """
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        memo = _rendering.get()
+        row = self if isinstance(self, BaseClass) else getattr(self, "sql_instance", None)
+        identity = sql_inspect(row).identity if memo is not None and row is not None else None
+        if identity is None:
+            return func(self, *args, **kwargs)
+        key = (func.__qualname__, self.__class__, identity, repr(args), repr(sorted(kwargs.items())))
+        try:
+            output = memo[key]
+        except KeyError:
+            output = memo[key] = func(self, *args, **kwargs)
+        if isinstance(output, dict):
+            return dict(output)
+        return output
+    return wrapper
+
 
 class SafeMiscInfo(MutableDict, dict):
     """
@@ -249,9 +343,13 @@ class BaseClass(Base):
         Retrieves the active SQLAlchemy database session from the application context.
         Used internally for all database operations.
 
+        Inside a :func:`read_only_session` block this is the read-only session instead.
+
         :return: Active SQLAlchemy database session from application settings.
         :rtype: :class:`sqlalchemy.orm.Session`
         """
+        if _reading.get():
+            return ctx.database.get("read_session") or ctx.database.session
         return ctx.database.session
 
     @classproperty
@@ -764,6 +862,13 @@ class BaseClass(Base):
         Ensures all values in misc_info are JSON-serializable, converting them if possible.
         Removes any values that cannot be serialized.
 
+        A commit that hits a database lock held by another user is rolled back, its changes
+        re-applied and retried with backoff (see tools.database_concurrency). Only what the commit
+        itself writes can be re-applied: if the transaction had already flushed (e.g. autoflush
+        before a query), the rollback loses those writes, so the error is raised instead. A versioned object
+        (:class:`VersionedMixin`) changed by someone else since it was loaded is not overwritten;
+        the save is rolled back and reported instead.
+
         :return: Report object with alerts if any errors occurred, or None on success.
         :rtype: :class:`Report` | None
             
@@ -772,6 +877,150 @@ class BaseClass(Base):
            result reporting. On failure, returns a Report with a Critical-level Alert.
         """
         report = Report()
+        self.sanitize_misc_info()
+        session = self.__database_session__
+        concurrency = DotDict({**database_concurrency, **(ctx.database.get("concurrency") or {})})
+        session.add(self)
+        for attempt in range(int(concurrency.retries) + 1):
+            flushed = session.info.get("flushed", False)
+            pending = self.pending_changes(session)
+            try:
+                self.shorten_lock_timeout(session, concurrency.lock_timeout_ms)
+                session.commit()
+            except StaleDataError as e:
+                session.rollback()
+                logger.warning(f"Conflict saving {self}: {e}")
+                report.add_result(Alert(msg=f"{self} was changed by someone else after it was opened. "
+                                            f"Reopen it and make your changes again.", status="Warning"))
+                return report
+            except IntegrityError as e:
+                session.rollback()
+                logger.exception(f"Integrity error saving {self}: {e.orig}")
+                report.add_result(Alert(msg=str(e.orig), status="Critical"))
+                raise  # or return report, but don't silently drop
+            except OperationalError as e:
+                session.rollback()
+                if flushed and self.is_transient_lock_error(e):
+                    logger.error(f"Database busy saving {self}, not retrying: writes flushed earlier in the "
+                                 f"transaction were rolled back.")
+                    raise
+                if attempt < concurrency.retries and self.is_transient_lock_error(e):
+                    delay = min(concurrency.backoff_ms * 2 ** attempt, concurrency.backoff_max_ms) / 1000
+                    delay *= uniform(0.5, 1.5)
+                    logger.warning(f"Database busy saving {self}, retrying in {delay:.2f}s "
+                                   f"({attempt + 1}/{concurrency.retries}): {e.orig}")
+                    sleep(delay)
+                    if not self.restore_pending_changes(session, pending):
+                        report.add_result(Alert(msg=f"{self} was changed by someone else while saving. "
+                                                    f"Reopen it and make your changes again.", status="Warning"))
+                        return report
+                    continue
+                logger.exception(f"Operational error saving {self}: {e}")
+                raise
+            return None
+
+    @classmethod
+    def lock_timeout_statement(cls, timeout_ms: int) -> str | None:
+        """
+        Statement setting how long a connection waits on a lock.
+
+        :param timeout_ms: Wait in milliseconds.
+        :type timeout_ms: int
+        :return: sqlite busy_timeout or MSSQL LOCK_TIMEOUT, None for other databases.
+        :rtype: str | None
+        """
+        match ctx.database.get("schema"):
+            case "sqlite":
+                return f"PRAGMA busy_timeout={int(timeout_ms)}"
+            case "mssql+pyodbc":
+                return f"SET LOCK_TIMEOUT {int(timeout_ms)}"
+            case _:
+                return None
+
+    @classmethod
+    def shorten_lock_timeout(cls, session: Session, timeout_ms: int) -> None:
+        """
+        Bounds how long the transaction's connection waits on a lock, so a blocked save gives up
+        and is retried. Everything else keeps the longer busy_timeout_ms; the connection is put
+        back to it when it returns to the pool (backend.db.restore_lock_timeout).
+
+        :param session: Session about to commit.
+        :type session: :class:`sqlalchemy.orm.Session`
+        :param timeout_ms: Wait in milliseconds.
+        :type timeout_ms: int
+        """
+        statement = cls.lock_timeout_statement(timeout_ms)
+        if statement is None:
+            return
+        connection = session.connection()
+        connection.exec_driver_sql(statement)
+        connection.connection.info["lock_timeout_ms"] = timeout_ms
+
+    @classmethod
+    def is_transient_lock_error(cls, error: OperationalError) -> bool:
+        """
+        Whether a failed statement was only blocked by someone else's lock and may succeed if retried.
+
+        :param error: Error raised by the driver.
+        :type error: :class:`sqlalchemy.exc.OperationalError`
+        :return: True for sqlite's "database is locked" and MSSQL deadlock victims (1205) and lock timeouts (1222).
+        :rtype: bool
+        """
+        message = str(getattr(error, "orig", error)).lower()
+        return any(marker in message for marker in ("database is locked", "database table is locked",
+                                                    "deadlock", "lock request time out", "(1205)", "(1222)"))
+
+    @classmethod
+    def pending_changes(cls, session: Session) -> Tuple[list, list]:
+        """
+        Snapshot of what a commit is about to write, enough to redo it after a rollback.
+
+        :param session: Session about to commit.
+        :type session: :class:`sqlalchemy.orm.Session`
+        :return: New objects, and (object, version loaded, changed attribute values) for modified ones.
+        :rtype: tuple[list, list]
+        """
+        modified = []
+        for obj in session.dirty:
+            state = sql_inspect(obj)
+            values = {}
+            for attr in state.attrs:
+                if not attr.history.has_changes():
+                    continue
+                value = attr.value
+                values[attr.key] = list(value) if isinstance(value, InstrumentedList) else value
+            if values:
+                modified.append((obj, getattr(obj, "version_id", None), values))
+        return list(session.new), modified
+
+    @classmethod
+    def restore_pending_changes(cls, session: Session, pending: Tuple[list, list]) -> bool:
+        """
+        Re-applies a snapshot from :meth:`pending_changes` after the commit was rolled back.
+
+        :param session: Session that was rolled back.
+        :type session: :class:`sqlalchemy.orm.Session`
+        :param pending: Snapshot taken before the commit.
+        :type pending: tuple[list, list]
+        :return: False if a versioned object was changed by someone else in the meantime.
+        :rtype: bool
+        """
+        new, modified = pending
+        session.add_all(new)
+        for obj, version, values in modified:
+            # NOTE: Reading the version reloads the row, expired by the rollback.
+            if version is not None and getattr(obj, "version_id", None) != version:
+                return False
+            for key, value in values.items():
+                set_attribute(obj, key, value)
+        return True
+
+    def sanitize_misc_info(self):
+        """
+        Ensure values in misc_info are JSON-serializable before this object is written.
+
+        Values are coerced where possible; keys that cannot be coerced are dropped.
+        """
         del_keys = []
         try:
             if not isinstance(self._misc_info, SafeMiscInfo):
@@ -779,8 +1028,6 @@ class BaseClass(Base):
             items = list(self._misc_info.items())
         except AttributeError:
             items = []
-        # Ensure values in misc_info are json serializable. Try to coerce
-        # values where possible; drop keys that cannot be coerced.
         for key, value in items:
             try:
                 self._misc_info[key] = self.sanitize_obj_for_json(value)
@@ -793,18 +1040,6 @@ class BaseClass(Base):
                 del self._misc_info[dk]
             except Exception:
                 pass
-        try:
-            self.__database_session__.add(self)
-            self.__database_session__.commit()
-        except IntegrityError as e:
-            self.__database_session__.rollback()
-            logger.exception(f"Integrity error saving {self}: {e.orig}")
-            report.add_result(Alert(msg=str(e.orig), status="Critical"))
-            raise  # or return report, but don't silently drop
-        except OperationalError as e:
-            self.__database_session__.rollback()
-            logger.exception(f"Operational error saving {self}: {e}")
-            raise
 
     @classmethod
     def pydantic_model(cls, pyd_model_name: str | None = None) -> Any:
@@ -1008,12 +1243,12 @@ class BaseClass(Base):
                 if not expand:
                     return cls.sanitize_obj_for_json(obj_.name)
                 else:
-                    return cls.sanitize_obj_for_json(obj_.to_pydantic().improved_dict, expand=expand)
+                    return cls.sanitize_obj_for_json(dict(obj_.to_pydantic().improved_dict), expand=expand)
             case _ if issubclass(obj_.__class__, PydBaseClass):
                 if not expand:
                     return cls.sanitize_obj_for_json(obj_.name)
                 else:
-                    return cls.sanitize_obj_for_json(obj_.improved_dict, expand=expand)
+                    return cls.sanitize_obj_for_json(dict(obj_.improved_dict), expand=expand)
             case _:
                 return obj_
 
@@ -1117,6 +1352,7 @@ class BaseClass(Base):
             yield k, v
 
     @property
+    @rendered_once
     def details_dict(self) -> dict:
         """
         Get a dictionary representation of this object suitable for serialization.
@@ -1164,6 +1400,7 @@ class BaseClass(Base):
             output['name'] = self.name
         return output
 
+    @rendered_once
     def to_pydantic(self, pyd_model_name: str | None = None, **kwargs) -> BaseModel:
         """
         Convert this SQLAlchemy instance to a Pydantic model.
@@ -1193,7 +1430,8 @@ class BaseClass(Base):
         :param obj: Parent QWidget or QDialog that will own the details dialog.
         """
         from frontend.widgets.submission_details import SubmissionDetails
-        dlg = SubmissionDetails(parent=obj, object_ = self.to_pydantic())
+        with render_scope():
+            dlg = SubmissionDetails(parent=obj, object_ = self.to_pydantic())
         dlg.exec()
 
     @classmethod
@@ -1418,6 +1656,200 @@ class LogMixin(Base):
         return name
 
 
+class VersionedMixin(Base):
+    """
+    Mixin class adding optimistic concurrency control to SQLAlchemy models.
+
+    Every UPDATE or DELETE of a row checks and increments its ``version_id``, so if another
+    user has changed the row since it was loaded the flush raises
+    :class:`sqlalchemy.orm.exc.StaleDataError` instead of overwriting their changes.
+
+    This is an abstract class and should not be instantiated directly.
+
+    :ivar version_id: Incremented on every change to the row.
+    :vartype version_id: int
+    """
+    __abstract__ = True
+
+    version_id = Column(INTEGER, nullable=False, default=1, server_default=text("1"))
+
+    __mapper_args__ = {"version_id_col": version_id}
+
+
+class ReferenceIndex(object):
+    """
+    Snapshot of a read-mostly table, loaded with a single query.
+
+    Holds the session's own instances (so identity is preserved) along with name and id
+    lookups, plus an ``extras`` dict for anything derived from the whole table, such as
+    compiled regular expressions.
+
+    :ivar items: All rows of the table, in query order.
+    :vartype items: list
+    :ivar by_id: Rows keyed by primary key.
+    :vartype by_id: dict
+    :ivar by_name: Rows keyed by exact name.
+    :vartype by_name: dict
+    :ivar names: Row names captured at load time, safe to read after the rows expire.
+    :vartype names: list[str]
+    :ivar extras: Per-class derived data, filled in by ``_build_reference_extras``.
+    :vartype extras: dict
+    """
+
+    def __init__(self, items: list):
+        self.items = items
+        self.by_id = {item.id: item for item in items}
+        self.by_name = {item.name: item for item in items if item.name is not None}
+        self.names = [item.name for item in items]
+        self.extras = {}
+
+    @property
+    def is_stale(self) -> bool:
+        """
+        True if the rows were detached from their session (e.g. by ``Session.close``).
+        """
+        return bool(self.items) and sql_inspect(self.items[0]).detached
+
+
+class ReferenceMixin(Base):
+    """
+    Mixin class for read-mostly lookup tables (submission types, roles, labs, etc).
+
+    Rows are loaded once per session into a :class:`ReferenceIndex` kept in ``Session.info``
+    and served from there by :meth:`cached`. The index is dropped after any commit or
+    rollback that touched the table; :meth:`refresh` drops it on demand, for when another
+    user may have changed the table.
+
+    This is an abstract class and should not be instantiated directly.
+    """
+    __abstract__ = True
+
+    @classmethod
+    def reference_index(cls) -> ReferenceIndex:
+        """
+        Get this table's index for the current session, building it if needed.
+
+        :return: Index of all rows in this table.
+        :rtype: :class:`ReferenceIndex`
+        """
+        session = cls.__database_session__
+        indexes = session.info.setdefault("reference_indexes", {})
+        index = indexes.get(cls)
+        if index is None or index.is_stale:
+            # NOTE: A lookup isn't a reason to flush whatever the caller has pending.
+            with session.no_autoflush:
+                index = ReferenceIndex(session.query(cls).all())
+            cls._build_reference_extras(index)
+            indexes[cls] = index
+        return index
+
+    @classmethod
+    def _build_reference_extras(cls, index: ReferenceIndex) -> None:
+        """
+        Hook for subclasses to precompute table-wide data into ``index.extras``.
+
+        :param index: Freshly loaded index.
+        :type index: :class:`ReferenceIndex`
+        """
+        pass
+
+    @classmethod
+    @setup_lookup
+    def cached(cls, name: str | None = None, id: int | None = None, limit: int = 0, **kwargs) -> Any | List[Any]:
+        """
+        Lookup a row by id or exact name without going to the database.
+
+        Falls back on :meth:`query` for a miss, so a row added by another user (or one
+        matched loosely, like a name prefix) is still found.
+
+        :param name: Name of the row. Defaults to None.
+        :type name: str | None
+        :param id: Primary key of the row. Defaults to None.
+        :type id: int | None
+        :param limit: Maximum number of rows to return when neither name nor id is given (0 = all).
+        :type limit: int
+        :return: Matching row, or all rows if neither name nor id is given.
+        :rtype: any | list[any]
+        """
+        index = cls.reference_index()
+        if id is not None:
+            output = index.by_id.get(id)
+        elif name is not None:
+            output = index.by_name.get(name)
+        elif limit == 1:
+            return next(iter(index.items), None)
+        else:
+            return index.items[:limit or None]
+        if output is None:
+            output = cls.query(name=name, id=id, limit=1)
+        return output
+
+    @classmethod
+    def refresh(cls) -> None:
+        """
+        Drop the cached index for this table, or every table if called on ReferenceMixin.
+        """
+        for session in _reference_sessions():
+            indexes = session.info.get("reference_indexes", {})
+            if cls is ReferenceMixin:
+                indexes.clear()
+            else:
+                indexes.pop(cls, None)
+
+
+def _reference_sessions() -> list:
+    """
+    The sessions reference indexes may be kept in: the main one and, if configured, the read-only one.
+    """
+    sessions = []
+    for key in ("session", "read_session"):
+        session = ctx.database.get(key)
+        if session is not None and session not in sessions:
+            sessions.append(session)
+    return sessions
+
+
+@event.listens_for(Session, "after_flush")
+def _note_reference_changes(session, flush_context):
+    """
+    Record which reference tables this transaction has written to.
+    """
+    changed = {obj.__class__ for obj in chain(session.new, session.dirty, session.deleted)
+               if isinstance(obj, ReferenceMixin)}
+    if changed:
+        session.info.setdefault("reference_changes", set()).update(changed)
+
+
+@event.listens_for(Session, "after_flush")
+def _note_flush(session, flush_context):
+    """
+    Record that this transaction has written to the database, see BaseClass.save.
+    """
+    session.info["flushed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _forget_flush(session):
+    session.info.pop("flushed", None)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _invalidate_reference_indexes(session):
+    """
+    Drop the index of every reference table written to by the transaction that just ended.
+    """
+    changed = session.info.pop("reference_changes", None)
+    if not changed:
+        return
+    # NOTE: The read-only session's copy is just as out of date.
+    for holder in [session] + _reference_sessions():
+        indexes = holder.info.get("reference_indexes", {})
+        for cls in changed:
+            indexes.pop(cls, None)
+
+
 class ConfigItem(BaseClass):
     """
     Configuration item model for storing key-value settings in the database.
@@ -1478,12 +1910,14 @@ class ConfigItem(BaseClass):
 
 # NOTE: import order must go: orgs, procedure, submissions due to circular import issues
 from .audit import AuditLog
+from .sequences import IDSequence
 from .organizations import *
 from .procedures import *
 from .submissions import *
+from .imports import ImportLedger
 
-__all__ = ["LogMixin", "ConfigItem",
-    "AuditLog",
+__all__ = ["LogMixin", "ReferenceMixin", "VersionedMixin", "ConfigItem", "read_only_session",
+    "render_scope", "rendered_once", "AuditLog", "IDSequence", "ImportLedger",
     "ReagentRole", "Reagent", "ReagentLot", "Discount", "SubmissionType", "ProcedureType", "Procedure", "ProcedureTypeReagentRoleAssociation",
     "ProcedureReagentLotAssociation", "EquipmentRole", "Equipment", "EquipmentRoleEquipmentAssociation", "Process", "ProcessVersion",
     "Tips", "TipsLot", "ProcedureEquipmentAssociation",
@@ -0,0 +1,163 @@
+"""
+Content-addressed ledger of imported files, so dropping the same workbook or instrument
+export in again opens what it produced the first time instead of importing it twice.
+
+Provides the :class:`ImportLedger` model. Entries reference the records they created with
+``ON DELETE CASCADE``, so deleting (or purging) a submission or procedure forgets its files
+and they can be imported afresh.
+"""
+from __future__ import annotations
+from logging import getLogger
+logger = getLogger(f"submissions.{__name__}")
+from datetime import datetime
+from getpass import getuser
+from hashlib import sha256
+from pathlib import Path
+from typing import List, TYPE_CHECKING
+from sqlalchemy import Column, INTEGER, String, JSON, TIMESTAMP, ForeignKey, select
+from sqlalchemy.orm import relationship
+from . import Base, BaseClass
+if TYPE_CHECKING:
+    from . import ClientSubmission, Procedure
+
+
+class ImportLedger(Base):
+    """
+    One imported file: its hash and the records it became.
+
+    :ivar id: Primary key auto-incremented identifier.
+    :vartype id: int
+    :ivar digest: sha256 of the file's contents, in hex.
+    :vartype digest: str
+    :ivar kind: What the file was imported as, ``ClientSubmission`` or a results type, e.g. ``Qubit``.
+    :vartype kind: str
+    :ivar filename: Name of the file when it was imported.
+    :vartype filename: str
+    :ivar size: Size of the file in bytes.
+    :vartype size: int
+    :ivar clientsubmission_id: Submission created from the file (with its runs).
+    :vartype clientsubmission_id: int
+    :ivar procedure_id: Procedure the file's results were added to.
+    :vartype procedure_id: int
+    :ivar results: Ids of the Results rows created from the file.
+    :vartype results: List[int]
+    :ivar user: The user who imported the file.
+    :vartype user: str
+    :ivar imported: When the file was imported.
+    :vartype imported: datetime
+    """
+
+    __tablename__ = "_importledger"
+
+    id = Column(INTEGER, primary_key=True, autoincrement=True)  #: primary key
+    digest = Column(String(64), nullable=False, index=True)  #: sha256 of the file
+    kind = Column(String(64), nullable=False)  #: ClientSubmission or the results type
+    filename = Column(String(255))  #: name of the file when imported
+    size = Column(INTEGER)  #: size of the file in bytes
+    clientsubmission_id = Column(INTEGER, ForeignKey("_clientsubmission.id", ondelete="CASCADE",
+                                                     name="fk_IL_clientsubmission_id"), index=True)  #: submission created
+    clientsubmission = relationship("ClientSubmission")  #: submission created
+    procedure_id = Column(INTEGER, ForeignKey("_procedure.id", ondelete="CASCADE",
+                                              name="fk_IL_procedure_id"), index=True)  #: procedure given results
+    procedure = relationship("Procedure")  #: procedure given results
+    results = Column(JSON)  #: ids of the results created
+    user = Column(String(64))  #: who imported the file
+    imported = Column(TIMESTAMP)  #: when the file was imported
+
+    def __repr__(self) -> str:
+        return f"<ImportLedger({self.kind}: {self.filename} {self.digest[:12]})>"
+
+    @classmethod
+    def digest_file(cls, path: Path | str, chunk_size: int = 1 << 20) -> str:
+        """
+        Hashes a file's contents, reading it a chunk at a time.
+
+        :param path: The file.
+        :type path: Path | str
+        :param chunk_size: Bytes read at a time. Defaults to 1 MiB.
+        :type chunk_size: int
+        :return: sha256 in hex.
+        :rtype: str
+        """
+        hasher = sha256()
+        with open(path, "rb") as handle:
+            while chunk := handle.read(chunk_size):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    @classmethod
+    def lookup(cls, path: Path | str | None = None, kind: str = "ClientSubmission",
+               procedure: Procedure | None = None, digest: str | None = None) -> ImportLedger | None:
+        """
+        The earlier import of a file with the same contents, if what it created is still there.
+
+        :param path: The file being imported.
+        :type path: Path | str | None
+        :param kind: What it's being imported as. Defaults to ``ClientSubmission``.
+        :type kind: str
+        :param procedure: For results, the procedure they're for; the same export may be added to another.
+        :type procedure: Procedure | None
+        :param digest: Hash of the file, if already known.
+        :type digest: str | None
+        :return: The most recent matching entry, or None.
+        :rtype: ImportLedger | None
+        """
+        if digest is None:
+            if path is None or not Path(path).is_file():
+                return None
+            digest = cls.digest_file(path)
+        query = select(cls).where(cls.digest == digest, cls.kind == kind)
+        if procedure is not None:
+            query = query.where(cls.procedure_id == procedure.id)
+        query = query.order_by(cls.id.desc()).limit(1)
+        return BaseClass.__database_session__.execute(query).scalars().first()
+
+    @classmethod
+    def record(cls, path: Path | str | None, kind: str = "ClientSubmission",
+               clientsubmission: ClientSubmission | None = None, procedure: Procedure | None = None,
+               results: List[BaseClass] | None = None, digest: str | None = None,
+               commit: bool = True) -> ImportLedger | None:
+        """
+        Notes that a file has been imported and what it created.
+
+        :param path: The imported file. Nothing is recorded for None or a file that's gone.
+        :type path: Path | str | None
+        :param kind: What it was imported as. Defaults to ``ClientSubmission``.
+        :type kind: str
+        :param clientsubmission: Submission created from the file.
+        :type clientsubmission: ClientSubmission | None
+        :param procedure: Procedure the file's results were added to.
+        :type procedure: Procedure | None
+        :param results: Results created from the file.
+        :type results: List[BaseClass] | None
+        :param digest: Hash of the file, if already known.
+        :type digest: str | None
+        :param commit: Commit straight away, otherwise left to the caller's transaction. Defaults to True.
+        :type commit: bool
+        :return: The new entry, or None if there was no file.
+        :rtype: ImportLedger | None
+        """
+        if path is None:
+            return None
+        path = Path(path)
+        if digest is None:
+            if not path.is_file():
+                logger.warning(f"Not recording import of {path}, the file is gone.")
+                return None
+            digest = cls.digest_file(path)
+        session = BaseClass.__database_session__
+        entry = cls(digest=digest, kind=kind, filename=path.name[:255],
+                    size=path.stat().st_size if path.is_file() else None,
+                    clientsubmission=clientsubmission, procedure=procedure,
+                    results=[item.id for item in results or [] if item.id is not None],
+                    user=getuser(), imported=datetime.now())
+        session.add(entry)
+        if commit:
+            session.commit()
+        else:
+            session.flush()
+        logger.info(f"Recorded import of {path.name} as {kind}: {digest}")
+        return entry
+
+
+__all__ = ["ImportLedger"]
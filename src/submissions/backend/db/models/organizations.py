@@ -15,7 +15,7 @@ logger = getLogger(f"submissions.{__name__}")
 from sqlalchemy import Column, String, INTEGER, ForeignKey, Table
 from sqlalchemy.orm import relationship, Query
 from sqlalchemy.ext.hybrid import hybrid_property
-from . import BaseClass, Base
+from . import BaseClass, Base, ReferenceMixin, rendered_once
 from tools import check_authorization, setup_lookup
 from typing import List
 
@@ -30,7 +30,7 @@ clientlab_contact = Table(
 )
 
 
-class ClientLab(BaseClass):
+class ClientLab(BaseClass, ReferenceMixin):
     """
     Represents a client laboratory organization.
 
@@ -470,6 +470,7 @@ class Contact(BaseClass):
         return cls.execute_query(query=query, limit=limit)
 
     @property
+    @rendered_once
     def details_dict(self) -> dict:
         return {k:v for k, v in super().details_dict.items() if k not in ['clientsubmission']}
 
@@ -10,19 +10,23 @@ from logging import getLogger
 logger = getLogger(f"submissions.{__name__}")
 from jinja2 import Template
 from json import loads as jloads, JSONDecodeError
+from math import isfinite
 from numpy import array as nparray, ndenumerate, sum as npsum
 from re import compile as rcompile, Pattern, IGNORECASE, VERBOSE, error as rerror, sub as rsub
 from zipfile import ZipFile
 from pydantic import BaseModel
-from sqlalchemy import Column, String, TIMESTAMP, JSON, INTEGER, ForeignKey, Interval, Table, FLOAT, cast, func, select
+from sqlalchemy import Column, String, TIMESTAMP, JSON, INTEGER, ForeignKey, Interval, Table, FLOAT, Index, cast, func, select, or_, \
+    event as sql_event, inspect as sql_inspect
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.orm import relationship, Query
+from sqlalchemy.orm import relationship, Query, aliased
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.mutable import MutableList
 from datetime import date, datetime, timedelta
-from tools import TimeFill, check_authorization, iterable_enforcer, setup_lookup, flatten_list, timezone
-from typing import Any, Generator, Iterator, List, TYPE_CHECKING, Optional
-from .. import BaseClass, Base, ClientLab
+from pathlib import Path
+from tools import TimeFill, check_authorization, iterable_enforcer, setup_lookup, flatten_list, timezone, \
+    report_result, Report, Alert, AlertStatus
+from typing import Any, Generator, Iterator, List, TYPE_CHECKING, Optional, Tuple
+from .. import BaseClass, Base, ClientLab, ReferenceMixin, VersionedMixin, rendered_once
 from sqlalchemy.exc import OperationalError as AlcOperationalError, IntegrityError as AlcIntegrityError
 from sqlite3 import OperationalError as SQLOperationalError, IntegrityError as SQLIntegrityError
 from backend.validators.shared import parse_optional_datetime, vet_comment
@@ -234,7 +238,7 @@ class Discount(BaseClass):
         super().save()
 
 
-class SubmissionType(BaseClass):
+class SubmissionType(BaseClass, ReferenceMixin):
     """
     Represents a submission type and its default metadata.
 
@@ -454,11 +458,26 @@ class SubmissionType(BaseClass):
         :return: compiled regular expression covering all submission types.
         :rtype: Pattern
         """
-        res = [st.regex for st in cls.query() if st.regex]
-        rstring = rf'{"|".join(res)}'
-        regex = rcompile(rstring, flags=IGNORECASE | VERBOSE)
-        return regex
-    
+        return cls.reference_index().extras['regexes']
+
+    @classmethod
+    def _build_reference_extras(cls, index) -> None:
+        """
+        Precompile the catchall regex and each submission type's own regex.
+
+        :param index: Freshly loaded index of all submission types.
+        :type index: ReferenceIndex
+        """
+        res = {st.name: st.regex for st in index.items if st.regex}
+        rstring = rf'{"|".join(res.values())}'
+        index.extras['regexes'] = rcompile(rstring, flags=IGNORECASE | VERBOSE)
+        index.extras['regex'] = {}
+        for name, regex in res.items():
+            try:
+                index.extras['regex'][name] = rcompile(rf"{regex}", flags=IGNORECASE | VERBOSE)
+            except rerror as e:
+                logger.exception(f"Error compiling regex for {name}: {e}")
+
     @classmethod
     def get_regex(cls, submission_type: SubmissionType | str | dict | None = None) -> Pattern | None:
         """
@@ -471,8 +490,12 @@ class SubmissionType(BaseClass):
         """
         if isinstance(submission_type, dict):
             submission_type = submission_type.get('value', None)
+        if isinstance(submission_type, str):
+            regex = cls.reference_index().extras['regex'].get(submission_type)
+            if regex is not None:
+                return regex
         if not isinstance(submission_type, SubmissionType):
-            submission_type = cls.query(name=submission_type)
+            submission_type = cls.cached(name=submission_type)
         if isinstance(submission_type, list):
             if len(submission_type) > 1:
                 regex = "|".join([item.regex for item in submission_type])
@@ -540,7 +563,7 @@ class SubmissionType(BaseClass):
                 yield dict(sheet=f"{proceduretype.name[:10]} {resultstype.name[:10]}", start_row=1)
 
 
-class ProcedureType(BaseClass):
+class ProcedureType(BaseClass, ReferenceMixin):
     """
     Represents a category of procedure and its permitted reagents, equipment, results, and submission types.
 
@@ -918,15 +941,9 @@ class ProcedureType(BaseClass):
                     )
                     sample_list.append(sample)
 
-        pyd_proc_type = self.to_pydantic()
-        expanded = pyd_proc_type.improved_dict_expand_fields([
-            {"reagentrole": [{"reagent": ["reagentlot"]}]},
-            {"equipmentrole": [{"equipmentroleequipmentassociation": ["equipment", {"process": ["processversion", "tips"]}]}]}
-        ])
-        pyd_proc_type.model_extra.update(expanded)
-
+        # NOTE: Only role names go to the form; OptionCatalog looks up the choices when a dropdown opens.
         pyd = PydProcedure(
-            proceduretype=pyd_proc_type,
+            proceduretype=self.to_pydantic(),
             run=pydrun,
             technician="NA",
             repeat=False,
@@ -994,7 +1011,7 @@ class ProcedureType(BaseClass):
                 yield func.label, func, results_type
             
 
-class Procedure(BaseClass):
+class Procedure(BaseClass, VersionedMixin):
     """
     Represents an executed procedure within a run.
 
@@ -1638,31 +1655,68 @@ class Procedure(BaseClass):
     def sample_count(self) -> int:
         return len(list(self.active_samples))
 
-    def add_results(self, obj, resultstype_name: str):
+    @report_result
+    def add_results(self, obj, resultstype_name: str) -> Report:
         """
-        Add results for this procedure using a manager determined by resultstype_name.
+        Add results for this procedure using a manager determined by resultstype_name. The chosen
+        file is read on a worker thread, then handed to save_results.
 
         :param obj: Parent object owning the procedure UI.
         :type obj: Any
         :param resultstype_name: Name of the result type to add.
         :type resultstype_name: str
-        :return: None
+        :return: Report of the import.
+        :rtype: Report
         """
-        resultstype = resultstype_name.replace(" ", "")
+        report = Report()
         logger.info(f"Add Results! {resultstype_name}")
         from backend.managers import results
+        from frontend.widgets.task_runner import run_in_background
+        results_manager = getattr(results, f"{resultstype_name.replace(' ', '')}Manager")
+        filepath = results_manager.select_file(obj)
+        if not filepath:
+            return report
+        # NOTE: Only the file is read on the worker; parsing and saving need this procedure, so stay here.
+        run_in_background(obj, results_manager.read_input, Path(filepath), name=f"Reading {resultstype_name} results",
+                          on_result=lambda loaded: self.save_results(obj, resultstype_name, loaded))
+        return report
+
+    @report_result
+    def save_results(self, obj, resultstype_name: str, loaded: dict) -> Report:
+        """
+        Parse and save results from a file read by add_results. A file already imported for this
+        procedure (same contents, whatever its name) is not added again.
+
+        :param obj: Parent object owning the procedure UI.
+        :type obj: Any
+        :param resultstype_name: Name of the result type to add.
+        :type resultstype_name: str
+        :param loaded: Output of DefaultManager.read_input.
+        :type loaded: dict
+        :return: Report of the import.
+        :rtype: Report
+        """
+        report = Report()
+        from backend.managers import results
         from backend.validators.pydant import PydResults
-        results_manager = getattr(results, f"{resultstype}Manager")
-        rs = results_manager(procedure=self, parent=obj)
+        results_manager = getattr(results, f"{resultstype_name.replace(' ', '')}Manager")
+        rs = results_manager(procedure=self, parent=obj, input_object=loaded['input_object'], digest=loaded['digest'])
+        if rs.previous_import is not None:
+            report.add_result(Alert(msg=f"{rs.previous_import.filename} was already imported for {self.name} "
+                                        f"on {rs.previous_import.imported:%Y-%m-%d %H:%M}, it hasn't been added again.",
+                                    owner=self.__class__.__name__, status=AlertStatus.WARNING.value))
+            return report
         procedure_results = rs.procedure_to_pydantic()
         samples_results: Generator[PydResults] = rs.samples_to_pydantic()
         if procedure_results:
             procedure_sql = procedure_results.to_sql()
         else:
-            return
+            rs.record_import()
+            return report
         if isinstance(procedure_sql, tuple):
             procedure_sql = procedure_sql[0]
         procedure_sql.save()
+        rs.saved_results.append(procedure_sql)
         for sample in samples_results:
             sample_sql = sample.to_sql()
             if isinstance(sample_sql, tuple):
@@ -1682,6 +1736,9 @@ class Procedure(BaseClass):
                     else:
                         sample_sql.sampleprocedureassociation = assoc
             sample_sql.save()
+            rs.saved_results.append(sample_sql)
+        rs.record_import()
+        return report
 
     def edit(self, obj):
         """
@@ -1750,6 +1807,7 @@ class Procedure(BaseClass):
         
     # TODO: Convert references to details_dict_expand_fields calls so I can trim this down.
     @property
+    @rendered_once
     def details_dict(self) -> dict:
         """
         Produce a JSON-serializable details dictionary for this procedure.
@@ -1764,6 +1822,7 @@ class Procedure(BaseClass):
         output['equipment'] = [equipment.details_dict for equipment in self.procedureequipmentassociation]
         return output
 
+    @rendered_once
     def to_pydantic(self, **kwargs):
         """
         Convert this Procedure into its pydantic representation.
@@ -1796,23 +1855,8 @@ class Procedure(BaseClass):
                 sample.control_type = ('positivecontrol' if sample.is_control == 1 else 'negativecontrol' if sample.is_control == -1 else 'sample')
             assert hasattr(sample, "sample_id")
             sample_list.append(sample)
-        # Build a PydProcedureType instance and attach expanded relationship
-        # dicts (reagentrole/equipmentrole) to its model_extra. Mark which
-        # roles are already present on this Procedure with a 'filled' flag.
-        # As of right here, sample list is correct       
-        try:
-            pyd_proc_type = self.proceduretype.to_pydantic()
-            expanded = pyd_proc_type.improved_dict_expand_fields([
-                {"reagentrole": [{"reagent": ["reagentlot"]}]},
-                {"equipmentrole": [{"equipmentroleequipmentassociation": ["equipment", {"process": ["processversion", "tips"]}]}]}
-            ])
-            # annotate filled flags on expanded entries
-            # attach expanded dicts so templates can read them via proceduretype['reagentrole']
-            pyd_proc_type.model_extra.update(expanded)
-        except Exception as e:
-            logger.error(f"Couldn't build expanded proceduretype for {self.__class__.__qualname__} with name {self.name}")
-            logger.exception(f"Error: {e}")
-            pyd_proc_type = self.proceduretype.to_pydantic() if hasattr(self.proceduretype, 'to_pydantic') else self.proceduretype
+        # NOTE: As of right here, sample list is correct. The form's dropdowns are filled by OptionCatalog.
+        pyd_proc_type = self.proceduretype.to_pydantic() if hasattr(self.proceduretype, 'to_pydantic') else self.proceduretype
         output = dict(
             proceduretype=pyd_proc_type,
             run=self.run.to_pydantic(),
@@ -2232,6 +2276,7 @@ class Results(BaseClass):
     def write_sheet_name(self) -> str:
         return f"{self.proceduretype.name[:10]} {self.resultstype.name[:10]}"
 
+    @rendered_once
     def to_pydantic(self, pyd_model_name: str | None = None, **kwargs):
         output = super().to_pydantic(pyd_model_name=pyd_model_name, **kwargs)
         # id is needed here due to duplication problems when procedure is edited.
@@ -2245,7 +2290,202 @@ class Results(BaseClass):
         return output
 
 
-class ResultsType(BaseClass):
+class ResultsValue(Base):
+    """
+    One value from a Results payload, flattened so reports can filter and aggregate in SQL
+    instead of walking every JSON blob. Rows are rewritten whenever Results._result is saved.
+
+    :ivar id: Primary key identifier
+    :vartype id: int
+    :ivar results_id: Foreign key to the Results the value came from
+    :vartype results_id: int
+    :ivar path: Keys leading to the dict holding the value, joined by path_separator ('' at the top level)
+    :vartype path: str
+    :ivar depth: Number of keys in path
+    :vartype depth: int
+    :ivar key: Key of the value in that dict
+    :vartype key: str
+    :ivar position: Order of the value within the payload
+    :vartype position: int
+    :ivar number: The value as a float, if it is (or reads as) a number
+    :vartype number: float|None
+    :ivar value: The value as stored in the payload
+    :vartype value: Any
+    """
+
+    __tablename__ = "_resultsvalue"
+
+    # NOTE: A control character, which can't appear in a worksheet cell, so keys holding '-' can't collide.
+    path_separator = "\x1f"
+
+    id = Column(INTEGER, primary_key=True, autoincrement=True)  #: primary key
+    results_id = Column(INTEGER, ForeignKey("_results.id", ondelete="CASCADE", name="fk_RV_results_id"),
+                        nullable=False)
+    path = Column(String(255), nullable=False, default="")
+    depth = Column(INTEGER, nullable=False, default=0)
+    key = Column(String(128), nullable=False)
+    position = Column(INTEGER, nullable=False, default=0)
+    number = Column(FLOAT)
+    value = Column(JSON)
+
+    __table_args__ = (
+        Index("ix_resultsvalue_results_path", "results_id", "path"),
+        Index("ix_resultsvalue_key_number", "key", "number"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ResultsValue({self.results_id}: {self.path}/{self.key}={self.value!r})>"
+
+    @classmethod
+    def flatten(cls, result: dict | None) -> Generator[dict, None, None]:
+        """
+        Walks a Results payload depth first, yielding a row for every value that isn't a dict.
+
+        :param result: Results._result
+        :type result: dict|None
+        :return: Column values for ResultsValue rows, results_id excluded.
+        :rtype: Generator[dict, None, None]
+        """
+        position = 0
+
+        def _walk(data: dict, path: list):
+            nonlocal position
+            for key, value in data.items():
+                if isinstance(value, dict):
+                    yield from _walk(value, path + [str(key)])
+                    continue
+                yield dict(path=cls.path_separator.join(path), depth=len(path), key=str(key), position=position,
+                           number=cls.as_number(value), value=value)
+                position += 1
+
+        if isinstance(result, dict):
+            yield from _walk(result, [])
+
+    @classmethod
+    def split_path(cls, path: str) -> Tuple[str, ...]:
+        """
+        :param path: ResultsValue.path
+        :type path: str
+        :return: The keys leading to the dict holding the value, empty at the top level.
+        :rtype: tuple[str, ...]
+        """
+        return tuple(path.split(cls.path_separator)) if path else ()
+
+    @classmethod
+    def as_number(cls, value: Any) -> float | None:
+        """
+        :param value: A value from a Results payload.
+        :type value: Any
+        :return: The value as a float if it is a finite number or a string that reads as one.
+        :rtype: float|None
+        """
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            return None
+        try:
+            number = float(value)
+        except ValueError:
+            return None
+        return number if isfinite(number) else None
+
+    @classmethod
+    def replace_rows(cls, connection, results_id: int, result: dict | None):
+        """
+        Rewrites the rows for one Results on the flush's connection.
+
+        :param connection: Connection of the flush in progress.
+        :param results_id: Results.id
+        :type results_id: int
+        :param result: Results._result
+        :type result: dict|None
+        """
+        table = cls.__table__
+        connection.execute(table.delete().where(table.c.results_id == results_id))
+        rows = [dict(results_id=results_id, **row) for row in cls.flatten(result)]
+        if rows:
+            connection.execute(table.insert(), rows)
+
+    @classmethod
+    def query_report_rows(cls, start_date: date, end_date: date, submissiontype: str | list | None = None,
+                          include: List[str] | None = None, container_key: str | None = None) -> list:
+        """
+        Values of sample results on completed runs, with the sample and submission they belong to,
+        in a single query.
+
+        :param start_date: Earliest submitted date.
+        :type start_date: date
+        :param end_date: Latest submitted date.
+        :type end_date: date
+        :param submissiontype: Submission type name(s). Defaults to all.
+        :type submissiontype: str|list|None
+        :param include: Any of 'positive', 'negative' and 'samples'. Defaults to none.
+        :type include: list[str]|None
+        :param container_key: If given, nested values are only returned from dicts that hold this key.
+                              Top level values are always returned.
+        :type container_key: str|None
+        :return: Rows of (results_id, procedure_id, submitted_date, sample_id, is_control, path, depth, key, value)
+                 in submission, procedure, sample and payload order.
+        :rtype: list[Row]
+        """
+        from backend.db.models import ClientSubmission, Run, Sample, ProcedureSampleAssociation
+        container = aliased(cls)
+        query = (
+            select(Results.id.label("results_id"), Results.procedure_id,
+                   ClientSubmission._submitted_date.label("submitted_date"), Sample.sample_id,
+                   Sample._is_control.label("is_control"), cls.path, cls.depth, cls.key, cls.value)
+            .join(Results, Results.id == cls.results_id)
+            .join(ProcedureSampleAssociation, ProcedureSampleAssociation.id == Results.assoc_id)
+            .join(Sample, Sample.id == ProcedureSampleAssociation.sample_id)
+            .join(Procedure, Procedure.id == ProcedureSampleAssociation.procedure_id)
+            .join(Run, Run.id == Procedure.run_id)
+            .join(ClientSubmission, ClientSubmission.id == Run.clientsubmission_id)
+            .where(ClientSubmission._submitted_date.between(
+                ClientSubmission.rectify_query_date(start_date, timefill=TimeFill.MIN),
+                ClientSubmission.rectify_query_date(end_date, timefill=TimeFill.MAX)))
+            .where(Run._completed_date.is_not(None))
+        )
+        control_filter = Sample.control_filter(include)
+        if control_filter is not None:
+            query = query.where(control_filter)
+        match submissiontype:
+            case list() | tuple():
+                query = query.where(ClientSubmission.submissiontype_name.in_(list(submissiontype)))
+            case str():
+                query = query.where(ClientSubmission.submissiontype_name == submissiontype)
+            case _:
+                pass
+        if container_key is not None:
+            holds_key = (
+                select(container.id)
+                .where(container.results_id == cls.results_id, container.path == cls.path,
+                       container.key == container_key)
+                .exists()
+            )
+            query = query.where(or_(cls.depth == 0, holds_key))
+        query = query.order_by(ClientSubmission.id, Run.id, Procedure.id, ProcedureSampleAssociation.id,
+                               Results.id, cls.position)
+        return BaseClass.__database_session__.execute(query).all()
+
+
+def index_results_values(mapper, connection, target):
+    """
+    Keeps ResultsValue in step with Results._result whenever a changed payload is flushed.
+    Runs on the flush's connection, like update_log, so the rows are written in the same
+    transaction as the payload.
+
+    :param mapper: Results mapper
+    :param connection: Connection of the flush in progress.
+    :param target: Results being inserted or updated
+    """
+    if not sql_inspect(target).attrs._result.history.has_changes():
+        return
+    ResultsValue.replace_rows(connection, target.id, target._result)
+
+
+sql_event.listen(Results, "after_insert", index_results_values)
+sql_event.listen(Results, "after_update", index_results_values)
+
+
+class ResultsType(BaseClass, ReferenceMixin):
 
     id = Column(INTEGER, primary_key=True)  #: primary key
     name = Column(String(64), nullable=False, unique=True)
@@ -2415,16 +2655,19 @@ class ResultsType(BaseClass):
         else:
             raise ValueError(f"Unmatched type {type(value)} for {self.__class__.__qualname__}._sample_key_order")
 
+    @rendered_once
     def to_pydantic(self, pyd_model_name: str | None = None, **kwargs) -> BaseModel:
         return super().to_pydantic(pyd_model_name, **kwargs)
 
 
 from .equipment import *
 from .reagents import *
+from .options import *
 
 
-__all__ = ["Discount", "SubmissionType", "ProcedureType", "Procedure", "Results", "ResultsType",
+__all__ = ["Discount", "SubmissionType", "ProcedureType", "Procedure", "Results", "ResultsValue", "ResultsType",
            "EquipmentRole", "Equipment", "EquipmentRoleEquipmentAssociation", "Process", "ProcessVersion", 
            "Tips", "TipsLot", "ProcedureEquipmentTipslotAssociation", "ProcedureEquipmentAssociation", "ProcedureTypeEquipmentRoleAssociation",
            "equipmentroleequipmentassociation_process", "process_tips",
-           "ReagentRole", "Reagent", "ReagentLot", "ReagentRoleReagentAssociation", "ProcedureTypeReagentRoleAssociation", "ProcedureReagentLotAssociation"]
+           "ReagentRole", "Reagent", "ReagentLot", "ReagentRoleReagentAssociation", "ProcedureTypeReagentRoleAssociation", "ProcedureReagentLotAssociation",
+           "OptionCatalog"]
@@ -15,7 +15,7 @@ from datetime import datetime
 from tools import check_authorization, setup_lookup, flatten_list, timezone, TimeFill
 from backend.validators.shared import parse_optional_datetime, coerce_int_to_bool, parse_expiry, vet_comment
 from typing import List, Any, TYPE_CHECKING
-from .. import BaseClass, Base, LogMixin
+from .. import BaseClass, Base, LogMixin, ReferenceMixin, rendered_once
 from . import ProcedureType, Procedure
 if TYPE_CHECKING:
     from backend.validators.pydant import PydProcedureEquipmentAssociation
@@ -54,7 +54,7 @@ process_tips = Table(
 )
 
 
-class EquipmentRole(BaseClass):
+class EquipmentRole(BaseClass, ReferenceMixin):
     """
     Represents an equipment role that can be associated with procedure types and equipment instances.
 
@@ -1123,6 +1123,7 @@ class ProcessVersion(BaseClass):
         self._active = int(coerce_int_to_bool(value))
 
     @property
+    @rendered_once
     def details_dict(self) -> dict:
         return {k: v for k, v in super().details_dict.items() if k not in ['procedureequipmentassociation']}
     #     output = super().details_dict
@@ -1724,6 +1725,7 @@ class TipsLot(BaseClass, LogMixin):
         return cls.execute_query(query=query, limit=limit)
 
     @property
+    @rendered_once
     def details_dict(self) -> dict:
         return {k: v for k, v in super().details_dict.items() if k not in ['procedureequipmenttipslotassociation']}
     
@@ -2313,6 +2315,7 @@ class ProcedureEquipmentAssociation(BaseClass):
     def comment(self, value):
         self._comment = vet_comment(value, current=self._comment)
 
+    @rendered_once
     def to_pydantic(self) -> PydProcedureEquipmentAssociation:
         """
         Return a pydantic model representation for this association.
@@ -2371,6 +2374,7 @@ class ProcedureEquipmentAssociation(BaseClass):
         return cls.execute_query(query=query, limit=limit, **kwargs)
 
     @property
+    @rendered_once
     def details_dict(self) -> dict:
         return {k: v for k, v in super().details_dict.items() if k not in ['equipmentprocedureassociation']}
     #     """
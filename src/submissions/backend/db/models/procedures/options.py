@@ -0,0 +1,136 @@
+"""
+Dropdown options for the procedure creation form, looked up per role on demand.
+"""
+from __future__ import annotations
+from logging import getLogger
+logger = getLogger(f"submissions.{__name__}")
+from typing import Any, Callable, TYPE_CHECKING
+from . import ProcedureType
+from .equipment import EquipmentRole, EquipmentRoleEquipmentAssociation, ProcessVersion
+from .reagents import ReagentRole
+if TYPE_CHECKING:
+    from backend.validators.pydant import PydProcedureType
+
+
+class OptionCatalog(object):
+    """
+    Reagent lots, equipment, process versions and tips offered by the procedure form.
+
+    Each list is queried the first time its dropdown asks for it and kept for the life
+    of the catalog, i.e. one form session, so opening a form doesn't depend on the size
+    of the inventory and reopening a dropdown doesn't query again.
+
+    :param proceduretype: Procedure type the form is for; scopes the reagents offered.
+    :type proceduretype: ProcedureType | PydProcedureType | str | None
+    """
+
+    def __init__(self, proceduretype: ProcedureType | PydProcedureType | str | None = None):
+        self.proceduretype = proceduretype
+        self.cache = {}
+
+    def _cached(self, key: tuple, lookup: Callable[[], list]) -> list:
+        if key not in self.cache:
+            try:
+                self.cache[key] = lookup()
+            except Exception as e:
+                # NOTE: A failed lookup shows up as an empty dropdown either way; don't cache it.
+                logger.exception(f"Couldn't look up options for {key}: {e}")
+                return []
+        return list(self.cache[key])
+
+    def invalidate(self, *key: Any):
+        """
+        Drops cached lists whose key starts with the given parts, e.g. ('reagentlot', role)
+        after a new lot is added for that role. No parts clears everything.
+
+        :param key: Leading parts of the keys to drop.
+        :type key: Any
+        """
+        for cached in [item for item in self.cache if item[:len(key)] == key]:
+            del self.cache[cached]
+
+    def reagent_names(self, reagentrole: str) -> list[str]:
+        """
+        Reagents offered for a role, those the procedure type has used before.
+
+        :param reagentrole: Name of the reagent role.
+        :type reagentrole: str
+        :return: Reagent names.
+        :rtype: list[str]
+        """
+        def _lookup():
+            role = ReagentRole.query(name=reagentrole, limit=1)
+            if not role:
+                return []
+            return [item.name for item in role.get_reagents(proceduretype=self.proceduretype)]
+        return self._cached(("reagent", reagentrole), _lookup)
+
+    def reagentlot_names(self, reagentrole: str) -> list[str]:
+        """
+        Active lots of the reagents offered for a role, as 'reagent - lot'.
+
+        :param reagentrole: Name of the reagent role.
+        :type reagentrole: str
+        :return: Reagent lot names.
+        :rtype: list[str]
+        """
+        def _lookup():
+            role = ReagentRole.query(name=reagentrole, limit=1)
+            if not role:
+                return []
+            return [lot.name for reagent in role.get_reagents(proceduretype=self.proceduretype)
+                    for lot in reagent.reagentlot if lot.active]
+        return self._cached(("reagentlot", reagentrole), _lookup)
+
+    def equipment_names(self, equipmentrole: str) -> list[str]:
+        """
+        Equipment that can fill a role.
+
+        :param equipmentrole: Name of the equipment role.
+        :type equipmentrole: str
+        :return: Equipment names.
+        :rtype: list[str]
+        """
+        def _lookup():
+            role = EquipmentRole.query(name=equipmentrole)
+            if not role:
+                return []
+            return [item.name for item in role.equipment]
+        return self._cached(("equipment", equipmentrole), _lookup)
+
+    def processversion_names(self, equipmentrole: str, equipment: str) -> list[str]:
+        """
+        Active process versions for a piece of equipment in a role.
+
+        :param equipmentrole: Name of the equipment role.
+        :type equipmentrole: str
+        :param equipment: Name of the equipment.
+        :type equipment: str
+        :return: Process version names.
+        :rtype: list[str]
+        """
+        def _lookup():
+            assoc = EquipmentRoleEquipmentAssociation.query(equipmentrole=equipmentrole, equipment=equipment, limit=1)
+            if not assoc:
+                return []
+            return [item.name for process in assoc.process for item in process.processversion if item.active]
+        return self._cached(("processversion", equipmentrole, equipment), _lookup)
+
+    def tipslot_names(self, processversion: str) -> list[str]:
+        """
+        Active tip lots for the process a process version belongs to.
+
+        :param processversion: Name of the process version.
+        :type processversion: str
+        :return: Tips lot names.
+        :rtype: list[str]
+        """
+        def _lookup():
+            version = ProcessVersion.query(name=processversion, limit=1)
+            if not version or getattr(version, "process", None) is None:
+                return []
+            return [lot.name for tips in version.process.tips for lot in tips.tipslot if lot.active]
+        return self._cached(("tipslot", processversion), _lookup)
+
+
+__all__ = ["OptionCatalog"]
@@ -13,11 +13,11 @@ from datetime import datetime, timedelta
 from tools import check_authorization, classproperty, iterable_enforcer, setup_lookup, timezone
 from typing import List
 from backend.validators.shared import parse_expiry, coerce_int_to_bool, vet_comment
-from .. import BaseClass, LogMixin
+from .. import BaseClass, LogMixin, ReferenceMixin, VersionedMixin, rendered_once
 from . import ProcedureType, Procedure
 
 
-class ReagentRole(BaseClass):
+class ReagentRole(BaseClass, ReferenceMixin):
     """
     Represents the relationship between reagents and the roles they play in a procedure.
 
@@ -465,7 +465,7 @@ class Reagent(BaseClass, LogMixin):
         return cls.execute_query(query=query, limit=limit, **kwargs)
 
     
-class ReagentLot(BaseClass):
+class ReagentLot(BaseClass, VersionedMixin):
     """
     Tracks a specific reagent lot and its expiry information.
 
@@ -712,6 +712,7 @@ class ReagentLot(BaseClass):
         return cls.execute_query(query=query, limit=limit)
 
     @property
+    @rendered_once
     def details_dict(self) -> dict:
         return {k: v for k,v in super().details_dict.items() if k not in ("reagentlotprocedureassociation", "procedure")}
 
@@ -1355,6 +1356,7 @@ class ProcedureReagentLotAssociation(BaseClass):
         return cls.execute_query(query=query, limit=limit)
 
     @property
+    @rendered_once
     def details_dict(self) -> dict:
         """
         Return a merged details dictionary for this procedure/reagent lot association.
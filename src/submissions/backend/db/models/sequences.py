@@ -0,0 +1,117 @@
+"""
+Named counters for allocating plate numbers without scanning the tables they number.
+
+Provides the :class:`IDSequence` model. Each row holds the last value handed out for one
+name; allocation is a single ``UPDATE ... RETURNING`` inside the caller's transaction, so
+two users importing at once can never be given the same number, and a number taken for a
+record that is never saved goes back when the transaction is rolled back.
+"""
+from __future__ import annotations
+from logging import getLogger
+logger = getLogger(f"submissions.{__name__}")
+from typing import Callable
+from sqlalchemy import Column, INTEGER, String, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+from . import Base, BaseClass
+
+
+class IDSequence(Base):
+    """
+    Counter table behind :meth:`next_value`.
+
+    :ivar name: Name of the sequence, e.g. ``RSL-BC-20261018`` for that day's plate numbers.
+    :vartype name: str
+    :ivar value: Last value handed out.
+    :vartype value: int
+    """
+
+    __tablename__ = "_idsequence"
+
+    name = Column(String(128), primary_key=True)  #: name of the sequence
+    value = Column(INTEGER, nullable=False, default=0)  #: last value handed out
+
+    def __repr__(self) -> str:
+        return f"<IDSequence({self.name}: {self.value})>"
+
+    @classmethod
+    def next_value(cls, name: str, increment: int = 1, seed: Callable[[Connection], int] | None = None,
+                   connection: Connection | None = None, engine: Engine | None = None) -> int:
+        """
+        Allocates the next ``increment`` values of a sequence and returns the last of them.
+
+        The first call for a name starts counting after ``seed(connection)`` (0 if no seed is
+        given), so numbering carries on from data that predates the sequence. The counter is
+        updated in the caller's transaction: it stays locked until that commits, and rolling
+        back (e.g. a cancelled form) hands the values out again instead of leaving a gap.
+
+        :param name: Name of the sequence.
+        :type name: str
+        :param increment: Number of values to allocate. Defaults to 1.
+        :type increment: int
+        :param seed: Returns the value to count on from when the sequence is first used.
+        :type seed: Callable[[Connection], int] | None
+        :param connection: Connection to allocate on. Defaults to the app session's.
+        :type connection: Connection | None
+        :param engine: Allocate on a short transaction of this engine's instead, committed straight away.
+        :type engine: Engine | None
+        :return: The last value allocated.
+        :rtype: int
+        """
+        if increment < 1:
+            raise ValueError(f"Sequence increment must be positive, got {increment}")
+        if engine is not None:
+            with engine.begin() as connection:
+                return cls._allocate(connection, name=name, increment=increment, seed=seed)
+        if connection is None:
+            session = BaseClass.__database_session__
+            connection = session.connection()
+            # NOTE: Not a flush, but a rollback loses it just the same; BaseClass.save mustn't retry past it.
+            session.info["flushed"] = True
+        return cls._allocate(connection, name=name, increment=increment, seed=seed)
+
+    @classmethod
+    def peek_value(cls, name: str, seed: Callable[[Connection], int] | None = None,
+                   connection: Connection | None = None) -> int:
+        """
+        The value next_value would hand out now, without taking it; for proposing a name
+        before the record is saved.
+
+        :param name: Name of the sequence.
+        :type name: str
+        :param seed: As for next_value.
+        :type seed: Callable[[Connection], int] | None
+        :param connection: Connection to read on. Defaults to the app session's.
+        :type connection: Connection | None
+        :return: The next value.
+        :rtype: int
+        """
+        connection = connection or BaseClass.__database_session__.connection()
+        current = connection.execute(select(cls.__table__.c.value).where(cls.__table__.c.name == name)).scalar()
+        if current is None:
+            current = int(seed(connection)) if seed else 0
+        return current + 1
+
+    @classmethod
+    def _allocate(cls, connection: Connection, name: str, increment: int,
+                  seed: Callable[[Connection], int] | None) -> int:
+        table = cls.__table__
+        statement = (update(table).where(table.c.name == name).values(value=table.c.value + increment)
+                     .returning(table.c.value).with_hint("WITH (UPDLOCK, HOLDLOCK)", dialect_name="mssql"))
+        for _ in range(2):
+            allocated = connection.execute(statement).scalar()
+            if allocated is not None:
+                return allocated
+            start = int(seed(connection)) if seed else 0
+            try:
+                with connection.begin_nested():
+                    connection.execute(insert(table).values(name=name, value=start))
+            except IntegrityError:
+                # NOTE: Someone else started this sequence between the update and the insert.
+                logger.debug(f"Sequence {name} was started concurrently, retrying.")
+                continue
+            logger.info(f"Started sequence {name} after {start}")
+        raise RuntimeError(f"Couldn't allocate from sequence {name}")
+
+
+__all__ = ["IDSequence"]
@@ -17,18 +17,18 @@ from inspect import isclass
 from operator import attrgetter
 from pandas import DataFrame
 from sqlalchemy.ext.hybrid import hybrid_property
-from . import BaseClass, SubmissionType, ClientLab, Contact, LogMixin, Procedure
+from . import BaseClass, SubmissionType, ClientLab, Contact, LogMixin, VersionedMixin, Procedure, rendered_once
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtCore import Qt
-from sqlalchemy import Column, String, TIMESTAMP, INTEGER, ForeignKey, JSON, FLOAT, UniqueConstraint, cast, func, select, or_
-from sqlalchemy.orm import relationship, Query, declared_attr
+from sqlalchemy import Column, String, TIMESTAMP, INTEGER, ForeignKey, JSON, FLOAT, UniqueConstraint, cast, func, select, or_, and_
+from sqlalchemy.orm import relationship, Query, declared_attr, contains_eager
 from sqlalchemy.ext.associationproxy import association_proxy, _AssociationList
 from sqlalchemy.exc import OperationalError as AlcOperationalError, IntegrityError as AlcIntegrityError
 from sqlalchemy.ext.mutable import MutableList
 from sqlite3 import OperationalError as SQLOperationalError, IntegrityError as SQLIntegrityError
 from tools import (
     TimeFill, check_authorization, convert_row_column_to_well, flatten_list, setup_lookup, jinja_template_loading, create_holidays_for_year,
-    is_power_user, Report, get_application_from_parent, iterable_enforcer
+    is_power_user, Report, get_application_from_parent, iterable_enforcer, ctx
 )
 from backend.validators.shared import parse_optional_datetime, vet_comment
 from datetime import datetime, date
@@ -39,7 +39,7 @@ if TYPE_CHECKING:
     from backend.validators.pydant import PydSample
 
 
-class ClientSubmission(BaseClass, LogMixin):
+class ClientSubmission(BaseClass, LogMixin, VersionedMixin):
     """
     Object for the client procedure from which all procedure objects will be created.
     """
@@ -505,12 +505,16 @@ class ClientSubmission(BaseClass, LogMixin):
 
     def add_run(self, obj):
         from frontend.widgets.sample_checker import SampleChecker
+        from backend.validators import RSLNamer, SourcedField
         samples = [assoc.to_pydantic() for assoc in self.clientsubmissionsampleassociation]
         run = Run.construct_dummy_run(clientsubmission=self)
         checker = SampleChecker(parent=None, title="Create Run", samples=samples, run=run)
         if checker.exec():
             QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
             try:
+                # NOTE: The dummy run only proposed a plate number; take it now it's being saved.
+                run.rsl_plate_number = SourcedField(value=RSLNamer.construct_new_plate_name(data=self.details_dict),
+                                                    missing=False)
                 # Rank the selected pydantic samples, then convert them back to SQL Sample
                 selected_samples = []
                 for iii, sample in enumerate(samples, start=1):
@@ -571,6 +575,7 @@ class ClientSubmission(BaseClass, LogMixin):
     #     output['comment'] = self.comment
     #     return output
 
+    @rendered_once
     def to_pydantic(self, filepath: Path | str | None = None, **kwargs):
         output = super().to_pydantic(filepath=filepath, **kwargs)
         return output
@@ -608,7 +613,8 @@ class ClientSubmission(BaseClass, LogMixin):
     @check_authorization
     def delete(self, obj=None):
         """
-        Performs backup and deletes this instance from database.
+        Deletes this instance, its runs and everything under them from database, copying
+        them to the archive database first if 'database: archive:' is set in config.yml.
 
         Args:
             obj (_type_, optional): Parent widget. Defaults to None.
@@ -617,13 +623,11 @@ class ClientSubmission(BaseClass, LogMixin):
             e: SQLIntegrityError or SQLOperationalError if problem with commit.
         """
         from frontend.widgets.pop_ups import QuestionAsker
+        from backend.db.purge import purge
         msg = QuestionAsker(title="Delete?", message=f"Are you sure you want to delete {self.submitter_plate_id}?\n")
         if msg.exec():
-            self.run = []
-            self.clientsubmissionsampleassociation = []
-            self.__database_session__.delete(self)
             try:
-                self.__database_session__.commit()
+                purge([self], archive=ctx.database.get("archive"))
             except (SQLIntegrityError, SQLOperationalError, AlcIntegrityError, AlcOperationalError) as e:
                 self.__database_session__.rollback()
                 raise e
@@ -632,30 +636,65 @@ class ClientSubmission(BaseClass, LogMixin):
             except AttributeError:
                 logger.exception("App will not refresh data at this time.")
 
-    def get_procedure_sample_results(self, include=Set[Literal['positive', 'negative', 'samples']]) -> Generator[Results, None, None]:
+    def get_procedure_sample_results(self, include: Set[Literal['positive', 'negative', 'samples']] | None = None) -> Generator[Results, None, None]:
         """
-        Gets samples associated with this submission that are controls based on their sample_id starting with "blank", "na", "none", or being empty.
+        Gets the results of this submission's samples and/or controls on its completed runs.
+
+        Args:
+            include (Set[Literal['positive', 'negative', 'samples']] | None, optional): Kinds of sample to include. Defaults to none.
 
         Returns:
-            list: List of control samples
+            Generator[Results, None, None]: Results in run, procedure and sample order.
         """
-        for run in self.run:
-            if run.completed_date is None:
-                continue
-            for procedure in run.procedure:
-                for proceduresampleassociation in procedure.proceduresampleassociation:
-                    if proceduresampleassociation.sample.is_control == 1 and "positive" not in include:
-                        continue
-                    elif proceduresampleassociation.sample.is_control == 0 and "samples" not in include:
-                        continue
-                    elif proceduresampleassociation.sample.is_control == -1 and "negative" not in include:
-                        continue
-                    else:
-                        for result in proceduresampleassociation.results:
-                            yield result
+        yield from self.query_procedure_sample_results([self], include=include)
+
+    @classmethod
+    def query_procedure_sample_results(cls, clientsubmissions: List[ClientSubmission | str | int],
+                                       include: Set[Literal['positive', 'negative', 'samples']] | None = None) -> List[Results]:
+        """
+        Results of samples and/or controls on the completed runs of any number of submissions, in one
+        statement, with each result's procedure-sample association and sample loaded alongside it.
+
+        Args:
+            clientsubmissions (List[ClientSubmission | str | int]): Submissions, by object, submitter plate id or id.
+            include (Set[Literal['positive', 'negative', 'samples']] | None, optional): Kinds of sample to include. Defaults to none.
+
+        Returns:
+            List[Results]: Results in submission, run, procedure and sample order.
+        """
+        from . import Results
+        ids, names = [], []
+        for clientsubmission in clientsubmissions:
+            match clientsubmission:
+                case ClientSubmission():
+                    ids.append(clientsubmission.id)
+                case int():
+                    ids.append(clientsubmission)
+                case str():
+                    names.append(clientsubmission)
+                case _:
+                    logger.error(f"Can't get results for {clientsubmission}")
+        if not ids and not names:
+            return []
+        query = (
+            select(Results)
+            .join(ProcedureSampleAssociation, ProcedureSampleAssociation.id == Results.assoc_id)
+            .join(Sample, Sample.id == ProcedureSampleAssociation.sample_id)
+            .join(Procedure, Procedure.id == ProcedureSampleAssociation.procedure_id)
+            .join(Run, Run.id == Procedure.run_id)
+            .join(ClientSubmission, ClientSubmission.id == Run.clientsubmission_id)
+            .where(or_(ClientSubmission.id.in_(ids), ClientSubmission._submitter_plate_id.in_(names)))
+            .where(Run._completed_date.is_not(None))
+            .options(contains_eager(Results._sampleprocedureassociation).contains_eager(ProcedureSampleAssociation._sample))
+            .order_by(ClientSubmission.id, Run.id, Procedure.id, ProcedureSampleAssociation.id, Results.id)
+        )
+        control_filter = Sample.control_filter(include)
+        if control_filter is not None:
+            query = query.where(control_filter)
+        return list(cls.__database_session__.execute(query).scalars().unique())
 
         
-class Run(BaseClass, LogMixin):
+class Run(BaseClass, LogMixin, VersionedMixin):
     """
     Object for an entire procedure procedure. Links to client procedure, reagents, equipment, process
     """
@@ -967,6 +1006,7 @@ class Run(BaseClass, LogMixin):
             yield details
 
     @property
+    @rendered_once
     def details_dict(self) -> dict:
         output = super().details_dict
         # output['plate_number'] = self.plate_number
@@ -1036,8 +1076,71 @@ class Run(BaseClass, LogMixin):
         Returns:
             list: list of hitpick dictionaries for each sample
         """
-        output_list = [assoc.hitpicked for assoc in self.runsampleassociation]
-        return output_list
+        return self.hitpick_lists([self]).get(self.rsl_plate_number, [])
+
+    @classmethod
+    def hitpick_lists(cls, runs: List[Run | str | int], samples: List[Sample] | None = None) -> dict[str, list]:
+        """
+        Hitpick entries for any number of runs in one pass: associations, samples and their
+        position in each run's latest procedure come from a single query, and every tooltip
+        is rendered from the same template.
+
+        Args:
+            runs (List[Run | str | int]): Runs, by object, rsl plate number or id.
+            samples (List[Sample] | None, optional): Only these samples. Defaults to None, i.e. all of them.
+
+        Returns:
+            dict[str, list]: Hitpick dictionaries in run rank order, keyed by rsl plate number.
+        """
+        from . import ProcedureSampleAssociation
+        ids, names = [], []
+        for run in runs:
+            match run:
+                case Run():
+                    ids.append(run.id)
+                case int():
+                    ids.append(run)
+                case str():
+                    names.append(run)
+                case _:
+                    logger.error(f"Can't hitpick {run}")
+        if not ids and not names:
+            return {}
+        # NOTE: One row per run/sample: where the sample sits in the most recent procedure on the run.
+        position = (
+            select(Procedure.run_id, ProcedureSampleAssociation.sample_id, ProcedureSampleAssociation.row,
+                   ProcedureSampleAssociation.column,
+                   func.row_number().over(partition_by=(Procedure.run_id, ProcedureSampleAssociation.sample_id),
+                                          order_by=Procedure.id.desc()).label("latest"))
+            .join(Procedure, Procedure.id == ProcedureSampleAssociation.procedure_id)
+            .subquery()
+        )
+        query = (
+            select(Run._rsl_plate_number, RunSampleAssociation.run_rank, Sample, position.c.row, position.c.column)
+            .join(Run, Run.id == RunSampleAssociation.run_id)
+            .join(Sample, Sample.id == RunSampleAssociation.sample_id)
+            .outerjoin(position, and_(position.c.run_id == RunSampleAssociation.run_id,
+                                      position.c.sample_id == RunSampleAssociation.sample_id,
+                                      position.c.latest == 1))
+            .where(or_(Run.id.in_(ids), Run._rsl_plate_number.in_(names)))
+            .order_by(Run._rsl_plate_number, RunSampleAssociation.run_rank)
+        )
+        if samples is not None:
+            query = query.where(RunSampleAssociation.sample_id.in_([sample.id for sample in samples]))
+        template = jinja_template_loading().get_template("support/tooltip.html")
+        output = {}
+        for run_name, run_rank, sample, row, column in cls.__database_session__.execute(query):
+            fields = dict(sample.misc_info or {})
+            fields.setdefault("submitter_id", sample.sample_id)
+            fields.update(sample_id=sample.sample_id, run=run_name, run_rank=run_rank, is_control=sample.is_control,
+                          comment=sample.comment, row=row, column=column,
+                          well=convert_row_column_to_well(row, column) if row and column else None)
+            tooltip = template.render(fields=fields) + fields.get('tooltip', "")
+            # NOTE: Since there is no PCR, negliable result is necessary.
+            background = "rgb(128, 203, 196)" if sample.is_control else "rgb(105, 216, 79)"
+            fields.update(Name=sample.sample_id[:10], tooltip=tooltip, background_color=background)
+            output.setdefault(run_name, []).append(fields)
+        return output
 
     @classmethod
     def make_plate_map(cls, sample_list: list, plate_rows: int = 8, plate_columns=12) -> str:
@@ -1065,6 +1168,7 @@ class Run(BaseClass, LogMixin):
         html = template.render(samples=output_samples, PLATE_ROWS=plate_rows, PLATE_COLUMNS=plate_columns)
         return html + "<br/>"
 
+    @rendered_once
     def to_pydantic(self) -> PydRun:
         """
         Converts this instance into a PydSubmission
@@ -1253,7 +1357,8 @@ class Run(BaseClass, LogMixin):
     @check_authorization
     def delete(self, obj=None):
         """
-        Performs backup and deletes this instance from database.
+        Deletes this instance and its procedures, associations and results from database, copying
+        them to the archive database first if 'database: archive:' is set in config.yml.
 
         Args:
             obj (_type_, optional): Parent widget. Defaults to None.
@@ -1262,11 +1367,11 @@ class Run(BaseClass, LogMixin):
             e: SQLIntegrityError or SQLOperationalError if problem with commit.
         """
         from frontend.widgets.pop_ups import QuestionAsker
+        from backend.db.purge import purge
         msg = QuestionAsker(title="Delete?", message=f"Are you sure you want to delete {self.rsl_plate_number}?\n")
         if msg.exec():
-            self.__database_session__.delete(self)
             try:
-                self.__database_session__.commit()
+                purge([self], archive=ctx.database.get("archive"))
             except (SQLIntegrityError, SQLOperationalError, AlcIntegrityError, AlcOperationalError) as e:
                 self.__database_session__.rollback()
                 raise e
@@ -1441,7 +1546,8 @@ class Run(BaseClass, LogMixin):
         from backend.validators import PydRun, RSLNamer
 
         data = clientsubmission.details_dict
-        rsl_plate_number = RSLNamer.construct_new_plate_name(data=data)
+        # NOTE: Only proposed, add_run takes the number when the run is saved.
+        rsl_plate_number = RSLNamer.construct_new_plate_name(data=data, allocate=False)
         dummy_run = PydRun(sample=[], clientsubmission=clientsubmission.to_pydantic(), rsl_plate_number=rsl_plate_number)
         for sample in clientsubmission.sample:
             dummy_run.sample.append(sample.to_pydantic())
@@ -1656,6 +1762,24 @@ class Sample(BaseClass, LogMixin):
     @is_control.setter
     def is_control(self, value):
         self._is_control = self.translate_control(value)
+
+    @classmethod
+    def control_filter(cls, include: Set[Literal['positive', 'negative', 'samples']] | List[str] | None = None):
+        """
+        SQL condition keeping only the kinds of sample asked for. Samples whose control flag is
+        anything other than 1, 0 or -1 always pass.
+
+        Args:
+            include (Set[Literal['positive', 'negative', 'samples']] | List[str] | None, optional): Kinds of sample to keep. Defaults to none.
+
+        Returns:
+            ColumnElement | None: Condition on Sample._is_control, None if everything is included.
+        """
+        include = [item.lower() for item in include or []]
+        excluded = [flag for flag, name in ((1, "positive"), (0, "samples"), (-1, "negative")) if name not in include]
+        if not excluded:
+            return None
+        return or_(cls._is_control.is_(None), cls._is_control.not_in(excluded))
   
     @hybrid_property
     def name(self):
@@ -1677,11 +1801,13 @@ class Sample(BaseClass, LogMixin):
         return [dict(label="Submitter ID", field="sample_id")]
 
     @property
+    @rendered_once
     def details_dict(self) -> dict:
         output = super().details_dict
         output['sample_id'] = self.sample_id
         return output
 
+    @rendered_once
     def to_pydantic(self):
         if hasattr(self, '_misc_info') and isinstance(self._misc_info, dict) and 'sample' in self._misc_info:
             try:
@@ -1926,6 +2052,7 @@ class ClientSubmissionSampleAssociation(BaseClass):
         self._comment = vet_comment(value, current=self._comment)
 
     @property
+    @rendered_once
     def details_dict(self) -> dict:
         output = super().details_dict
         # NOTE: Figure out how to merge the misc_info if doing .update instead.
@@ -2050,6 +2177,7 @@ class ClientSubmissionSampleAssociation(BaseClass):
             self.comment = comment
             self.save(original=False)
 
+    @rendered_once
     def to_pydantic(self, **kwargs) -> BaseModel:
         output = super().to_pydantic(**kwargs)
         output.rank = self.submission_rank
@@ -2196,6 +2324,7 @@ class RunSampleAssociation(BaseClass):
     def comment(self, value):
         self._comment = vet_comment(value, current=self._comment)
 
+    @rendered_once
     def to_pydantic(self) -> PydSample:
         """
         Creates a pydantic model for this sample.
@@ -2229,30 +2358,15 @@ class RunSampleAssociation(BaseClass):
     @property
     def hitpicked(self) -> dict | None:
         """
-        Outputs a dictionary usable for html plate maps.
+        Outputs a dictionary usable for html plate maps. Only this sample is looked up; for
+        every sample on a run use Run.hitpick_lists, which gets them all in one query.
 
         Returns:
             dict: dictionary of sample id, row and column in elution plate
         """
-        # NOTE: Since there is no PCR, negliable result is necessary.
-        sample = self.details_dict
-        env = jinja_template_loading()
-        template = env.get_template("support/tooltip.html")
-        tooltip_text = template.render(fields=sample)
-        try:
-            control = self.sample.control
-        except AttributeError:
-            control = None
-        if control is not None:
-            background = "rgb(128, 203, 196)"
-        else:
-            background = "rgb(105, 216, 79)"
-        try:
-            tooltip_text += sample['tooltip']
-        except KeyError:
-            pass
-        sample.update(dict(Name=self.sample.sample_id[:10], tooltip=tooltip_text, background_color=background))
-        return sample
+        entries = Run.hitpick_lists([self.run], samples=[self.sample]).get(self.run.rsl_plate_number, [])
+        return next((item for item in entries if item['run_rank'] == self.run_rank
+                     and item['sample_id'] == self.sample.sample_id), None)
 
     @classmethod
     @setup_lookup
@@ -2345,6 +2459,7 @@ class RunSampleAssociation(BaseClass):
         raise AttributeError(f"Delete not implemented for {self.__class__}")
 
     @property
+    @rendered_once
     def details_dict(self) -> dict:
         output = super().details_dict
         # NOTE: Figure out how to merge the misc_info if doing .update instead.
@@ -2627,22 +2742,8 @@ class ProcedureSampleAssociation(BaseClass):
             limit = 1
         return cls.execute_query(query=query, limit=limit, **kwargs)
 
-    @classmethod
-    def autoincrement_id(cls, procedure_rank: int = 1) -> int:
-        """
-        Increments the association id automatically
-
-        Returns:
-            int: incremented id
-        """
-        try:
-            output = max([item.id for item in cls.query()])
-        except ValueError as e:
-            logger.exception(f"Unable to autoincrement id due to: {e}, setting to 0")
-            output = 0
-        return output + procedure_rank
-
     @property
+    @rendered_once
     def details_dict(self) -> dict:
         output = super().details_dict
         # NOTE: Figure out how to merge the misc_info if doing .update instead.
@@ -2665,6 +2766,7 @@ class ProcedureSampleAssociation(BaseClass):
                 output['control_type'] = 'sample'
         return output
 
+    @rendered_once
     def to_pydantic(self, **kwargs):
         output = super().to_pydantic()
         try:
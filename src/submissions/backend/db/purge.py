@@ -0,0 +1,303 @@
+"""
+Set-based removal of record trees (a submission with its runs, procedures, associations and results),
+optionally copied to an archive database first.
+"""
+from __future__ import annotations
+from logging import getLogger
+logger = getLogger(f"submissions.{__name__}")
+from collections import defaultdict
+from datetime import datetime
+from functools import cache
+from getpass import getuser
+from pathlib import Path
+from typing import Dict, List, Tuple
+from sqlalchemy import Column, MetaData, Table, and_, create_engine, exists, or_, select, inspect as sql_inspect
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql.elements import ColumnElement
+from .models import Base, BaseClass, LogMixin, AuditLog
+
+# NOTE: (parent table, [(parent column, child column)], removed by the database's ON DELETE CASCADE)
+Link = Tuple[Table, List[Tuple[Column, Column]], bool]
+
+
+def cascade_plan(root: Table) -> Dict[Table, List[Link]]:
+    """
+    Every table whose rows belong to a row of root: reached through foreign keys with
+    ondelete="CASCADE" or through relationships that cascade deletes in the ORM (results,
+    whose foreign key is only SET NULL).
+
+    Args:
+        root (Table): Table of the records being removed.
+
+    Returns:
+        Dict[Table, List[Link]]: Each table's links to its parents in the tree, parents before children.
+    """
+    links = defaultdict(dict)
+    todo, seen = [root], {root}
+    while todo:
+        parent = todo.pop(0)
+        children = []
+        for table in Base.metadata.sorted_tables:
+            for constraint in table.foreign_key_constraints:
+                if constraint.referred_table is not parent or constraint.ondelete != "CASCADE":
+                    continue
+                pairs = [(element.column, element.parent) for element in constraint.elements]
+                links[table][frozenset(pairs)] = (parent, pairs, True)
+                children.append(table)
+        for mapper in Base.registry.mappers:
+            if mapper.local_table is not parent:
+                continue
+            for relationship in mapper.relationships:
+                if not relationship.cascade.delete or relationship.secondary is not None \
+                        or relationship.direction.name != "ONETOMANY":
+                    continue
+                pairs = list(relationship.local_remote_pairs)
+                table = relationship.mapper.local_table
+                links[table].setdefault(frozenset(pairs), (parent, pairs, False))
+                children.append(table)
+        for table in children:
+            if table not in seen:
+                seen.add(table)
+                todo.append(table)
+    order = {table: index for index, table in enumerate(Base.metadata.sorted_tables)}
+    plan = {root: []}
+    for table in sorted(links, key=order.get):
+        if table is not root:
+            plan[table] = list(links[table].values())
+    return plan
+
+
+def row_filter(table: Table, plan: Dict[Table, List[Link]], roots: ColumnElement) -> ColumnElement:
+    """
+    WHERE clause selecting the rows of a table in the tree, as subqueries up to the roots.
+
+    Args:
+        table (Table): Table in the plan.
+        plan (Dict[Table, List[Link]]): Output of cascade_plan.
+        roots (ColumnElement): WHERE clause selecting the roots.
+
+    Returns:
+        ColumnElement: WHERE clause for table.
+    """
+    if not plan[table]:
+        return roots
+    clauses = []
+    for parent, pairs, _ in plan[table]:
+        if len(pairs) == 1:
+            (parent_column, child_column), = pairs
+            clauses.append(child_column.in_(select(parent_column).where(row_filter(parent, plan, roots))))
+        else:
+            clauses.append(exists().where(*(parent_column == child_column for parent_column, child_column in pairs),
+                                          row_filter(parent, plan, roots)))
+    return or_(*clauses)
+
+
+def foreign_keys_enforced(connection: Connection) -> bool:
+    """
+    Whether the database will carry out ON DELETE itself. Always on for anything but sqlite,
+    where the app switches it on per connection.
+
+    Args:
+        connection (Connection): Connection being used.
+
+    Returns:
+        bool: True if foreign keys are enforced.
+    """
+    if connection.dialect.name != "sqlite":
+        return True
+    return bool(connection.exec_driver_sql("PRAGMA foreign_keys").scalar())
+
+
+def archive_engine(archive: Engine | Path | str) -> Engine:
+    """
+    The archive database, with a copy of each table (without foreign keys, as the rows they
+    point to aren't archived) created if missing.
+
+    Args:
+        archive (Engine | Path | str): Engine, database url or path of a sqlite file.
+
+    Returns:
+        Engine: Engine for the archive.
+    """
+    if not isinstance(archive, Engine):
+        archive = str(archive)
+        if "://" not in archive:
+            Path(archive).parent.mkdir(parents=True, exist_ok=True)
+            archive = f"sqlite:///{archive}"
+        archive = create_engine(archive)
+    archive_tables().create_all(archive)
+    return archive
+
+
+@cache
+def archive_tables() -> MetaData:
+    """
+    Copies of the app's tables for the archive: the same columns and primary keys, nothing else.
+
+    Returns:
+        MetaData: Tables for the archive.
+    """
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        Table(table.name, metadata, *(Column(column.name, column.type, primary_key=column.primary_key,
+                                             autoincrement=False) for column in table.columns))
+    return metadata
+
+
+def copy_rows(connection: Connection, archive: Engine, plan: Dict[Table, List[Link]], roots: ColumnElement,
+              chunk_size: int = 500) -> Dict[str, int]:
+    """
+    Copies the rows of a tree into the archive, replacing any copies archived before, in one transaction.
+
+    Args:
+        connection (Connection): Connection to the app's database.
+        archive (Engine): The archive.
+        plan (Dict[Table, List[Link]]): Output of cascade_plan.
+        roots (ColumnElement): WHERE clause selecting the roots.
+        chunk_size (int, optional): Rows read and written at a time. Defaults to 500.
+
+    Returns:
+        Dict[str, int]: Rows archived per table.
+    """
+    tables = archive_tables().tables
+    counts = {}
+    with archive.begin() as target:
+        for table in plan:
+            copy = tables[table.name]
+            key = [copy.c[column.name] for column in table.primary_key]
+            result = connection.execute(select(table).where(row_filter(table, plan, roots)),
+                                        execution_options=dict(yield_per=chunk_size))
+            counts[table.name] = 0
+            for rows in result.mappings().partitions():
+                rows = [dict(row) for row in rows]
+                if len(key) == 1:
+                    target.execute(copy.delete().where(key[0].in_([row[key[0].name] for row in rows])))
+                else:
+                    target.execute(copy.delete().where(or_(*(and_(*(column == row[column.name] for column in key))
+                                                             for row in rows))))
+                target.execute(copy.insert(), rows)
+                counts[table.name] += len(rows)
+    return counts
+
+
+def clear_references(connection: Connection, plan: Dict[Table, List[Link]], roots: ColumnElement, enforced: bool):
+    """
+    Sets nullable foreign keys pointing into the tree to NULL where the database wouldn't: those
+    without an ondelete, or all of them if foreign keys aren't enforced. Anything else pointing in
+    is left for the database to refuse.
+
+    Args:
+        connection (Connection): Connection being used.
+        plan (Dict[Table, List[Link]]): Output of cascade_plan.
+        roots (ColumnElement): WHERE clause selecting the roots.
+        enforced (bool): Whether the database carries out ON DELETE.
+    """
+    links = {(table, tuple(child for _, child in pairs)) for table in plan for _, pairs, _ in plan[table]}
+    for table in Base.metadata.sorted_tables:
+        for constraint in table.foreign_key_constraints:
+            if constraint.referred_table not in plan or len(constraint.elements) != 1:
+                continue
+            element, = constraint.elements
+            if (table, (element.parent,)) in links or not element.parent.nullable:
+                continue
+            if enforced and constraint.ondelete in ("CASCADE", "SET NULL"):
+                continue
+            parent = constraint.referred_table
+            doomed = select(element.column).where(row_filter(parent, plan, roots))
+            connection.execute(table.update().where(element.parent.in_(doomed)).values({element.parent.name: None}))
+
+
+def expunge_tree(session, plan: Dict[Table, List[Link]], roots: ColumnElement):
+    """
+    Removes loaded objects that are about to be deleted from the session, so it doesn't try
+    to flush or refresh them. Only tables with objects loaded are looked up.
+
+    Args:
+        session (Session): The records' session.
+        plan (Dict[Table, List[Link]]): Output of cascade_plan.
+        roots (ColumnElement): WHERE clause selecting the roots.
+    """
+    loaded = defaultdict(list)
+    for obj in list(session.identity_map.values()):
+        state = sql_inspect(obj)
+        if state.mapper.local_table in plan:
+            loaded[state.mapper.local_table].append((state.mapper, obj))
+    for table, objects in loaded.items():
+        mapper = objects[0][0]
+        doomed = {tuple(row) for row in session.connection().execute(
+            select(*mapper.primary_key).where(row_filter(table, plan, roots)))}
+        for _, obj in objects:
+            # NOTE: May already have gone with its parent, expunge cascades like delete.
+            if obj in session and tuple(sql_inspect(obj).identity) in doomed:
+                session.expunge(obj)
+
+def purge(records: List[BaseClass], archive: Engine | Path | str | None = None) -> Dict[str, int]:
+    """
+    Removes records and everything that belongs to them with a few bulk statements, instead of
+    loading every child into the session for the ORM to delete one by one.
+
+    Rows only the ORM cascades to (results) are deleted first and references the database
+    would refuse to leave dangling (a repeat's repeat_of) are cleared; deleting the records
+    themselves then lets ON DELETE CASCADE remove the rest. If sqlite isn't enforcing foreign
+    keys on this connection, every table is deleted explicitly, children first.
+
+    The removed objects are expunged from the session and the transaction is committed, which
+    clears the cached report records.
+
+    Args:
+        records (List[BaseClass]): Records of one class, e.g. ClientSubmissions or Runs.
+        archive (Engine | Path | str | None, optional): Database to copy the rows to first. Defaults to None.
+
+    Returns:
+        Dict[str, int]: Rows archived per table if archiving, otherwise rows deleted by each statement run.
+    """
+    if not records:
+        return {}
+    mapper = sql_inspect(records[0].__class__)
+    root = mapper.local_table
+    primary_key, = mapper.primary_key
+    roots = primary_key.in_([sql_inspect(record).identity[0] for record in records])
+    plan = cascade_plan(root)
+    session = records[0].__database_session__
+    session.flush()
+    connection = session.connection()
+    names = [(record.truncated_name if isinstance(record, LogMixin) else str(record)[:64], str(record))
+             for record in records]
+    counts = {}
+    given = archive
+    try:
+        if archive is not None:
+            archive = archive_engine(archive)
+            counts = copy_rows(connection, archive, plan, roots)
+            logger.info(f"Archived {sum(counts.values())} rows to {archive.url}: {counts}")
+        expunge_tree(session, plan, roots)
+        enforced = foreign_keys_enforced(connection)
+        clear_references(connection, plan, roots, enforced)
+        for table in reversed(list(plan)):
+            if table is root or (enforced and any(cascades for _, _, cascades in plan[table])):
+                continue
+            result = connection.execute(table.delete().where(row_filter(table, plan, roots)))
+            if archive is None:
+                counts[table.name] = result.rowcount
+        result = connection.execute(root.delete().where(roots))
+        if archive is None:
+            counts[root.name] = result.rowcount
+        # NOTE: Bulk deletes skip the mapper events that write the audit log.
+        archived = [] if archive is None else [str(archive.url)]
+        connection.execute(AuditLog.__table__.insert(), [
+            dict(user=getuser(), time=datetime.now(), object=short,
+                 changes=[dict(field="deleted", added=archived, deleted=[name])])
+            for short, name in names])
+        # NOTE: Nothing is flushed, so the after_flush listener in backend.excel.reports never sees this.
+        session.info["report_changes"] = True
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        if archive is not None and archive is not given:
+            archive.dispose()
+    return counts
+
+
+__all__ = ["archive_engine", "cascade_plan", "purge", "row_filter"]
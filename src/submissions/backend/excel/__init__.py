@@ -5,6 +5,11 @@ from __future__ import annotations
 from logging import getLogger
 logger = getLogger(f"submissions.{__name__}")
 from openpyxl import worksheet
+from openpyxl.cell.cell import MergedCell
+from openpyxl.cell.read_only import EmptyCell
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.named_styles import NamedStyle
+from openpyxl.styles.numbers import BUILTIN_FORMATS_MAX_SIZE
 from copy import copy
 
 
@@ -16,75 +21,145 @@ def copy_xl_sheet(source_sheet, target_sheet):
         source_sheet (Worksheet): Input sheet
         target_sheet (Worksheet): Output sheet
     """
-    copy_cells(source_sheet, target_sheet)  # copy all the cell values and styles
-    copy_sheet_attributes(source_sheet, target_sheet)
+    styles = StyleInterner(source_sheet.parent, target_sheet.parent)
+    copy_cells(source_sheet, target_sheet, styles=styles)  # copy all the cell values and styles
+    copy_sheet_attributes(source_sheet, target_sheet, styles=styles)
 
-def copy_sheet_attributes(source_sheet, target_sheet):
+
+class StyleInterner(object):
+    """
+    Translates cell style arrays (indices into a workbook's shared font/fill/border/etc. tables)
+    from one workbook to another, once per distinct style rather than once per cell.
+
+    Within one workbook the indices are reused as they are.
+
+    Args:
+        source_book (Workbook): Workbook styles are read from.
+        target_book (Workbook): Workbook styles are added to.
+    """
+
+    def __init__(self, source_book, target_book):
+        self.source_book = source_book
+        self.target_book = target_book
+        self.cache = {}
+
+    def __call__(self, style_array: StyleArray | None) -> StyleArray | None:
+        if style_array is None:
+            return None
+        if self.source_book is self.target_book:
+            return copy(style_array)
+        key = tuple(style_array)
+        if key not in self.cache:
+            self.cache[key] = self.translate(style_array)
+        return copy(self.cache[key])
+
+    def translate(self, style_array: StyleArray) -> StyleArray:
+        """
+        Adds a style's parts to the target workbook's tables, which dedupe equal entries.
+
+        Args:
+            style_array (StyleArray): Style in the source workbook.
+
+        Returns:
+            StyleArray: The same style in the target workbook.
+        """
+        source, target = self.source_book, self.target_book
+        output = StyleArray()
+        output.fontId = target._fonts.add(source._fonts[style_array.fontId])
+        output.fillId = target._fills.add(source._fills[style_array.fillId])
+        output.borderId = target._borders.add(source._borders[style_array.borderId])
+        output.alignmentId = target._alignments.add(source._alignments[style_array.alignmentId])
+        output.protectionId = target._protections.add(source._protections[style_array.protectionId])
+        if style_array.numFmtId < BUILTIN_FORMATS_MAX_SIZE:
+            output.numFmtId = style_array.numFmtId
+        else:
+            number_format = source._number_formats[style_array.numFmtId - BUILTIN_FORMATS_MAX_SIZE]
+            output.numFmtId = target._number_formats.add(number_format) + BUILTIN_FORMATS_MAX_SIZE
+        output.xfId = self.named_style(style_array.xfId)
+        output.quotePrefix = style_array.quotePrefix
+        output.pivotButton = style_array.pivotButton
+        return output
+
+    def named_style(self, index: int) -> int:
+        try:
+            style = self.source_book._named_styles[index]
+        except IndexError:
+            return 0
+        names = self.target_book._named_styles.names
+        if style.name not in names:
+            self.target_book.add_named_style(NamedStyle(
+                name=style.name, font=copy(style.font), fill=copy(style.fill), border=copy(style.border),
+                alignment=copy(style.alignment), number_format=style.number_format,
+                protection=copy(style.protection), builtinId=style.builtinId, hidden=style.hidden))
+            names = self.target_book._named_styles.names
+        return names.index(style.name)
+
+
+def copy_sheet_attributes(source_sheet, target_sheet, styles: StyleInterner | None = None):
     """
     Copy a sheet's style, format, layout, etc. from one Excel sheet to another
 
     Args:
         source_sheet (Worksheet): Input sheet
         target_sheet (Worksheet): Output sheet
+        styles (StyleInterner | None, optional): Style translation shared with copy_cells. Defaults to None.
     """
     if isinstance(source_sheet, worksheet._read_only.ReadOnlyWorksheet):
         return
+    if styles is None:
+        styles = StyleInterner(source_sheet.parent, target_sheet.parent)
     target_sheet.sheet_format = copy(source_sheet.sheet_format)
     target_sheet.sheet_properties = copy(source_sheet.sheet_properties)
-    target_sheet.merged_cells = copy(source_sheet.merged_cells)
     target_sheet.page_margins = copy(source_sheet.page_margins)
     target_sheet.freeze_panes = copy(source_sheet.freeze_panes)
+    # NOTE: Merged ranges belong to their worksheet, so make new ones rather than copying the source's.
+    for merged in source_sheet.merged_cells.ranges:
+        target_sheet.merge_cells(merged.coord)
+    # NOTE: Dimensions hold their worksheet and a style array; point both at the target.
+    for dimensions, target_dimensions in ((source_sheet.row_dimensions, target_sheet.row_dimensions),
+                                          (source_sheet.column_dimensions, target_sheet.column_dimensions)):
+        for key, dimension in dimensions.items():
+            output = copy(dimension)
+            output.parent = target_sheet
+            output._style = styles(dimension._style)
+            target_dimensions[key] = output
 
-    # NOTE: set row dimensions
-    # NOTE: So you cannot copy the row_dimensions attribute. Does not work (because of meta data in the attribute I think). So we copy every row's row_dimensions. That seems to work.
-    for rn in range(len(source_sheet.row_dimensions)):
-        target_sheet.row_dimensions[rn] = copy(source_sheet.row_dimensions[rn])
-
-    if source_sheet.sheet_format.defaultColWidth is None:
-        logger.error('Unable to copy default column wide')
-    else:
-        target_sheet.sheet_format.defaultColWidth = copy(source_sheet.sheet_format.defaultColWidth)
-
-    # NOTE: set specific column width and hidden property
-    # NOTE: we cannot copy the entire column_dimensions attribute so we copy selected attributes
-    for key, _ in source_sheet.column_dimensions.items():
-        target_sheet.column_dimensions[key].min = copy(source_sheet.column_dimensions[
-                                                           key].min)  # Excel actually groups multiple columns under 1 key. Use the min max attribute to also group the columns in the targetSheet
-        target_sheet.column_dimensions[key].max = copy(source_sheet.column_dimensions[
-                                                           key].max)  # https://stackoverflow.com/questions/36417278/openpyxl-can-not-read-consecutive-hidden-columns discussed the issue. Note that this is also the case for the width, not onl;y the hidden property
-        target_sheet.column_dimensions[key].width = copy(
-            source_sheet.column_dimensions[key].width)  # set width for every column
-        target_sheet.column_dimensions[key].hidden = copy(source_sheet.column_dimensions[key].hidden)
-
-
-def copy_cells(source_sheet, target_sheet):
+
+def copy_cells(source_sheet, target_sheet, styles: StyleInterner | None = None):
     """
     Copy a sheet's values from one Excel sheet to another
 
     Args:
         source_sheet (Worksheet): Input sheet
         target_sheet (Worksheet): Output sheet
+        styles (StyleInterner | None, optional): Style translation shared with copy_sheet_attributes. Defaults to None.
     """
-    for r, row in enumerate(source_sheet.iter_rows()):
-        for c, cell in enumerate(row):
-            source_cell = cell
-            if isinstance(source_cell, cell.read_only.EmptyCell):
-                continue
-            target_cell = target_sheet.cell(column=c + 1, row=r + 1)
-            target_cell._value = source_cell._value
-            target_cell.data_type = source_cell.data_type
-            if source_cell.has_style:
-                target_cell.font = copy(source_cell.font)
-                target_cell.border = copy(source_cell.border)
-                target_cell.fill = copy(source_cell.fill)
-                target_cell.number_format = copy(source_cell.number_format)
-                target_cell.protection = copy(source_cell.protection)
-                target_cell.alignment = copy(source_cell.alignment)
-            if not isinstance(source_cell, cell.ReadOnlyCell) and source_cell.hyperlink:
-                target_cell._hyperlink = copy(source_cell.hyperlink)
-            if not isinstance(source_cell, cell.ReadOnlyCell) and source_cell.comment:
-                target_cell.comment = copy(source_cell.comment)
-
+    if styles is None:
+        styles = StyleInterner(source_sheet.parent, target_sheet.parent)
+    if isinstance(source_sheet, worksheet._read_only.ReadOnlyWorksheet):
+        for row in source_sheet.iter_rows():
+            for source_cell in row:
+                if isinstance(source_cell, EmptyCell):
+                    continue
+                target_cell = target_sheet.cell(row=source_cell.row, column=source_cell.column)
+                target_cell._value = source_cell._value
+                target_cell.data_type = source_cell.data_type
+                if source_cell.has_style:
+                    target_cell._style = styles(source_cell.style_array)
+        return
+    # NOTE: Only cells that exist; iter_rows would create every empty cell in the used range.
+    for (row, column), source_cell in list(source_sheet._cells.items()):
+        if isinstance(source_cell, MergedCell):
+            continue
+        target_cell = target_sheet.cell(row=row, column=column)
+        target_cell._value = source_cell._value
+        target_cell.data_type = source_cell.data_type
+        if source_cell.has_style:
+            target_cell._style = styles(source_cell._style)
+        if source_cell.hyperlink:
+            target_cell._hyperlink = copy(source_cell.hyperlink)
+        if source_cell.comment:
+            target_cell.comment = copy(source_cell.comment)
 
 
 from .parsers import *
@@ -0,0 +1,268 @@
+"""
+Headless import of many client submission workbooks: parsed in parallel, written by one process.
+"""
+from __future__ import annotations
+from logging import getLogger
+logger = getLogger(f"submissions.{__name__}")
+import csv
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Generator, Iterable, List, Literal, Tuple
+from pydantic import BaseModel
+
+
+class ImportOutcome(BaseModel):
+    """
+    What happened to one file.
+    """
+
+    file: str
+    status: Literal["imported", "duplicate", "failed"] = "failed"
+    stage: Literal["ledger", "parse", "write", "commit"] = "parse"
+    submission: str = ""
+    samples: int = 0
+    message: str = ""
+    seconds: float = 0.0
+
+
+def find_workbooks(paths: Iterable[Path | str], pattern: str = "*.xlsx") -> List[Path]:
+    """
+    Expands directories into the workbooks inside them, skipping Excel's '~$' lock files.
+
+    Args:
+        paths (Iterable[Path | str]): Files and/or directories.
+        pattern (str, optional): Glob used inside directories. Defaults to "*.xlsx".
+
+    Returns:
+        List[Path]: Workbooks, each listed once, in a stable order.
+    """
+    found = {}
+    for path in (Path(item) for item in paths):
+        candidates = sorted(path.rglob(pattern)) if path.is_dir() else [path]
+        for candidate in candidates:
+            if candidate.name.startswith("~$"):
+                continue
+            found.setdefault(candidate.resolve(), None)
+    return list(found)
+
+
+def skip_imported(files: Iterable[Path]) -> Tuple[List[Tuple[Path, str]], List[ImportOutcome]]:
+    """
+    Hashes the files and sets aside any whose contents were imported before, or appear twice
+    in this batch, so they aren't parsed again.
+
+    Args:
+        files (Iterable[Path]): Workbooks about to be imported.
+
+    Returns:
+        Tuple[List[Tuple[Path, str]], List[ImportOutcome]]: Files to import with their hashes, and an outcome per file skipped.
+    """
+    from backend.db.models import ImportLedger
+    todo, skipped, seen = [], [], {}
+    for path in files:
+        start = perf_counter()
+        try:
+            digest = ImportLedger.digest_file(path)
+        except OSError as e:
+            skipped.append(ImportOutcome(file=str(path), stage="ledger", message=f"{e.__class__.__name__}: {e}",
+                                         seconds=perf_counter() - start))
+            continue
+        previous = ImportLedger.lookup(digest=digest)
+        if previous is not None:
+            skipped.append(ImportOutcome(file=str(path), status="duplicate", stage="ledger",
+                                         submission=str(previous.clientsubmission.submitter_plate_id
+                                                        or previous.clientsubmission.name),
+                                         message=f"Already imported from {previous.filename} on {previous.imported:%Y-%m-%d}",
+                                         seconds=perf_counter() - start))
+        elif digest in seen:
+            skipped.append(ImportOutcome(file=str(path), status="duplicate", stage="ledger",
+                                         message=f"Same contents as {seen[digest].name}", seconds=perf_counter() - start))
+        else:
+            seen[digest] = path
+            todo.append((path, digest))
+    return todo, skipped
+
+
+def strip_sql_instances(data):
+    """
+    Drops ORM objects from a model_dump so it can cross to another process. They are looked
+    up again when the writer validates the data back into pydantic.
+
+    Args:
+        data (Any): Output of model_dump.
+
+    Returns:
+        Any: The same structure without 'sql_instance' keys or ORM objects.
+    """
+    from backend.db.models import BaseClass
+    match data:
+        case dict():
+            return {key: strip_sql_instances(value) for key, value in data.items()
+                    if key != "sql_instance" and not isinstance(value, BaseClass)}
+        case list() | tuple():
+            return [strip_sql_instances(item) for item in data if not isinstance(item, BaseClass)]
+        case _:
+            return data
+
+
+def parse_workbook(path: Path | str) -> dict:
+    """
+    Runs in a worker: parses one workbook the way the import form does, without the form.
+
+    Args:
+        path (Path | str): The workbook.
+
+    Returns:
+        dict: PydClientSubmission data, free of ORM objects.
+    """
+    from backend.managers import DefaultClientSubmissionManager
+    from backend.validators.pydant import PydSample
+    pyd = DefaultClientSubmissionManager(parent=None, input_object=Path(path)).to_pydantic()
+    # NOTE: Same filter as ClientSubmissionFormWidget.to_pydantic.
+    pyd.sample = [item for item in pyd.sample if PydSample.is_sample_id_valid(item)]
+    return strip_sql_instances(pyd.model_dump(exclude={"run", "clientsubmissionsampleassociation"}))
+
+
+def _parse(parse: Callable[[Path], dict], path: Path, digest: str | None = None) -> ImportOutcome | dict:
+    start = perf_counter()
+    try:
+        data = parse(path)
+    except Exception as e:
+        logger.exception(f"Couldn't parse {path}: {e}")
+        return ImportOutcome(file=str(path), stage="parse", message=f"{e.__class__.__name__}: {e}",
+                             seconds=perf_counter() - start)
+    return dict(file=str(path), data=data, digest=digest, seconds=perf_counter() - start)
+
+
+def _init_worker():
+    # NOTE: Workers only read; keep their connections from holding up the writer.
+    from tools import ctx
+    try:
+        ctx.database.engine.dispose(close=False)
+    except (AttributeError, KeyError):
+        pass
+
+
+def write_submissions(parsed: List[dict]) -> List[ImportOutcome]:
+    """
+    Writes a batch of parsed submissions in one transaction, each file inside its own
+    savepoint so a bad file is rolled back and reported without losing the rest. Each file
+    written goes into the import ledger with its submission.
+
+    Args:
+        parsed (List[dict]): Output of _parse, i.e. file, data, digest and seconds.
+
+    Returns:
+        List[ImportOutcome]: One per file, in the order given.
+    """
+    from backend.db.models import BaseClass, ImportLedger
+    from backend.validators.pydant import PydClientSubmission
+    session = BaseClass.__database_session__
+    outcomes = []
+    for item in parsed:
+        outcome = ImportOutcome(file=item['file'], stage="write", seconds=item.get('seconds', 0.0))
+        start = perf_counter()
+        try:
+            with session.begin_nested():
+                pyd = PydClientSubmission(**item['data'])
+                sql = pyd.to_sql()
+                if isinstance(sql, tuple):
+                    sql = sql[0]
+                # NOTE: As in ClientSubmissionFormWidget.create_new_submission.
+                try:
+                    del sql._misc_info['sample']
+                except (KeyError, TypeError):
+                    pass
+                sql.sanitize_misc_info()
+                session.add(sql)
+                session.flush()
+                ImportLedger.record(item['file'], clientsubmission=sql, digest=item.get('digest'), commit=False)
+        except Exception as e:
+            logger.exception(f"Couldn't write {item['file']}: {e}")
+            outcome.message = f"{e.__class__.__name__}: {e}"
+        else:
+            outcome.status = "imported"
+            outcome.submission = str(sql.submitter_plate_id or sql.name)
+            outcome.samples = len(pyd.sample)
+        outcome.seconds += perf_counter() - start
+        outcomes.append(outcome)
+    try:
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logger.exception(f"Batch commit failed: {e}")
+        for outcome in outcomes:
+            if outcome.status == "imported":
+                outcome.status, outcome.stage, outcome.message = "failed", "commit", f"{e.__class__.__name__}: {e}"
+    return outcomes
+
+
+def batch_import(paths: Iterable[Path | str], workers: int | None = None, batch_size: int = 25,
+                 parse: Callable[[Path], dict] = parse_workbook) -> Generator[ImportOutcome, None, None]:
+    """
+    Imports client submission workbooks: parse runs in a pool of worker processes, and this
+    process writes the results in transactions of batch_size files as they come back.
+
+    Args:
+        paths (Iterable[Path | str]): Workbooks and/or directories of them.
+        workers (int | None, optional): Worker processes, 0 parses in this process. Defaults to os.cpu_count().
+        batch_size (int, optional): Files per transaction. Defaults to 25.
+        parse (Callable[[Path], dict], optional): Parser, must be picklable. Defaults to parse_workbook.
+
+    Yields:
+        ImportOutcome: One per file, as soon as its batch is committed (parse failures and files
+                       already imported straight away).
+    """
+    files, skipped = skip_imported(find_workbooks(paths))
+    yield from skipped
+    logger.info(f"Importing {len(files)} workbook(s) with {workers if workers is not None else 'default'} worker(s), "
+                f"{len(skipped)} skipped.")
+    if workers == 0:
+        results = (_parse(parse, path, digest) for path, digest in files)
+        yield from _write_in_batches(results, batch_size)
+        return
+    # NOTE: spawn, not fork; a forked Qt/sqlite process is not safe to use.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                             initializer=_init_worker) as pool:
+        futures = [pool.submit(_parse, parse, path, digest) for path, digest in files]
+        yield from _write_in_batches((future.result() for future in as_completed(futures)), batch_size)
+
+
+def _write_in_batches(results: Iterable[ImportOutcome | dict], batch_size: int) -> Generator[ImportOutcome, None, None]:
+    batch = []
+    for result in results:
+        if isinstance(result, ImportOutcome):
+            yield result
+            continue
+        batch.append(result)
+        if len(batch) >= batch_size:
+            yield from write_submissions(batch)
+            batch = []
+    if batch:
+        yield from write_submissions(batch)
+
+
+def write_report(outcomes: Iterable[ImportOutcome], path: Path | str) -> Path:
+    """
+    Writes the per-file outcomes to a csv.
+
+    Args:
+        outcomes (Iterable[ImportOutcome]): Outcomes from batch_import.
+        path (Path | str): csv to write.
+
+    Returns:
+        Path: path
+    """
+    path = Path(path)
+    with path.open("w", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(ImportOutcome.model_fields))
+        writer.writeheader()
+        for outcome in outcomes:
+            writer.writerow(outcome.model_dump())
+    return path
+
+
+__all__ = ["ImportOutcome", "batch_import", "find_workbooks", "parse_workbook", "skip_imported", "strip_sql_instances",
+           "write_report", "write_submissions"]
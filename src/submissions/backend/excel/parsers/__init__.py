@@ -4,13 +4,109 @@ Default Parser archetypes.
 from __future__ import annotations
 from logging import getLogger
 logger = getLogger(f"submissions.{__name__}")
+from csv import reader as csvreader
+from pathlib import Path
 from re import sub as rsub
-from typing import Generator
+from typing import Any, Generator, List
 from openpyxl.cell import MergedCell
 from openpyxl.worksheet.worksheet import Worksheet
 from pandas import DataFrame
 
 
+class CSVCell(object):
+    """
+    Read-only stand-in for an openpyxl cell, see CSVSheet.
+    """
+
+    __slots__ = ("row", "column", "value")
+
+    def __init__(self, row: int, column: int, value: Any):
+        self.row = row
+        self.column = column
+        self.value = value
+
+    def __repr__(self):
+        return f"<CSVCell {self.row},{self.column}={self.value!r}>"
+
+
+class CSVSheet(object):
+    """
+    Read-only view of a csv file with the parts of the openpyxl Worksheet interface the parsers
+    use (title, min_row, max_row, max_column, rows, iter_rows and cell), so instrument exports
+    go straight to the parsers without being copied into a Workbook first.
+
+    Values are what they would have been in a Workbook built by appending the csv rows:
+    strings, with short rows padded by None.
+
+    Args:
+        rows (List[list]): Rows of the csv.
+        title (str, optional): Sheet title. Defaults to "Sheet".
+    """
+
+    min_row = 1
+
+    def __init__(self, rows: List[list], title: str = "Sheet"):
+        self._rows = [tuple(row) for row in rows]
+        self.title = title
+        self.file = None
+        # NOTE: Like openpyxl, an empty sheet still has a cell at A1.
+        self.max_row = max(len(self._rows), 1)
+        self.max_column = max((len(row) for row in self._rows), default=0) or 1
+
+    def __repr__(self):
+        return f"<CSVSheet \"{self.title}\">"
+
+    @classmethod
+    def from_file(cls, filepath: Path | str, delimiter: str = ",") -> CSVSheet:
+        """
+        Reads a csv file.
+
+        Args:
+            filepath (Path | str): The csv file.
+            delimiter (str, optional): Field delimiter. Defaults to ",".
+
+        Returns:
+            CSVSheet: Sheet holding the file's rows, with file set to filepath.
+        """
+        filepath = Path(filepath)
+        with open(filepath, "r", newline="") as f:
+            sheet = cls(csvreader(f, delimiter=delimiter), title=filepath.stem)
+        sheet.file = filepath
+        return sheet
+
+    def row_values(self, row: int) -> tuple:
+        try:
+            values = self._rows[row - 1]
+        except IndexError:
+            values = ()
+        return values + (None,) * (self.max_column - len(values))
+
+    def iter_rows(self, min_row: int | None = None, max_row: int | None = None, min_col: int | None = None,
+                  max_col: int | None = None, values_only: bool = False) -> Generator[tuple, None, None]:
+        """
+        Same as Worksheet.iter_rows: rows of cells (or values) between the given bounds, 1-indexed and inclusive.
+        """
+        min_row, max_row = min_row or 1, max_row or self.max_row
+        min_col, max_col = min_col or 1, max_col or self.max_column
+        for row in range(min_row, max_row + 1):
+            values = self.row_values(row)[min_col - 1:max_col]
+            if values_only:
+                yield values
+            else:
+                yield tuple(CSVCell(row, column, value) for column, value in enumerate(values, start=min_col))
+
+    @property
+    def rows(self) -> Generator[tuple, None, None]:
+        return self.iter_rows()
+
+    def cell(self, row: int, column: int) -> CSVCell:
+        try:
+            value = self.row_values(row)[column - 1]
+        except IndexError:
+            value = None
+        return CSVCell(row, column, value)
+
+
 class DefaultParser(object):
 
     range_dict = dict(start_row = 1)
@@ -18,7 +114,7 @@ class DefaultParser(object):
     def __repr__(self):
         return f"{self.__class__.__name__}<{self.worksheet.title}>"
 
-    def __init__(self, worksheet: Worksheet, start_row: int = 1, end_row: int | None = None, *args, **kwargs):
+    def __init__(self, worksheet: Worksheet | CSVSheet, start_row: int = 1, end_row: int | None = None, *args, **kwargs):
         """
 
         Args:
@@ -38,7 +134,7 @@ class DefaultParser(object):
         assert self.start_row <= self.end_row
         
     @classmethod
-    def delineate_start_row(cls, worksheet: Worksheet, start_row: int = 1) -> int:
+    def delineate_start_row(cls, worksheet: Worksheet | CSVSheet, start_row: int = 1) -> int:
         """
         Determines the start row by finding the first non-empty row.
 
@@ -51,7 +147,7 @@ class DefaultParser(object):
         return worksheet.min_row
 
     @classmethod
-    def delineate_end_row(cls, worksheet: Worksheet, start_row: int = 1) -> int:
+    def delineate_end_row(cls, worksheet: Worksheet | CSVSheet, start_row: int = 1) -> int:
         """
         Determines the end row by finding the first empty row.
 
@@ -88,8 +184,10 @@ class DefaultKEYVALUEParser(DefaultParser):
             Generator[tuple, None, None]: (key, value) tuple.
         """
         rows = range(self.start_row, self.end_row)
+        # NOTE: Read the rows once, not once per row.
+        sheet_rows = list(self.worksheet.rows)
         for row in rows:
-            check_row = [item for item in self.worksheet.rows][row-1]
+            check_row = sheet_rows[row-1]
             if any([isinstance(cell, MergedCell) for cell in check_row]):
                 continue
             key = self.worksheet.cell(row, 1).value
@@ -143,6 +241,6 @@ from .procedure_parsers import *
 from .results_parsers import *
 from .clientsubmission_parser import *
 
-__all__ = ["DefaultKEYVALUEParser", "DefaultTABLEParser", "ProcedureInfoParser", "ProcedureSampleParser", "ProcedureReagentParser", "ProcedureEquipmentParser",
+__all__ = ["CSVCell", "CSVSheet", "DefaultKEYVALUEParser", "DefaultTABLEParser", "ProcedureInfoParser", "ProcedureSampleParser", "ProcedureReagentParser", "ProcedureEquipmentParser",
            "DefaultResultsInfoParser", "DefaultResultsSampleParser", "DiomniPCRInfoParser", "DiomniPCRSampleParser", "QubitInfoParser", "QubitSampleParser",
            "ClientSubmissionInfoParser", "ClientSubmissionSampleParser"]
\ No newline at end of file
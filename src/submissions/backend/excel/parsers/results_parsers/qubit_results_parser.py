@@ -5,6 +5,7 @@ from __future__ import annotations
 from logging import getLogger
 logger = getLogger(f"submissions.{__name__}")
 from typing import Generator, TYPE_CHECKING
+from backend.excel.parsers import CSVSheet
 from backend.excel.parsers.results_parsers import DefaultResultsInfoParser, DefaultResultsSampleParser
 from openpyxl.worksheet.worksheet import Worksheet
 if TYPE_CHECKING:
@@ -14,7 +15,7 @@ if TYPE_CHECKING:
 class QubitInfoParser(DefaultResultsInfoParser):
     """Object to pull data from Design and Analysis PCR export file."""
 
-    def __init__(self, worksheet: Worksheet, procedure: Procedure | None = None, *args, **kwargs):
+    def __init__(self, worksheet: Worksheet | CSVSheet, procedure: Procedure | None = None, *args, **kwargs):
         self.results_type = "Qubit"
         self.procedure = procedure
         super().__init__(worksheet=worksheet, results_type=self.results_type, *args, **kwargs)
@@ -23,7 +24,7 @@ class QubitInfoParser(DefaultResultsInfoParser):
 class QubitSampleParser(DefaultResultsSampleParser):
     """Object to pull data from Design and Analysis PCR export file."""
 
-    def __init__(self, worksheet: Worksheet, procedure: Procedure | None = None, *args, **kwargs):
+    def __init__(self, worksheet: Worksheet | CSVSheet, procedure: Procedure | None = None, *args, **kwargs):
         self.results_type = "Qubit"
         self.procedure = procedure
         super().__init__(worksheet=worksheet, results_type="Qubit", *args, **kwargs)
@@ -6,13 +6,108 @@ from logging import getLogger
 logger = getLogger(f"submissions.{__name__}")
 from pandas import DataFrame, ExcelWriter, to_numeric
 from pathlib import Path
-from datetime import date
-from typing import Generator, Tuple, List, TYPE_CHECKING
-from tools import convert_row_column_to_well, find_paths_to_value, get_first_blank_df_row, convert_strings, jinja_env
+from datetime import date, datetime, timedelta
+from collections import OrderedDict
+from itertools import groupby
+from operator import attrgetter
+from threading import Lock
+from time import monotonic
+from typing import Callable, Generator, Tuple, List, TYPE_CHECKING
+from sqlalchemy import event
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session, selectinload
+from tools import convert_row_column_to_well, get_first_blank_df_row, convert_strings, jinja_env, ctx, with_progress, \
+    database_performance
 from PyQt6.QtWidgets import QWidget
 from openpyxl.worksheet.worksheet import Worksheet
 if TYPE_CHECKING:
-    from backend.db.models import ClientSubmission, Results
+    from backend.db.models import ClientSubmission
+
+
+class RecordCache(object):
+    """
+    Report records per submission, kept by (maker, filters) along with the days they cover.
+
+    Scrubbing a chart's date range asks for mostly the same submissions again. A range that
+    overlaps or touches the cached one only queries the days that are new, and a narrower
+    range is answered without touching the database. Anything committed through a session
+    clears the cache, as does switching databases. Other users' commits can't be seen, so
+    records are only reused for max_age seconds after they were first queried.
+
+    Args:
+        max_entries (int, optional): Filter combinations to keep. Defaults to 16.
+        max_age (float | None, optional): Seconds records are reused for. Defaults to
+            performance 'report_cache_seconds'.
+    """
+
+    def __init__(self, max_entries: int = 16, max_age: float | None = None):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.entries = OrderedDict()
+        self.engine = None
+        self.lock = Lock()
+
+    @classmethod
+    def as_day(cls, value: date | datetime) -> date:
+        return value.date() if isinstance(value, datetime) else value
+
+    def records(self, key: tuple, start_date: date | datetime, end_date: date | datetime,
+                build: Callable[[date, date], List[Tuple[date, dict]]]) -> List[dict]:
+        """
+        Records for submissions between start_date and end_date, building only what isn't cached.
+
+        Args:
+            key (tuple): Maker and filters the records depend on.
+            start_date (date | datetime): First day, inclusive.
+            end_date (date | datetime): Last day, inclusive.
+            build (Callable): Queries the records for a day range, as (submitted day, record) pairs.
+
+        Returns:
+            List[dict]: The records in the range.
+        """
+        start, end = self.as_day(start_date), self.as_day(end_date)
+        max_age = self.max_age
+        if max_age is None:
+            max_age = {**database_performance, **(ctx.database.get("performance") or {})}['report_cache_seconds']
+        with self.lock:
+            if self.engine is not ctx.database.engine:
+                self.entries.clear()
+                self.engine = ctx.database.engine
+            entry = self.entries.get(key)
+        one_day = timedelta(days=1)
+        now = monotonic()
+        # NOTE: Extending a range keeps the entry's age; its older records are no fresher for it.
+        if entry is None or now - entry[3] > max_age or end < entry[0] - one_day or start > entry[1] + one_day:
+            entry = (start, end, build(start, end), now)
+        else:
+            cached_start, cached_end, pairs, built = entry
+            before = build(start, cached_start - one_day) if start < cached_start else []
+            after = build(cached_end + one_day, end) if end > cached_end else []
+            entry = (min(start, cached_start), max(end, cached_end), before + pairs + after, built)
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return [record for day, record in entry[2] if start <= day <= end]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+report_cache = RecordCache()
+
+
+@event.listens_for(Session, "after_flush")
+def _note_report_changes(session, flush_context):
+    session.info["report_changes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_report_cache(session):
+    if session.info.pop("report_changes", False):
+        report_cache.clear()
 
 
 class ReportArchetype(object):
@@ -42,13 +137,16 @@ class ReportArchetype(object):
 class ReportMaker(object):
 
     def __init__(self, start_date: date, end_date: date, organizations: list | None = None):
-        from backend.db.models import Procedure 
+        from backend.db.models import Procedure, read_only_session
         self.start_date = start_date
         self.end_date = end_date
-        # NOTE: limit defaults to unlimited.
-        self.procedures = Procedure.query(start_date=start_date, end_date=end_date)
-        if organizations is not None:
-            self.procedures = [procedure for procedure in self.procedures if procedure.run.clientsubmission.clientlab.name in organizations]
+        with read_only_session():
+            # NOTE: limit defaults to unlimited.
+            procedures = Procedure.query(start_date=start_date, end_date=end_date)
+            if organizations is not None:
+                procedures = [procedure for procedure in procedures if procedure.run.clientsubmission.clientlab.name in organizations]
+            # NOTE: Keep only the details; rows must not leave the worker thread the report is built on.
+            self.procedures = [procedure.details_dict for procedure in with_progress(procedures, "Costing procedures")]
         self.detailed_df, self.summary_df = self.make_report_xlsx()
         self.html = self.make_report_html(df=self.summary_df)
 
@@ -61,7 +159,7 @@ class ReportMaker(object):
         """
         if not self.procedures:
             return DataFrame(), DataFrame()
-        df = DataFrame.from_records([item.details_dict for item in self.procedures])
+        df = DataFrame.from_records(self.procedures)
         # NOTE: put procedure with the same lab together
         df = df.sort_values("clientlab")
         # NOTE: aggregate cost and sample count columns
@@ -157,16 +255,25 @@ class ReportMaker(object):
 class TurnaroundMaker(ReportArchetype):
 
     def __init__(self, start_date: date, end_date: date, submission_types: str):
-        from backend.db.models import ClientSubmission
         self.start_date = start_date
         self.end_date = end_date
-        # NOTE: Set page size to zero to override limiting query size.
-        self.subs = ClientSubmission.query(start_date=start_date, end_date=end_date,
-                                   submissiontype=submission_types, page_size=0)
-        records = [self.build_record(sub) for sub in self.subs]
+        # NOTE: Turnaround of unfinished submissions counts up to today.
+        key = (self.__class__, submission_types, date.today())
+        records = report_cache.records(key, start_date, end_date,
+                                       lambda start, end: self.query_records(start, end, submission_types))
         self.df = DataFrame.from_records(records)
         self.sheet_name = "Turnaround"
 
+    @classmethod
+    def query_records(cls, start_date: date, end_date: date, submission_types: str) -> List[Tuple[date, dict]]:
+        from backend.db.models import ClientSubmission, read_only_session
+        with read_only_session():
+            # NOTE: Set page size to zero to override limiting query size.
+            subs = ClientSubmission.query(start_date=start_date, end_date=end_date,
+                                          submissiontype=submission_types, page_size=0)
+            return [(RecordCache.as_day(sub.submitted_date), cls.build_record(sub))
+                    for sub in with_progress(subs, "Timing submissions")]
+
     @classmethod
     def build_record(cls, sub: ClientSubmission) -> dict:
         """
@@ -184,35 +291,86 @@ class TurnaroundMaker(ReportArchetype):
 
 class ResultsMaker(ReportArchetype):
 
+    container_key = None  #: see ResultsValue.query_report_rows
+
     def __init__(self, start_date: date, end_date: date, submission_types: str, include: List[str] = [], **kwargs):
-        from backend.db.models import ClientSubmission
         self.start_date = start_date
         self.end_date = end_date
-        # NOTE: Set page size to zero to override limiting query size.
-        self.subs = ClientSubmission.query(start_date=start_date, end_date=end_date,
-                                   submissiontype=submission_types, page_size=0)
-        records = []
-        for clientsubmission in self.subs:
-            for result in clientsubmission.get_procedure_sample_results(include=[s.lower() for s in include]):
-                output = self.build_record(result)
-                for item in output:
-                    records.append(item)
+        include = [s.lower() for s in include]
+        if isinstance(submission_types, list):
+            submission_types = tuple(sorted(submission_types))
+        key = (self.__class__, submission_types, tuple(sorted(include)))
+        records = report_cache.records(key, start_date, end_date,
+                                       lambda start, end: self.query_records(start, end, submission_types, include))
         self.df = DataFrame.from_records(records)
         self.sheet_name = self.__class__.__name__.replace("Maker", "")
 
     @classmethod
-    def build_record(cls, results: Results) -> Generator[dict, None, None]:
-        sample = results.sampleprocedureassociation.sample
-        match sample.is_control:
+    def query_records(cls, start_date: date, end_date: date, submission_types: str | tuple | None,
+                      include: List[str]) -> List[Tuple[date, dict]]:
+        from backend.db.models import ResultsValue, read_only_session
+        if isinstance(submission_types, tuple):
+            submission_types = list(submission_types)
+        records = []
+        with read_only_session() as session:
+            rows = ResultsValue.query_report_rows(start_date=start_date, end_date=end_date,
+                                                  submissiontype=submission_types, include=include,
+                                                  container_key=cls.container_key)
+            procedures = cls.procedure_names(session, {row.procedure_id for row in rows})
+        # NOTE: Rows come ordered by results, then by their position in the payload.
+        groups = groupby(rows, key=attrgetter("results_id"))
+        for _, values in with_progress(groups, "Reading results", total=len({row.results_id for row in rows})):
+            values = list(values)
+            day = RecordCache.as_day(values[0].submitted_date)
+            for item in cls.build_record(values, procedures):
+                records.append((day, item))
+        return records
+
+    @classmethod
+    def procedure_names(cls, session: Session, ids: set) -> dict:
+        """
+        Names of the procedures the results belong to, fetched together.
+
+        Args:
+            session (Session): Session to query with.
+            ids (set): Procedure ids.
+
+        Returns:
+            dict: Procedure names by id.
+        """
+        from backend.db.models import Procedure
+        if not ids:
+            return {}
+        query = (session.query(Procedure).filter(Procedure.id.in_(ids))
+                 .options(selectinload(Procedure._run), selectinload(Procedure._proceduretype)))
+        return {procedure.id: procedure.name for procedure in query}
+
+    @classmethod
+    def control_type(cls, is_control: int | None) -> str:
+        match is_control:
             case 1:
-                control_type = "Positive Control"
+                return "Positive Control"
             case -1:
-                control_type = "Negative Control"
+                return "Negative Control"
             case _:
-                control_type = "Sample"
-        procedure = results.procedure.name
-        output = results.result
-        output.update(dict(control_type=control_type, procedure=procedure, sample_id=sample.sample_id, submitted_date=results.procedure.run.clientsubmission.submitted_date))
+                return "Sample"
+
+    @classmethod
+    def build_record(cls, values: List[Row], procedures: dict) -> Generator[dict, None, None]:
+        """
+        Turns the ResultsValue rows of one Results into report records.
+
+        Args:
+            values (List[Row]): Rows from ResultsValue.query_report_rows for a single Results.
+            procedures (dict): Procedure names by id.
+
+        Returns:
+            Generator[dict, None, None]: One record holding the top level values and the sample details.
+        """
+        first = values[0]
+        output = {row.key: row.value for row in values if row.depth == 0}
+        output.update(dict(control_type=cls.control_type(first.is_control), procedure=procedures.get(first.procedure_id),
+                           sample_id=first.sample_id, submitted_date=first.submitted_date))
         yield output
 
 
@@ -230,6 +388,8 @@ class ConcentrationMaker(ResultsMaker):
 
 class PCRMaker(ResultsMaker):
 
+    container_key = "cq"
+
     def __init__(self, start_date: date, end_date: date, submission_types: str, include: List[str] = [], **kwargs):
         super().__init__(start_date, end_date, submission_types, include, **kwargs)
         try:
@@ -241,23 +401,36 @@ class PCRMaker(ResultsMaker):
             logger.warning("No 'cq' column found in the dataframe. PCRMaker may not function as intended.")
     
     @classmethod
-    def build_record(cls, results: Results, target_key: str="cq") -> Generator[dict, None, None]:
-        output = super().build_record(results)
-        for item in output:
-            targets = find_paths_to_value(target_key=target_key, data=item)
-            for target in targets:
-                path = "-".join(target[1])
-                target = convert_strings(target[0])
-                new_item = {k: v for k, v in item.items() if not isinstance(v, dict)}  # NOTE: keep all non-dict items
-                new_item['path'] = path
-                new_item.update(target)  # NOTE: add target key-values to the new item
-                yield new_item
+    def build_record(cls, values: List[Row], procedures: dict) -> Generator[dict, None, None]:
+        """
+        One record per dict in the payload holding a cq, with its values, its path and the
+        top level values of the payload. Only dicts under the first top level key to hold any
+        are used, as tools.find_paths_to_value did.
+        """
+        from backend.db.models import ResultsValue
+        base = next(super().build_record(values, procedures))
+        containers = OrderedDict()
+        for row in values:
+            if row.depth > 0:
+                containers.setdefault(row.path, {})[row.key] = row.value
+        branch = None
+        for path, container in containers.items():
+            keys = ResultsValue.split_path(path)
+            if branch is None:
+                branch = keys[0]
+            elif keys[0] != branch:
+                continue
+            new_item = dict(base)
+            new_item['path'] = "-".join(keys)
+            new_item.update(convert_strings(container))
+            yield new_item
 
 
 class ChartReportMaker(ReportArchetype):
 
-    def __init__(self, df: DataFrame):
+    def __init__(self, df: DataFrame, sheet_name: str | None = None):
         self.df = df
+        self.sheet_name = sheet_name
 
 
-__all__ = ["ReportArchetype", "ReportMaker", "TurnaroundMaker", "ResultsMaker", "ConcentrationMaker", "PCRMaker", "ChartReportMaker"]
\ No newline at end of file
+__all__ = ["RecordCache", "report_cache", "ReportArchetype", "ReportMaker", "TurnaroundMaker", "ResultsMaker", "ConcentrationMaker", "PCRMaker", "ChartReportMaker"]
\ No newline at end of file
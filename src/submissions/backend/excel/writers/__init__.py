@@ -162,7 +162,7 @@ class DefaultTABLEWriter(DefaultWriter):
                           start_row: int | None = None, *args, **kwargs) -> Workbook:
         workbook = super().write_to_workbook(workbook=workbook, sheet=sheet, start_row=start_row, *args, **kwargs)
         
-        records = [getattr(item, 'improved_dict', {}) for item in self.pydant_obj]
+        records = [dict(getattr(item, 'improved_dict', {})) for item in self.pydant_obj]
         df = DataFrame(records)[self.sorted_header_row]
         df.replace("", npnan, inplace=True)
 
@@ -10,10 +10,10 @@ from frontend.widgets.functions import select_open_file
 from tools import get_application_from_parent
 from backend.validators import pydant
 from backend.db.models import BaseClass
+from backend.excel.parsers import CSVSheet
 from openpyxl import load_workbook
 from openpyxl.workbook import Workbook
 from openpyxl.worksheet.worksheet import Worksheet
-from csv import reader as csvreader
 
 
 class DefaultManager(object):
@@ -42,7 +42,7 @@ class DefaultManager(object):
         instance.input_object = input_object
         return instance
 
-    def __init__(self, parent, input_object: Path | str | pydant.PydBaseClass | BaseClass | Workbook | Worksheet | None = None, **kwargs):
+    def __init__(self, parent, input_object: Path | str | pydant.PydBaseClass | BaseClass | Workbook | Worksheet | CSVSheet | None = None, **kwargs):
         self.parent = parent
         self.input_object = input_object
         self.sheets = self.set_sheets()
@@ -60,20 +60,10 @@ class DefaultManager(object):
         if isinstance(self.input_object, str):
             self.input_object = Path(self.input_object)
         if isinstance(self.input_object, Path):
-            self.input_object = self.input_object.absolute()
-            filepath = deepcopy(self.input_object)
-            if self.input_object.suffix == ".csv":
-                self.input_object = self.csv2xlsx(self.input_object)
-                if isinstance(self.input_object, tuple):
-                    self.input_object = self.input_object[1]
-            elif self.input_object.suffix == ".xlsx":
-                self.input_object = load_workbook(self.input_object, data_only=True)
-            else:
-                raise TypeError(f"Unknown file type: {self.input_object.suffix}")
-            self.input_object.file = filepath
+            self.input_object = self.load_file(self.input_object)
         # NOTE: If input_object is a str or path, use parser to construct object
         match self.input_object:
-            case Workbook() | Worksheet():
+            case Workbook() | Worksheet() | CSVSheet():
                 self.pyd = self.parse()
             case _ if issubclass(self.input_object.__class__, pydant.PydBaseClass):
                 self.pyd = self.input_object
@@ -89,6 +79,43 @@ class DefaultManager(object):
                 else:
                     raise ValueError(f"No parent, cannot get user input.")
 
+    @classmethod
+    def load_file(cls, filepath: Path | str) -> Workbook | CSVSheet:
+        """
+        Opens a file for parsing, keeping where it came from as .file
+
+        Args:
+            filepath (Path | str): An xlsx or csv file.
+
+        Returns:
+            Workbook | CSVSheet: The opened file.
+        """
+        filepath = Path(filepath).absolute()
+        if filepath.suffix == ".csv":
+            # NOTE: Read directly, the parsers accept a CSVSheet wherever they take a Worksheet.
+            input_object = CSVSheet.from_file(filepath)
+        elif filepath.suffix == ".xlsx":
+            input_object = load_workbook(filepath, data_only=True)
+        else:
+            raise TypeError(f"Unknown file type: {filepath.suffix}")
+        input_object.file = deepcopy(filepath)
+        return input_object
+
+    @classmethod
+    def read_input(cls, filepath: Path | str) -> dict:
+        """
+        Opens and hashes a file without touching the database or any widgets, so it can run
+        on a worker thread, see frontend.widgets.task_runner.Task
+
+        Args:
+            filepath (Path | str): An xlsx or csv file.
+
+        Returns:
+            dict: input_object, the opened file, and digest, its hash for the import ledger.
+        """
+        from backend.db.models import ImportLedger
+        return dict(input_object=cls.load_file(filepath), digest=ImportLedger.digest_file(filepath))
+
     def parse(self):
         raise NotImplementedError("Parse only implemented in subclasses.")
 
@@ -105,22 +132,12 @@ class DefaultManager(object):
                 logger.exception(f"Couldn't get pyd object using pyd_name. Returning None")
                 return None
         
-    @classmethod
-    def csv2xlsx(cls, filepath):
-        wb = Workbook()
-        ws = wb.active
-        with open(filepath, "r") as f:
-            reader = csvreader(f, delimiter=",")
-            for row in reader:
-                ws.append(row)
-        return wb, ws
-
     def to_pydantic(self):
         return self.pyd
 
-    def get_worksheet(self, sheet: Worksheet | str | int = 0):
+    def get_worksheet(self, sheet: Worksheet | CSVSheet | str | int = 0):
         match sheet:
-            case Worksheet():
+            case Worksheet() | CSVSheet():
                 return sheet
             case str():
                 return self.input_object[sheet]
@@ -5,9 +5,10 @@ from __future__ import annotations
 from logging import getLogger
 logger = getLogger(f"submissions.{__name__}")
 from .. import DefaultManager
-from backend.db.models import Procedure
+from backend.db.models import Procedure, ImportLedger
 from pathlib import Path
-from frontend.widgets import ExcelSheetSelector
+from frontend.widgets import ExcelSheetSelector, select_open_file
+from tools import get_application_from_parent
 from openpyxl import Workbook
 from openpyxl.worksheet.worksheet import Worksheet
 from typing import Generator, List
@@ -17,11 +18,48 @@ from backend.validators.pydant import PydResults
 class DefaultResultsManager(DefaultManager):
 
     _pyd_object = PydResults
+    file_extension = "xlsx"
 
-    def __init__(self, procedure: Procedure, parent, input_object: Path | str | Workbook):
+    def __init__(self, procedure: Procedure, parent, input_object: Path | str | Workbook, digest: str | None = None):
         self.procedure = procedure
+        self.saved_results = []
+        # NOTE: The same export dropped in again for this procedure isn't parsed a second time.
+        if digest is None and isinstance(input_object, (str, Path)):
+            digest = ImportLedger.digest_file(input_object)
+        self.digest = digest
+        self.previous_import = None
+        if self.digest is not None:
+            self.previous_import = ImportLedger.lookup(kind=self.resultstype, procedure=procedure, digest=self.digest)
+        if self.previous_import is not None:
+            filename = Path(getattr(input_object, "file", input_object)).name
+            logger.warning(f"{filename} was already imported for {procedure.name} on {self.previous_import.imported}, skipping.")
+            self.info, self.samples = {}, []
+            return
         super().__init__(parent=parent, input_object=input_object)
 
+    @classmethod
+    def select_file(cls, parent) -> Path | None:
+        """
+        Asks the user for an export of this manager's file type.
+
+        Args:
+            parent (QWidget): Widget asking.
+
+        Returns:
+            Path | None: The chosen file, None if cancelled.
+        """
+        return select_open_file(file_extension=cls.file_extension, obj=get_application_from_parent(parent))
+
+    def record_import(self) -> ImportLedger | None:
+        """
+        Adds the file to the import ledger with the results saved from it.
+
+        Returns:
+            ImportLedger | None: The ledger entry, None if the input wasn't a file.
+        """
+        return ImportLedger.record(getattr(self.input_object, "file", None), kind=self.resultstype,
+                                   procedure=self.procedure, results=self.saved_results, digest=self.digest)
+
     @classmethod
     def get_sheets_for_parsing(cls, workbook: Workbook) -> List[Worksheet]:
         """
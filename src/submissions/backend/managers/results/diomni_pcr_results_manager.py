@@ -8,8 +8,6 @@ from pathlib import Path
 from openpyxl import Workbook
 from openpyxl.worksheet.worksheet import Worksheet
 from backend.excel.parsers.results_parsers.diomni_pcr_results_parser import DiomniPCRSampleParser, DiomniPCRInfoParser
-from tools import get_application_from_parent
-from frontend.widgets import select_open_file
 from . import DefaultResultsManager
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -19,11 +17,13 @@ if TYPE_CHECKING:
 class DiomniPCRManager(DefaultResultsManager):
 
     resultstype = "Diomni PCR"
+    file_extension = "xlsx"
 
-    def __init__(self, procedure: Procedure, parent, input_object: Path | str | Workbook | Worksheet | None = None):
+    def __init__(self, procedure: Procedure, parent, input_object: Path | str | Workbook | Worksheet | None = None,
+                 digest: str | None = None):
         if input_object is None:
-            input_object = select_open_file(file_extension="xlsx", obj=get_application_from_parent(parent))
-        super().__init__(procedure=procedure, parent=parent, input_object=input_object)
+            input_object = self.select_file(parent)
+        super().__init__(procedure=procedure, parent=parent, input_object=input_object, digest=digest)
         
     def parse(self):
         self.info = {}
@@ -9,8 +9,7 @@ from backend.db.models import Procedure
 from openpyxl import Workbook
 from openpyxl.worksheet.worksheet import Worksheet
 from frontend.widgets.results_sample_matcher import ResultsSampleMatcher
-from tools import get_application_from_parent
-from frontend.widgets.functions import select_open_file
+from backend.excel.parsers import CSVSheet
 from backend.excel.parsers.results_parsers.qubit_results_parser import QubitSampleParser, QubitInfoParser
 from . import DefaultResultsManager
 
@@ -18,12 +17,15 @@ from . import DefaultResultsManager
 class QubitManager(DefaultResultsManager):
 
     resultstype = "Qubit"
+    file_extension = "csv"
 
-    def __init__(self, procedure: Procedure, parent, input_object: Path | str | Workbook | Worksheet | None = None):
+    def __init__(self, procedure: Procedure, parent, input_object: Path | str | Workbook | Worksheet | CSVSheet | None = None,
+                 digest: str | None = None):
         if input_object is None:
-            input_object = select_open_file(file_extension="csv", obj=get_application_from_parent(parent))
-        super().__init__(procedure=procedure, parent=parent, input_object=input_object)
-        self.sample_matcher()
+            input_object = self.select_file(parent)
+        super().__init__(procedure=procedure, parent=parent, input_object=input_object, digest=digest)
+        if self.previous_import is None:
+            self.sample_matcher()
 
     def sample_matcher(self):
         dlg = ResultsSampleMatcher(
@@ -37,6 +39,7 @@ class QubitManager(DefaultResultsManager):
         if dlg.exec():
             for result in dlg.output:
                 result.save()
+                self.saved_results.append(result)
 
     def procedure_to_pydantic(self) -> None:
         """
@@ -47,7 +50,7 @@ class QubitManager(DefaultResultsManager):
     def parse(self):
         if isinstance(self.input_object, Workbook):
              worksheet = self.get_worksheet(1)
-        elif isinstance(self.input_object, Worksheet):
+        elif isinstance(self.input_object, (Worksheet, CSVSheet)):
             worksheet = self.input_object
         else:
             raise TypeError(f"Unknown input object type: {type(self.input_object)}")
@@ -12,8 +12,10 @@ from tools import jinja_env
 from jinja2 import Template
 from dateutil.parser import parse
 from datetime import date, datetime
+from sqlalchemy import select
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
+    from sqlalchemy.engine import Connection
     from backend.db.models import SubmissionType
 
 
@@ -30,6 +32,8 @@ class DefaultNamer(object):
             self.filepath = filepath
             self.workbook = load_workbook(self.filepath)
         elif isinstance(filepath, Workbook):
+            # NOTE: Set by DefaultManager.load_file, used to guess the submissiontype from the name.
+            self.filepath = getattr(filepath, "file", None)
             self.workbook = filepath
 
 
@@ -44,7 +48,7 @@ class ClientSubmissionNamer(DefaultNamer):
                 if submissiontype in ["", "None"]:
                     self.submissiontype = self.retrieve_submissiontype()    
                 else:
-                    self.submissiontype = SubmissionType.query(name=submissiontype)
+                    self.submissiontype = SubmissionType.cached(name=submissiontype)
             case SubmissionType():
                 self.submissiontype = submissiontype
             case _:
@@ -77,7 +81,7 @@ class ClientSubmissionNamer(DefaultNamer):
                 sub_type = dlg.parse_form()
         if not sub_type:
             logger.warning(f"Getting submissiontype from regex failed, using default submissiontype.")
-            sub_type = SubmissionType.query(name="Default SubmissionType", limit=1)
+            sub_type = SubmissionType.cached(name="Default SubmissionType")
         return sub_type
 
     def get_subtype_from_regex(self) -> SubmissionType:
@@ -92,7 +96,7 @@ class ClientSubmissionNamer(DefaultNamer):
         m = regex.search(self.filepath.__str__())
         try:
             sub_type = m.lastgroup
-            sub_type = SubmissionType.query(name=sub_type)
+            sub_type = SubmissionType.cached(name=sub_type)
         except AttributeError as e:
             sub_type = None
             logger.exception(f"No procedure type found or procedure type found!: {e}")
@@ -111,7 +115,7 @@ class ClientSubmissionNamer(DefaultNamer):
         from backend.excel.parsers import DefaultKEYVALUEParser
         parser = DefaultKEYVALUEParser(worksheet=self.workbook["Client Info"])
         sub_type = next((value for k, value in parser.parsed_info if k in ["submissiontype", "submission_type"]), None)
-        sub_type = SubmissionType.query(name=sub_type)
+        sub_type = SubmissionType.cached(name=sub_type)
         if isinstance(sub_type, list):
             sub_type = None
         return sub_type
@@ -130,7 +134,7 @@ class ClientSubmissionNamer(DefaultNamer):
         except AttributeError:
             return None
         sub_type = next((item.strip().title() for item in categories), None)
-        sub_type = SubmissionType.query(name=sub_type)
+        sub_type = SubmissionType.cached(name=sub_type)
         if isinstance(sub_type, list):
             sub_type = None
         return sub_type
@@ -146,13 +150,13 @@ class RSLNamer(object):
         # NOTE: Preferred method is path retrieval, but might also need validation for just string.
         match submission_type:
             case str():
-                self.sub_object = SubmissionType.query(name=submission_type, limit=1)
+                self.sub_object = SubmissionType.cached(name=submission_type)
                 self.submission_type = submission_type
             case SourcedField():
-                self.sub_object = SubmissionType.query(name=submission_type.value, limit=1)
+                self.sub_object = SubmissionType.cached(name=submission_type.value)
                 self.submission_type = submission_type.value
             case dict():
-                self.sub_object = SubmissionType.query(name=submission_type['value'], limit=1)
+                self.sub_object = SubmissionType.cached(name=submission_type['value'])
                 self.submission_type = submission_type['value']
             case SubmissionType():
                 self.sub_object = submission_type
@@ -161,22 +165,24 @@ class RSLNamer(object):
                 raise TypeError(f"Unmatched type {type(submission_type)} for submission_type")
         
     @classmethod
-    def construct_new_plate_name(cls, data: dict) -> str:
+    def construct_new_plate_name(cls, data: dict, allocate: bool = True) -> str:
         """
         Make a brand-new plate name from procedure data.
 
         Args:
             data (dict): incoming procedure data
+            allocate (bool, optional): Take the number, in the session's transaction. False only proposes
+                the next free one, e.g. for a run that may not be saved. Defaults to True.
 
         Returns:
             str: Output filename
         """
-        from backend.db.models import Run
+        from backend.db.models import IDSequence
         submitted_date = data.get("submitted_date", None)
         match submitted_date:
             case dict():
                 data['submitted_date'] = submitted_date.get("value", datetime.now())
-                return cls.construct_new_plate_name(data=data)
+                return cls.construct_new_plate_name(data=data, allocate=allocate)
             case str():
                 submitted_date = parse(submitted_date)
             case date():
@@ -189,13 +195,31 @@ class RSLNamer(object):
                     submitted_date = parse(submitted_date.group())
                 except (AttributeError, KeyError):
                     submitted_date = datetime.now()
-        previous = Run.query(start_date=submitted_date, end_date=submitted_date, submissiontype_name=data['submissiontype'])
-        if previous:
-            if not isinstance(previous, list):
-                previous = [previous]
-        previous = previous or []
-        plate_number = len(previous) + 1
-        return f"RSL-{data['abbreviation']}-{submitted_date.year}{str(submitted_date.month).zfill(2)}{str(submitted_date.day).zfill(2)}-{plate_number}"
+        prefix = f"RSL-{data['abbreviation']}-{submitted_date.year}{str(submitted_date.month).zfill(2)}{str(submitted_date.day).zfill(2)}"
+        # NOTE: Numbers come from a per-day sequence, so two imports at once can't get the same plate.
+        seed = lambda connection: cls.highest_plate_number(connection, prefix)
+        if allocate:
+            plate_number = IDSequence.next_value(name=prefix, seed=seed)
+        else:
+            plate_number = IDSequence.peek_value(name=prefix, seed=seed)
+        return f"{prefix}-{plate_number}"
+
+    @classmethod
+    def highest_plate_number(cls, connection: Connection, prefix: str) -> int:
+        """
+        Finds the highest plate number already used for a day, to start that day's sequence from.
+
+        Args:
+            connection (Connection): Connection the sequence is being allocated on.
+            prefix (str): Plate name up to the number, e.g. RSL-BC-20261018
+
+        Returns:
+            int: Highest number in use, 0 if none.
+        """
+        from backend.db.models import Run
+        names = connection.scalars(select(Run._rsl_plate_number).where(Run._rsl_plate_number.like(f"{prefix}-%")))
+        numbers = [int(name.rsplit("-", 1)[-1]) for name in names if name.rsplit("-", 1)[-1].isdigit()]
+        return max(numbers, default=0)
 
     @classmethod
     def construct_export_name(cls, template: str | Template, **kwargs) -> str:
@@ -7,13 +7,16 @@ logger = getLogger(f"submissions.{__name__}")
 from pathlib import Path
 from re import sub as rsub
 from inspect import signature, getmembers
+from itertools import chain
 from string import ascii_lowercase
+from collections import Counter, defaultdict
+from types import MappingProxyType
 from jinja2 import Template, TemplateNotFound
-from pydantic import BaseModel, Field, ValidationError, ValidationInfo, model_validator, ConfigDict, field_validator
+from pydantic import BaseModel, Field, PrivateAttr, ValidationError, ValidationInfo, model_validator, ConfigDict, field_validator
 from pydantic_core import core_schema
 from pydantic.fields import FieldInfo
 from datetime import date, datetime
-from typing import Any, Generator, List, Generic, TypeVar, Annotated, get_args, get_origin
+from typing import Any, ClassVar, Generator, List, Generic, TypeVar, Annotated, get_args, get_origin
 from types import UnionType
 from tools import classproperty, DotDict, convert_well_to_row_column, sort_dict_by_list, jinja_env
 from backend.db import models
@@ -28,6 +31,74 @@ from PyQt6.QtWidgets import QDialog
 
 T = TypeVar("T")
 
+# NOTE: Per-model hit/miss counters for the improved_dict cache, keyed by class name.
+_improved_dict_stats: defaultdict[str, Counter] = defaultdict(Counter)
+
+
+def _copy_containers(value: Any) -> Any:
+    """
+    Copies the dicts, lists and sets in value, sharing everything else (models, ORM objects).
+
+    Args:
+        value (Any): A value from improved_dict about to be changed, e.g. by a SQL row it's given to.
+
+    Returns:
+        Any: value with fresh containers.
+    """
+    match value:
+        case dict():
+            return {key: _copy_containers(item) for key, item in value.items()}
+        case list():
+            return [_copy_containers(item) for item in value]
+        case set():
+            return {_copy_containers(item) for item in value}
+        case _:
+            return value
+
+
+def _snapshot(value: Any) -> Any:
+    """
+    What a field holds, for noticing it was changed in place: the items of a list, the keys and
+    values of a dict, the value of a SourcedField, otherwise the value itself.
+
+    Args:
+        value (Any): A field's value.
+
+    Returns:
+        Any: A tuple for containers, compared item by item with _unchanged.
+    """
+    match value:
+        case list() | tuple() | set():
+            return tuple(value)
+        case dict():
+            return tuple(chain.from_iterable(value.items()))
+        case SourcedField():
+            return value.value, value.missing
+        case _:
+            return value
+
+
+def _unchanged(before: tuple, after: tuple) -> bool:
+    """
+    Whether two snapshots hold the very same objects, position by position.
+
+    Args:
+        before (tuple): Snapshots taken when the cache was built.
+        after (tuple): Snapshots taken now.
+
+    Returns:
+        bool: True if nothing was swapped, added or removed.
+    """
+    if len(before) != len(after):
+        return False
+    for old, new in zip(before, after):
+        if old is new:
+            continue
+        if not (isinstance(old, tuple) and isinstance(new, tuple) and len(old) == len(new)
+                and all(x is y for x, y in zip(old, new))):
+            return False
+    return True
+
 
 class SourcedField(BaseModel, Generic[T]):
     """
@@ -272,6 +343,103 @@ def _get_relationship_marker(field_info: FieldInfo) -> RelationshipField | None:
     return None
 
 
+def _models_configured() -> bool:
+    """
+    Whether SQLAlchemy has configured every mapper, which only happens once backend.db.models has finished importing.
+    """
+    mappers = models.Base.registry.mappers
+    return bool(mappers) and all(mapper.configured for mapper in mappers)
+
+
+class SqlMappingPlan:
+    """
+    Everything PydBaseClass needs to know about its SQLAlchemy counterpart,
+    reflected once per Pyd class instead of once per instance.
+
+    Pyd classes are created while backend.db.models is still importing, so neither
+    half can always be finished at class creation: the field partition needs pydantic
+    to have resolved every forward reference, and the mapped names need SQLAlchemy to
+    have configured its mappers (forcing that mid-import breaks every mapper). A plan
+    compiled too early is marked incomplete, and PydBaseClass._mapping_plan
+    recompiles it on first use after both are ready. From then on it is never rebuilt.
+    A class with no SQL class (PydAbstract etc.) is complete once the mappers are
+    configured, since by then every model there will be has been imported.
+
+    Attributes:
+        lookup_names (frozenset[str]): query() parameters that are also attributes of the Pyd class.
+        sql_field_names (frozenset[str]): Mapped column and relationship keys of the SQL class.
+        composite_key (bool): Whether the SQL table has a multi-column primary key.
+        relationship_fields (dict[str, RelationshipField]): Fields tagged with RelationshipField.
+        column_fields (list[str]): All other fields.
+        complete (bool): Whether both halves were taken from fully built classes.
+    """
+
+    def __init__(self, lookup_names: frozenset = frozenset(), sql_field_names: frozenset = frozenset(),
+                 composite_key: bool = False, relationship_fields: dict | None = None,
+                 column_fields: list | None = None, complete: bool = True):
+        self.lookup_names = lookup_names
+        self.sql_field_names = sql_field_names
+        self.composite_key = composite_key
+        self.relationship_fields = relationship_fields or {}
+        self.column_fields = column_fields or []
+        self.complete = complete
+
+    def __repr__(self) -> str:
+        return (f"SqlMappingPlan(lookup={sorted(self.lookup_names)}, "
+                f"relationships={list(self.relationship_fields)}, composite_key={self.composite_key})")
+
+    @classmethod
+    def compile(cls, pyd_class: type[PydBaseClass]) -> SqlMappingPlan:
+        """
+        Reflects the Pyd class and its SQL class.
+
+        Args:
+            pyd_class (type[PydBaseClass]): Class to compile a plan for.
+
+        Returns:
+            SqlMappingPlan: Plan for the class. SQL-side sets are empty if there is no SQL class.
+        """
+        from sqlalchemy import inspect as sql_inspect
+        relationship_fields = {}
+        for name, field_info in pyd_class.model_fields.items():
+            marker = _get_relationship_marker(field_info)
+            if marker is not None:
+                relationship_fields[name] = marker
+        column_fields = [name for name in pyd_class.model_fields if name not in relationship_fields]
+        complete = bool(getattr(pyd_class, "__pydantic_complete__", False))
+        try:
+            sql_class = pyd_class._sql_class
+        except AttributeError:
+            # NOTE: either the SQL model isn't imported yet, or (PydAbstract etc.) there is none.
+            return cls(relationship_fields=relationship_fields, column_fields=column_fields,
+                       complete=complete and _models_configured())
+        mapper = sql_inspect(sql_class, raiseerr=False)
+        if mapper is not None and not mapper.configured:
+            # NOTE: reading relationships now would configure mappers before every model is imported.
+            mapper = None
+            complete = False
+        try:
+            params = signature(sql_class.query).parameters
+            attributes = set(dir(pyd_class)) | set(pyd_class.model_fields)
+            lookup_names = frozenset(name for name in params
+                                     if not name.startswith("_")
+                                     and name not in ("limit", "kwargs")
+                                     and name in attributes)
+        except (TypeError, ValueError):
+            lookup_names = frozenset()
+        try:
+            sql_field_names = frozenset({attr.key for attr in mapper.column_attrs} |
+                                        {rel.key for rel in mapper.relationships})
+        except Exception:
+            sql_field_names = frozenset()
+        try:
+            composite_key = len(sql_class.__table__.primary_key.columns) > 1
+        except AttributeError:
+            composite_key = False
+        return cls(lookup_names=lookup_names, sql_field_names=sql_field_names, composite_key=composite_key,
+                   relationship_fields=relationship_fields, column_fields=column_fields, complete=complete)
+
+
 class PydBaseClass(BaseModel):#, validate_assignment=True):
 
     model_config = ConfigDict(
@@ -307,10 +475,42 @@ class PydBaseClass(BaseModel):#, validate_assignment=True):
 
     sql_instance: BaseClass | None = Field(default=None, validate_default=True, repr=False)
     new: bool = Field(default=True, repr=False, validate_default=True)
-    
+
+    # NOTE: Memoized _build_improved_dict, dropped whenever a public attribute is assigned.
+    _improved_dict_cache: dict | None = PrivateAttr(default=None)
+    # NOTE: Snapshots of the fields the cache was built from, see _improved_dict_state.
+    _improved_dict_state: tuple | None = PrivateAttr(default=None)
+    # NOTE: (child rows, their improved_dicts) for the keys from _improved_dict_children.
+    _children_improved_dict_cache: tuple | None = PrivateAttr(default=None)
+    # NOTE: Reflection results for this class, compiled in __pydantic_init_subclass__.
+    __mapping_plan__: ClassVar[SqlMappingPlan | None] = None
+
     def __str__(self) -> str:
         return self.__repr__()
 
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs: Any) -> None:
+        super().__pydantic_init_subclass__(**kwargs)
+        cls.__mapping_plan__ = SqlMappingPlan.compile(cls)
+
+    @classproperty
+    def _mapping_plan(cls) -> SqlMappingPlan:
+        """
+        Gets the compiled SqlMappingPlan, recompiling it if it was created before
+        pydantic or SQLAlchemy had finished building the classes involved.
+        """
+        plan = cls.__dict__.get("__mapping_plan__")
+        if plan is None or not plan.complete:
+            plan = SqlMappingPlan.compile(cls)
+            cls.__mapping_plan__ = plan
+        return plan
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        # NOTE: private attributes (including the cache itself) never affect improved_dict.
+        if not name.startswith("_"):
+            self.invalidate_improved_dict()
+
     @classproperty
     def aliases(cls) -> List[str]:
         """
@@ -394,14 +594,7 @@ class PydBaseClass(BaseModel):#, validate_assignment=True):
         """Strip leading underscores from keys that correspond to SQLAlchemy attributes."""
         if not isinstance(data, dict):
             return data
-        # Use sql_inspect to include inherited attributes
-        try:
-            from sqlalchemy import inspect as sql_inspect
-            mapper = sql_inspect(cls._sql_class)
-            sql_field_names = {attr.key for attr in mapper.column_attrs} | \
-                            {rel.key for rel in mapper.relationships}
-        except Exception:
-            sql_field_names = set()
+        sql_field_names = cls._mapping_plan.sql_field_names
         output = {}
         for key, value in data.items():
             stripped = key.lstrip("_")   # strip leading underscores only
@@ -480,9 +673,11 @@ class PydBaseClass(BaseModel):#, validate_assignment=True):
             return [cls._strip_procedure_refs(item) for item in obj]
         return obj
 
+    @models.rendered_once
     def improved_dict_expand_fields(self, fields: List[str | dict] | dict | str, include_procedures: bool = False, **kwargs) -> dict:
         """
-        Expands fields in the improved dict for use in forms.
+        Expands fields in the improved dict for use in forms. Inside a render_scope each
+        row is expanded once per set of fields and shared wherever it appears.
 
         Args:
             fields (List[str] | List[dict]): List[str] is a flat expansion, List[dict] expands recursively.
@@ -495,9 +690,9 @@ class PydBaseClass(BaseModel):#, validate_assignment=True):
             fields = [fields]
         elif isinstance(fields, str):
             fields = [fields]
+        dict_ = dict(self.improved_dict)
         if len(fields) == 0:
-            fields = self.improved_dict.keys()
-        dict_ = self.improved_dict
+            fields = list(dict_.keys())
         for field in fields:
             match field:
                 case str():
@@ -513,16 +708,16 @@ class PydBaseClass(BaseModel):#, validate_assignment=True):
                         case _AssociationList():
                             output = []
                             for item in value.col:
-                                dicto: dict = item.to_pydantic().improved_dict
+                                dicto = item.to_pydantic().improved_dict
                                 target = getattr(item, key)
-                                new = target.to_pydantic().improved_dict
+                                new = dict(target.to_pydantic().improved_dict)
                                 new.update({k:v for k, v in dicto.items() if k !="name"})
                                 if new['name'] not in [thing['name'] for thing in output]:
                                     output.append(new)
                         case InstrumentedList():
-                            output = [item.to_pydantic().improved_dict for item in value]
+                            output = [dict(item.to_pydantic().improved_dict) for item in value]
                         case _ if issubclass(value.__class__, models.BaseClass):
-                            output = value.to_pydantic().improved_dict
+                            output = dict(value.to_pydantic().improved_dict)
                         case _:
                             logger.warning(f"Got unmatched type for {field} during expand_fields: {value.__class__.__name__}")
                             continue
@@ -550,12 +745,110 @@ class PydBaseClass(BaseModel):#, validate_assignment=True):
         return sort_dict_by_list(dict_, self.class_config.key_value_order)
     
     @property
-    def improved_dict(self) -> dict:
+    def improved_dict(self) -> MappingProxyType:
         """
-        Adds model_extra to fields.
+        Memoized, read-only view of this instance as a dictionary.
+
+        The part built by _build_improved_dict is kept until a public attribute is assigned
+        (see __setattr__), a field is changed in place (a list appended to, a dict item set),
+        or invalidate_improved_dict is called. Keys from _improved_dict_children are kept until
+        the relationship they are read through holds different rows. Nested lists and dicts are
+        shared with the cache: copy the result with dict() to change the top level, and copy
+        a nested value before changing it.
+
+        Returns:
+            MappingProxyType: This instance as a read-only dictionary
+        """
+        stats = _improved_dict_stats[self.__class__.__name__]
+        cache = getattr(self, "_improved_dict_cache", None)
+        state = self._improved_dict_state_now()
+        if cache is not None and _unchanged(self._improved_dict_state, state):
+            stats['hits'] += 1
+        else:
+            stats['misses'] += 1
+            cache = dict(self._build_improved_dict())
+            try:
+                self._improved_dict_cache = cache
+                self._improved_dict_state = state
+            except AttributeError:
+                # NOTE: private attributes aren't initialized until validation completes.
+                pass
+        children = self._children_improved_dict()
+        return MappingProxyType(cache | children if children else cache)
+
+    def _improved_dict_state_now(self) -> tuple:
+        """
+        Snapshots of every field and extra, so improved_dict can tell one was changed in place.
+        """
+        extra = getattr(self, "__pydantic_extra__", None) or {}
+        return tuple(_snapshot(value) for value in chain(self.__dict__.values(), extra.values()))
+
+    def invalidate_improved_dict(self) -> None:
+        """
+        Drops the memoized improved_dict. Only needed when something _build_improved_dict reads
+        changes deeper than a field's own items, e.g. an attribute of a model in a list field.
+        """
+        try:
+            self._improved_dict_cache = None
+            self._children_improved_dict_cache = None
+        except AttributeError:
+            pass
+
+    @classmethod
+    def improved_dict_stats(cls, reset: bool = False) -> dict:
+        """
+        Gets hit/miss counters of the improved_dict cache for every model accessed so far.
 
         Args:
-            dictionaries (bool, optional): Are dictionaries expected as input? i.e. Should key['value'] be retrieved. Defaults to True.
+            reset (bool, optional): Clear the counters after reading. Defaults to False.
+
+        Returns:
+            dict: {model name: {hits, misses, hit_rate}}
+        """
+        output = {}
+        for name, counter in sorted(_improved_dict_stats.items()):
+            total = counter['hits'] + counter['misses']
+            output[name] = dict(hits=counter['hits'], misses=counter['misses'],
+                                hit_rate=counter['hits'] / total if total else 0.0)
+        if reset:
+            _improved_dict_stats.clear()
+        return output
+
+    def _improved_dict_children(self) -> dict:
+        """
+        Rows whose improved_dicts go into improved_dict, read through the sql_instance's
+        relationships, which change without this model knowing.
+
+        Returns:
+            dict: {key: rows}, the rows' improved_dicts override the key from _build_improved_dict.
+        """
+        return {}
+
+    def _children_improved_dict(self) -> dict:
+        """
+        The improved_dicts of the rows from _improved_dict_children, rebuilt only when a
+        relationship holds different rows than last time.
+
+        Returns:
+            dict: {key: [improved_dict of each row]}
+        """
+        children = {key: tuple(rows or []) for key, rows in self._improved_dict_children().items()}
+        if not children:
+            return {}
+        cached = getattr(self, "_children_improved_dict_cache", None)
+        if cached is not None and cached[0].keys() == children.keys() \
+                and _unchanged(tuple(cached[0].values()), tuple(children.values())):
+            return cached[1]
+        output = {key: [dict(row.to_pydantic().improved_dict) for row in rows] for key, rows in children.items()}
+        try:
+            self._children_improved_dict_cache = (children, output)
+        except AttributeError:
+            pass
+        return output
+
+    def _build_improved_dict(self) -> dict:
+        """
+        Adds model_extra to fields. Subclasses extend this rather than improved_dict.
 
         Returns:
             dict: This instance as a dictionary
@@ -605,16 +898,12 @@ class PydBaseClass(BaseModel):#, validate_assignment=True):
         (e.g. role-name only) from silently re-binding an existing association
         onto a different parent.
         """
-        sig = signature(self._sql_class.query).parameters
-        candidates = {
-            name for name in sig
-            if not name.startswith("_")
-            and name not in ("limit", "kwargs")
-            and name in dir(self)
-        }
-
+        plan = self.__class__._mapping_plan
+        # Composite-key (junction) tables have no scalar identity → always create.
+        if plan.composite_key:
+            return {}
         result = {}
-        for name in candidates:
+        for name in plan.lookup_names:
             value = getattr(self, name)
             if isinstance(value, SourcedField):
                 value = value.value                      # unwrap before inspecting
@@ -625,14 +914,6 @@ class PydBaseClass(BaseModel):#, validate_assignment=True):
             if isinstance(value, (list, tuple, set, dict)):
                 continue                                 # uselist relationship / serialized blob
             result[name] = value
-
-        # Composite-key (junction) tables have no scalar identity → always create.
-        try:
-            if len(self._sql_class.__table__.primary_key.columns) > 1:
-                return {}
-        except AttributeError:
-            pass
-
         return result
 
     def to_sql(self, update: bool = True):
@@ -673,7 +954,8 @@ class PydBaseClass(BaseModel):#, validate_assignment=True):
                 case ColumnProperty():
                     if getattr(self.sql_instance, k) != v:
                         try:
-                            setattr(self.sql_instance, k, v)
+                            # NOTE: The row gets its own containers; JSON columns are changed in place later.
+                            setattr(self.sql_instance, k, _copy_containers(v))
                         except AttributeError as e:
                             logger.exception(f"Could not set {k} on {self.sql_instance}: {e}")
                 case _:
@@ -1037,6 +1319,7 @@ class PydBaseClass(BaseModel):#, validate_assignment=True):
         try:
             new = self.model_validate(self.__dict__)
             self.__dict__.update(new.__dict__)
+            self.invalidate_improved_dict()
         except ValidationError as e:
             raise e
         
@@ -1067,7 +1350,8 @@ class PydBaseClass(BaseModel):#, validate_assignment=True):
     def to_html(self, css_in: List[str| Path] | str = [], js_in: List[str | Path] | str = [],
                             **kwargs) -> str:
         details_name = self.details_template.name.lower().replace("_details.html", "")
-        details = {details_name: self.clean_details_for_render(self.improved_dict | kwargs)}
+        with models.render_scope():
+            details = {details_name: self.clean_details_for_render(self.improved_dict | kwargs)}
         if isinstance(css_in, str | Path):
             css_in = [css_in]
         # env = jinja_template_loading()
@@ -1169,6 +1453,7 @@ class PydBaseClass(BaseModel):#, validate_assignment=True):
         config['key_value_order'] = config.get("key_value_order", [])
         config['write_sheet'] = config.get('write_sheet', cls._sql_name)
         config['recover'] = config.get('recover', [])
+        config['detail_fields'] = config.get('detail_fields', [])
         return DotDict(config)
 
     @classproperty
@@ -1183,12 +1468,7 @@ class PydBaseClass(BaseModel):#, validate_assignment=True):
         # {'reagentrole': RelationshipField(uselist=False),
         #  'reagentlot':  RelationshipField(uselist=True)}
         """
-        result = {}
-        for name, field_info in cls.model_fields.items():
-            marker = _get_relationship_marker(field_info)
-            if marker is not None:
-                result[name] = marker
-        return result
+        return cls._mapping_plan.relationship_fields
  
     @classproperty
     def _column_fields(cls) -> list[str]:
@@ -1196,8 +1476,7 @@ class PydBaseClass(BaseModel):#, validate_assignment=True):
         Return field names that are NOT tagged as relationships.
         Complements relationship_fields.
         """
-        rel = cls._relationship_fields
-        return [name for name in cls.model_fields if name not in rel]
+        return cls._mapping_plan.column_fields
 
     @classmethod
     def has_field(cls, fieldname):
@@ -1223,9 +1502,8 @@ class PydAbstract(PydBaseClass):
     
     
     
-    @property
-    def improved_dict(self) -> dict:
-        return self._strip_procedure_refs(super().improved_dict)
+    def _build_improved_dict(self) -> dict:
+        return self._strip_procedure_refs(super()._build_improved_dict())
 
 
 class PydConcrete(PydBaseClass):
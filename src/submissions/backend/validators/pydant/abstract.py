@@ -51,9 +51,8 @@ class PydTips(PydAbstract):
     def name(self) -> str:
         return f"{self.manufacturer} - {self.ref}({self.capacity}uL)"
 
-    @property
-    def improved_dict(self) -> dict:
-        output = super().improved_dict
+    def _build_improved_dict(self) -> dict:
+        output = super()._build_improved_dict()
         output['name'] = self.name
         return output
 
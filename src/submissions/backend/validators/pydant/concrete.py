@@ -12,6 +12,7 @@ from pydantic import AfterValidator, ConfigDict, Field, field_validator, compute
 from PyQt6.QtWidgets import QWidget
 from backend.validators import RSLNamer
 from backend.validators.shared import coerce_none_to_na, coerce_int_to_bool, parse_optional_datetime
+from backend.db.models import render_scope
 from backend.validators.pydant import PydConcrete, SourcedField, _coerce_datetime_field, _coerce_int_field, _coerce_str_field, RelationshipField
 from backend.validators.pydant.abstract import PydEquipmentRole, PydProcedureType, PydReagent, PydResultsType, PydReagentRole
 from tools import Alert, AlertStatus, Report, convert_well_to_row_column, get_prioritized_dict_prefix, iterable_enforcer, sort_dict_by_list
@@ -49,9 +50,8 @@ class PydResults(PydConcrete, arbitrary_types_allowed=True):
             resultstype = self.resultstype
         return f"{assoc}-{resultstype}"
 
-    @property
-    def improved_dict(self) -> dict:
-        output = super().improved_dict
+    def _build_improved_dict(self) -> dict:
+        output = super()._build_improved_dict()
         if self.sample:
             output['sample_id'] = self.sample.name if isinstance(self.sample, PydSample) else self.sample
             output['result'] = get_prioritized_dict_prefix(self.result, target_prefixes=self.resultstype.sample_key_order)
@@ -283,9 +283,8 @@ class PydSample(PydConcrete):
     def name(self) -> str:
         return self.sample_id
     
-    @property
-    def improved_dict(self) -> dict:
-        output = super().improved_dict
+    def _build_improved_dict(self) -> dict:
+        output = super()._build_improved_dict()
         output['name'] = self.name
         output['is_control'] = self.translate_control(self.is_control)
         return output
@@ -443,9 +442,8 @@ class PydProcessVersion(PydConcrete, extra="allow", arbitrary_types_allowed=True
         process = self.process or "Unassigned"
         return f"{process} - v{str(self.version)}"
 
-    @property
-    def improved_dict(self) -> dict:
-        return {k: v for k, v in super().improved_dict.items() if k not in ["procedure", "procedureequipmentassociation"]}
+    def _build_improved_dict(self) -> dict:
+        return {k: v for k, v in super()._build_improved_dict().items() if k not in ["procedure", "procedureequipmentassociation"]}
     
     def to_sql(self, update: bool = True):
         output = super().to_sql(update)
@@ -719,6 +717,8 @@ class PydProcedure(PydConcrete, arbitrary_types_allowed=True):
         eoi.tipslot = out_tips
         if checked:
             self.equipment.append(eoi)
+        # NOTE: eoi was changed in place and may be back where it was, which improved_dict can't see.
+        self.invalidate_improved_dict()
         
     @classmethod
     def update_new_reagents(cls, reagent: PydReagent):
@@ -787,9 +787,8 @@ class PydProcedure(PydConcrete, arbitrary_types_allowed=True):
             report.add_result(result)
         return report
     
-    @property
-    def improved_dict(self) -> dict:
-        output = super().improved_dict
+    def _build_improved_dict(self) -> dict:
+        output = super()._build_improved_dict()
         try:
             del output['results']
         except KeyError:
@@ -806,57 +805,8 @@ class PydProcedure(PydConcrete, arbitrary_types_allowed=True):
         return output
 
     def reorder_proceduretype_by_procedure(self):
-        proceduretype_dict = self.proceduretype.improved_dict_expand_fields([
-            {
-                "reagentrole":[
-                        {"reagent":["reagentlot"]}
-                        ]
-            }, 
-            {
-                "equipmentrole": [
-                        {"equipmentroleequipmentassociation":["equipment", {"process":["processversion", "tips"]}]}
-                        ]
-            }
-            ])
-        
-        for reagentlot in self.reagentlot:
-            proceduretype_reagentrole: dict = next((item for item in proceduretype_dict['reagentrole'] if item['name'] == reagentlot.reagentrole), None)
-            if not proceduretype_reagentrole:
-                continue
-            reagent_index = next((iii for iii, item in enumerate(proceduretype_reagentrole['reagent']) if item['name'] == reagentlot.reagent), None)
-            if reagent_index is None:
-                continue
-            proceduretype_reagentrole['reagent'].insert(0, proceduretype_reagentrole['reagent'].pop(reagent_index))
-            reagent = proceduretype_reagentrole['reagent'][0]
-            if len(reagent['reagentlot']) < 1:
-                reagent['reagentlot'].append("")
-            reagentlot_index = next((iii for iii, item in enumerate(reagent['reagentlot']) if item['name'] == reagentlot.reagentlot), None)
-            if reagentlot_index is None:
-                continue
-            
-            reagent['reagentlot'].insert(0, reagent['reagentlot'].pop(reagentlot_index))
-            # reagent['reagentlot'].append(dict(name="--New--", active=True))
-        for equipment in self.equipment:
-            proceduretype_equipmentrole: dict = next((item for item in proceduretype_dict['equipmentrole'] if item['name'] == equipment.equipmentrole), None)
-            if not proceduretype_equipmentrole:
-                continue
-            ass_index = next((iii for iii, item in enumerate(proceduretype_equipmentrole['equipmentroleequipmentassociation']) 
-                        if item['equipmentrole'] == equipment.equipmentrole and item['equipment']['name'] == equipment.equipment), None)
-            if ass_index is None:
-                continue
-            proceduretype_equipmentrole['equipmentroleequipmentassociation'].insert(0, proceduretype_equipmentrole['equipmentroleequipmentassociation'].pop(ass_index))
-            process = next((item for item in proceduretype_equipmentrole['equipmentroleequipmentassociation'][0]['process'] if equipment.processversion in [pv['name'] for pv in item['processversion']]), None)
-            processversion_index = next((iii for iii, item in enumerate(process['processversion']) if item['name'] == equipment.processversion), None)
-            if not processversion_index:
-                continue
-            process['processversion'].insert(0, process['processversion'].pop(processversion_index))
-            if process.get('tips'):
-                for tips in equipment.tipslot:
-                    tipslot_index = next((iii for iii, item in enumerate(process['tips']) if item['name'] == tips), None)
-                    if not tipslot_index:
-                        continue
-                    process['tips'].insert(0, process['tips'].pop(tipslot_index))
-        
+        # NOTE: Role names only; the form fetches choices and current selections over the web channel.
+        proceduretype_dict = dict(self.proceduretype.improved_dict)
         repeat_regex = rcompile(r".*R\d$")
         proceduretype_dict['previous'] = [""] + [
             item.name for item in self.run.sql_instance.procedure if 
@@ -864,7 +814,6 @@ class PydProcedure(PydConcrete, arbitrary_types_allowed=True):
             and not bool(repeat_regex.match(item.name))
         ]
         proceduretype_dict['platemap'] = self.improved_dict['platemap']
-        self.proceduretype = self._strip_procedure_refs(proceduretype_dict)
         return proceduretype_dict
     
     def make_procedure_platemap(self):
@@ -928,7 +877,9 @@ class PydClientSubmission(PydConcrete):
                        "submissiontype",
                        "sample_count",
                        "submission_category"],
-            "write_sheet": "Client Info"
+            "write_sheet": "Client Info",
+            # NOTE: How each run is expanded on the details page.
+            "run_detail_fields": [{"procedure": ["sample"]}, "sample"]
         }
     )
     
@@ -1123,10 +1074,11 @@ class PydClientSubmission(PydConcrete):
             except TypeError:
                 return max([getattr(item, "submission_rank", None) for item in self.sql_instance.clientsubmissionsampleassociation])
 
-    @property
-    def improved_dict(self) -> dict:
-        output = super().improved_dict
-        output['run'] = [item.to_pydantic().improved_dict for item in self.sql_instance.run]
+    def _improved_dict_children(self) -> dict:
+        return dict(run=self.sql_instance.run)
+
+    def _build_improved_dict(self) -> dict:
+        output = super()._build_improved_dict()
         try:
             output['contact_email'] = output['contact']['email']
         except TypeError:
@@ -1151,11 +1103,14 @@ class PydClientSubmission(PydConcrete):
                 c.writerow([cell.value for cell in r])
 
     def to_html(self, **kwargs):
-        details = self.improved_dict_expand_fields(fields=[{"run": "sample"}, "sample"])
-        details['sample'] = [sample.sample_id for sample in self.sql_instance.sample]
-        details['run'] = [run.to_pydantic().improved_dict_expand_fields(fields=[{"procedure":["sample"]}, "sample"], include_procedures=True) for run in self.sql_instance.run]
-        # Up to this point, the samples are fine.
-        output = super().to_html(**details)
+        # NOTE: One scope for the page, so samples, reagents and equipment shared by runs are serialized once.
+        with render_scope():
+            details = self._strip_procedure_refs(dict(self.improved_dict))
+            details['sample'] = [sample.sample_id for sample in self.sql_instance.sample]
+            details['run'] = [run.to_pydantic().improved_dict_expand_fields(
+                fields=self.class_config.run_detail_fields, include_procedures=True) for run in self.sql_instance.run]
+            # Up to this point, the samples are fine.
+            output = super().to_html(**details)
         return output
 
     def add_run_comments(self, run: PydRun):
@@ -1183,7 +1138,8 @@ class PydRun(PydConcrete):
     model_config = ConfigDict(
         json_schema_extra = {
             "excluded": ["excluded", "sample", "procedure", "runsampleassociation", "permission", "namer", "filepath", "uploaded_by", "comment"],
-            "recover": ['sample', 'comment']
+            "recover": ['sample', 'comment'],
+            "detail_fields": ['procedure', 'sample']
         }
     )
 
@@ -1316,16 +1272,18 @@ class PydRun(PydConcrete):
         render = self.namer.construct_export_name(template=template, **self.improved_dict).replace("/", "")
         return render
 
-    @property
-    def improved_dict(self) -> dict:
-        output = super().improved_dict
-        output['procedure'] = [item.to_pydantic().improved_dict for item in self.sql_instance.procedure]
+    def _improved_dict_children(self) -> dict:
+        return dict(procedure=self.sql_instance.procedure)
+
+    def _build_improved_dict(self) -> dict:
+        output = super()._build_improved_dict()
         output['sample_count'] = self.sample_count
         return output
 
     def to_html(self, **kwargs):
-        details = self.improved_dict_expand_fields(fields=['procedure', 'sample'])
-        output = super().to_html(**details)
+        with render_scope():
+            details = self.improved_dict_expand_fields(fields=self.class_config.detail_fields)
+            output = super().to_html(**details)
         return output
 
     def add_samples(self, samples):
@@ -1435,9 +1393,8 @@ class PydProcedureSampleAssociation(PydConcrete):
         self.sql_instance.results = self.results
         return self.sql_instance, None
     
-    @property
-    def improved_dict(self) -> dict:
-        output = super().improved_dict
+    def _build_improved_dict(self) -> dict:
+        output = super()._build_improved_dict()
         output['sample_id'] = self.sample.sample_id if isinstance(self.sample, PydSample) else self.sample
         output['procedure'] = self.procedure.name if isinstance(self.procedure, PydProcedure) else self.procedure
         output['is_control'] = self.translate_control(output['is_control'], to_str=True)
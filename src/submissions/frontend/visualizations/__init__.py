@@ -5,11 +5,52 @@ from __future__ import annotations
 from logging import getLogger
 logger = getLogger(f"submissions.{__name__}")
 from datetime import date
+from functools import cache
+from pathlib import Path
 from typing import Generator
 from pandas import to_datetime as pd_to_datetime, DataFrame
-from plotly.offline import plot as pltplot
+from plotly import __version__ as plotly_version
+from plotly.offline import plot as pltplot, get_plotlyjs
 from plotly.graph_objects import Figure
-from tools import divide_chunks
+from tools import divide_chunks, jinja_env, Settings
+
+
+@cache
+def plotly_bundle(directory: Path | None = None) -> Path:
+    """
+    Writes the plotly.js that ships with the plotly package to disk, once per version.
+
+    Charts load it from here rather than a CDN, so they work on offline workstations and
+    the browser cache keeps it parsed between renders.
+
+    Args:
+        directory (Path | None, optional): Where to put it. Defaults to the 'assets' folder next to the config.
+
+    Returns:
+        Path: The local plotly.min.js
+    """
+    directory = directory or Settings.main_aux_dir.joinpath("assets")
+    bundle = directory.joinpath(f"plotly-{plotly_version}.min.js")
+    if not bundle.exists():
+        directory.mkdir(parents=True, exist_ok=True)
+        # NOTE: Write then rename so a second instance never loads half a file.
+        partial = bundle.with_suffix(".partial")
+        partial.write_text(get_plotlyjs(), encoding="utf-8")
+        partial.replace(bundle)
+    return bundle
+
+
+def chart_page_html(directory: Path | None = None) -> str:
+    """
+    The persistent chart page: plotly.js plus a web channel hook that redraws with Plotly.react.
+
+    Args:
+        directory (Path | None, optional): Location of the plotly bundle. Defaults to None.
+
+    Returns:
+        str: html string
+    """
+    return jinja_env.get_template("chart.html").render(plotly_src=plotly_bundle(directory).as_uri())
 
 
 class CustomFigure(Figure):
@@ -128,12 +169,23 @@ class CustomFigure(Figure):
         """
         html = f'<html><body>'
         if self is not None:
-            # NOTE: Just cannot get this load from string to freaking work.
-            html += pltplot(self, output_type='div', include_plotlyjs="cdn")
+            # NOTE: Inlining plotly.js exceeds setHtml's 2MB limit, so point at the local bundle.
+            html += f'<script src="{plotly_bundle().as_uri()}"></script>'
+            html += pltplot(self, output_type='div', include_plotlyjs=False)
         else:
             html += "<h1>No data was retrieved for the given parameters.</h1>"
         html += '</body></html>'
         return html
+
+    @property
+    def json(self) -> str:
+        """
+        Figure data and layout for Plotly.react, see frontend.widgets.info_tab.ChartView
+
+        Returns:
+            str: json string
+        """
+        return self.to_json()
     
 class ResultsFigure(CustomFigure):
     
@@ -128,6 +128,7 @@ from .submission_details import *
 from .submission_table import *
 from .submission_widget import *
 from .summary import *
+from .task_runner import *
 from .turnaround import *
 
 __all__ = ["CustomWebEnginePage", "DefaultWebDialog", "pandasModel", 
@@ -152,5 +153,6 @@ __all__ = ["CustomWebEnginePage", "DefaultWebDialog", "pandasModel",
            "SubmissionsTree", "TreeItem", "ClientSubmissionRunModel",
            "MyQComboBox", "MyQDateEdit", "MyQSpinBox", "MyQDoubleSpinBox", "SubmissionFormContainer", "SubmissionFormWidget", "ClientSubmissionFormWidget",
            "Summary",
+           "Task", "TaskRunner", "TaskSignals",
             "TurnaroundTime"
            ]
\ No newline at end of file
@@ -15,11 +15,12 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtGui import QAction
 from pathlib import Path
 from markdown import markdown
-from pandas import ExcelWriter
+from html import escape as html_escape
+from pandas import ExcelWriter, DataFrame
 from backend.validators.pydant import PydAbstract, PydConcrete
 from tools import (
     check_if_app, Settings, Report, check_authorization, page_size, is_power_user,
-    under_development, ctx, jinja_env
+    under_development, ctx, jinja_env, performance_summary
 )
 from .date_type_picker import DateTypePicker
 from .functions import select_save_file
@@ -33,6 +34,7 @@ from .concentration_viewer import ConcentrationViewer
 from .omni_search import SearchBox
 from .kraken_viewer import KrakenViewer
 from .pcr_viewer import PCRViewer
+from .task_runner import TaskRunner
 
 
 class App(QMainWindow):
@@ -56,6 +58,10 @@ class App(QMainWindow):
         self.setWindowTitle(self.title)
         self.setGeometry(self.left, self.top, self.width, self.height)
         self.page_size = page_size
+        # NOTE: Shared thread pool for reports and charts; has to exist before the tabs that use it.
+        self.task_runner = TaskRunner(self, max_threads=ctx.database.get("performance", {}).get("worker_threads", 2))
+        self.task_runner.progress.connect(self.show_task_progress)
+        self.task_runner.busy.connect(self.show_task_busy)
         # NOTE: insert tabs into main app
         self.table_widget = AddSubForm(self)
         self.setCentralWidget(self.table_widget)
@@ -76,6 +82,13 @@ class App(QMainWindow):
         self.idle_timer.start()
         # 3. Monitor global events by installing a filter on the app instance
         QApplication.instance().installEventFilter(self)
+        # NOTE: Periodic PRAGMA optimize/wal_checkpoint, see backend.db.maintain_database
+        maintenance_interval = ctx.database.get("performance", {}).get("maintenance_interval", 0)
+        self.maintenance_task = None
+        self.maintenance_timer = QTimer(self)
+        self.maintenance_timer.timeout.connect(self.maintain_database)
+        if maintenance_interval:
+            self.maintenance_timer.start(int(maintenance_interval) * 60 * 1000)
 
     def eventFilter(self, obj, event):
         # Define events that count as "activity"
@@ -92,6 +105,17 @@ class App(QMainWindow):
     def handle_timeout(self):
         exit(ctx.run_teardown()) # Standard way to exit a PyQt6 application
 
+    def maintain_database(self):
+        """
+        Run database housekeeping on the task runner, so a checkpoint waiting on a busy database
+        doesn't freeze the window. A failure is only logged (by the task), the user isn't interrupted.
+        """
+        from backend.db import maintain_database
+        # NOTE: Don't stack up another run behind one that's still waiting.
+        if self.maintenance_task is not None and self.maintenance_task in self.task_runner.tasks:
+            return
+        self.maintenance_task = self.task_runner.submit(maintain_database, name="Database maintenance")
+
     def _createMenuBar(self):
         """
         adds items to menu bar
@@ -106,8 +130,11 @@ class App(QMainWindow):
         helpMenu.addAction(self.helpAction)
         helpMenu.addAction(self.docsAction)
         helpMenu.addAction(self.githubAction)
+        helpMenu.addAction(self.performanceAction)
         fileMenu.addAction(self.importAction)
         fileMenu.addAction(self.archiveSubmissionsAction)
+        fileMenu.addAction(self.refreshReferenceAction)
+        fileMenu.addAction(self.cancelTasksAction)
         methodsMenu.addAction(self.searchSample)
         for action in self.abstractActions:
             manageabstractsMenu.addAction(action)
@@ -134,7 +161,11 @@ class App(QMainWindow):
         self.docsAction = QAction("&Docs", self)
         self.searchSample = QAction("Search Sample", self)
         self.githubAction = QAction("Github", self)
+        self.performanceAction = QAction("Performance", self)
         self.archiveSubmissionsAction = QAction("Submissions to Excel", self)
+        self.refreshReferenceAction = QAction("Refresh Lookup Tables", self)
+        self.cancelTasksAction = QAction("Cancel Background Tasks", self)
+        self.cancelTasksAction.setEnabled(False)
         self.abstractActions = [QAction(f"Manage {subcls.__name__.replace("Pyd", "")}", self) for subcls in PydAbstract.get_managables()]
         self.concreateActions = [QAction(f"Manage {subcls.__name__.replace("Pyd", "")}", self) for subcls in PydConcrete.get_managables()]
                 
@@ -147,7 +178,10 @@ class App(QMainWindow):
         self.docsAction.triggered.connect(self.openDocs)
         self.searchSample.triggered.connect(self.runSampleSearch)
         self.githubAction.triggered.connect(self.openGithub)
+        self.performanceAction.triggered.connect(self.showPerformance)
         self.archiveSubmissionsAction.triggered.connect(self.submissions_to_excel)
+        self.refreshReferenceAction.triggered.connect(self.refresh_reference_data)
+        self.cancelTasksAction.triggered.connect(self.task_runner.cancel_all)
         self.table_widget.pager.current_page.textChanged.connect(self.update_data)
         for action in self.abstractActions:
             class_ = next((subcls for subcls in PydAbstract.get_managables() if f"Manage {subcls.__name__.replace('Pyd', '')}" == action.text()), None)
@@ -158,6 +192,24 @@ class App(QMainWindow):
             if class_:
                 action.triggered.connect(lambda checked, parent=self, obj_type=class_: obj_type.manage(parent=parent))
 
+    def refresh_reference_data(self):
+        """
+        Drop cached submission types, roles and labs so changes made by other users are picked up.
+        """
+        from backend.db.models import ReferenceMixin
+        ReferenceMixin.refresh()
+        self.statusBar().showMessage("Lookup tables refreshed.", 5000)
+
+    def show_task_progress(self, name: str, value: int, message: str):
+        self.statusBar().showMessage(f"{name}: {message} ({value}%)" if message else f"{name}: {value}%")
+
+    def show_task_busy(self, busy: bool):
+        self.cancelTasksAction.setEnabled(busy)
+        if busy:
+            self.statusBar().showMessage("Working...")
+        else:
+            self.statusBar().showMessage("Ready", 5000)
+
     def showAbout(self):
         """
         Show the 'about' message
@@ -184,6 +236,24 @@ class App(QMainWindow):
         url = "https://github.com/landowark/submissions"
         wb_get('windows-default').open(url)
 
+    def showPerformance(self):
+        """
+        Show SQL statements and database time per UI action since startup.
+        """
+        summary = performance_summary()
+        if not summary:
+            html = "<h3>No actions recorded yet.</h3>"
+        else:
+            df = DataFrame([{k: v for k, v in row.items() if k != "slowest"} for row in summary])
+            html = df.to_html(index=False)
+            for row in summary:
+                html += f"<h4>{row['action']}</h4><ol>"
+                html += "".join(f"<li>{item['seconds']:.4f}s: <code>{html_escape(item['statement'])}</code></li>"
+                                for item in row['slowest'])
+                html += "</ol>"
+        dlg = HTMLPop(html=html, title="Performance")
+        dlg.exec()
+
     def openInstructions(self):
         if check_if_app():
             url = Path(sys._MEIPASS).joinpath("files", "README.md")
@@ -234,6 +304,9 @@ class App(QMainWindow):
 
     def closeEvent(self, event):
         try:
+            # NOTE: Let running tasks reach a cancellation point before their engine goes away.
+            self.task_runner.cancel_all()
+            self.task_runner.wait(10000)
             self.ctx.run_teardown()   # closes session + disposes engine (checkpoints WAL)
         finally:
             super().closeEvent(event)
@@ -4,6 +4,7 @@ Pane showing BC control concentrations summary.
 from __future__ import annotations
 from logging import getLogger
 logger = getLogger(f"submissions.{__name__}")
+from pandas import DataFrame
 from tools import report_result
 from .info_tab import PosNegPane
 from backend.excel.reports import ConcentrationMaker
@@ -25,14 +26,24 @@ class ConcentrationViewer(PosNegPane):
         super().update_data()
         if not self.chart_settings:      # nothing to plot yet
             return
+        self.run_task(self.make_chart, self.set_chart, name="Concentration chart", settings=self.chart_settings)
+
+    @classmethod
+    def make_chart(cls, settings: dict) -> dict:
+        """
+        Builds the report and chart; runs on a worker thread.
+
+        Returns:
+            dict: The report's df and sheet_name and the ConcentrationsChart's json, or a message if there is no data; see InfoPane.set_chart.
+        """
         try:
-            self.report_obj = ConcentrationMaker(**self.chart_settings)
+            report_obj = ConcentrationMaker(**settings)
         except (TypeError,  AttributeError) as e:
-            self.report_obj = None
-        if self.report_obj is None or self.report_obj.df.empty:
-            self.webview.setHtml("<h3>No data available for the selected date range and control types.</h3>")
-            return 
-        self.fig = ConcentrationsChart(df=self.report_obj.df, settings=self.chart_settings)
-        self.webview.setHtml(self.fig.html)
-        
+            report_obj = None
+        if report_obj is None or report_obj.df.empty:
+            return dict(df=DataFrame(), figure="",
+                        message="No data available for the selected date range and control types.")
+        fig = ConcentrationsChart(df=report_obj.df, settings=settings)
+        return dict(df=report_obj.df, sheet_name=report_obj.sheet_name, figure=fig.json)
+
 __all__ = ["ConcentrationViewer"]
\ No newline at end of file
@@ -8,12 +8,12 @@ from operator import itemgetter
 from PyQt6.QtWidgets import (
     QWidget, QDialog, QGridLayout, QLabel, QLineEdit, QDialogButtonBox, QTextEdit, QComboBox
 )
+from PyQt6.QtCore import QRectF, QTimer
 from PyQt6.QtGui import QIcon
-from PIL import Image
-from pyqtgraph import ImageView, setConfigOptions
-from numpy import flip as npflip, rot90 as nprot90, array as nparray
+from pyqtgraph import ImageItem, ImageView, setConfigOptions
 from typing import Tuple, List, TYPE_CHECKING
 from pathlib import Path
+from backend.db import ImagePyramid
 if TYPE_CHECKING:
     from backend.db.models import Run
 
@@ -21,6 +21,9 @@ if TYPE_CHECKING:
 # Main window class
 class GelBox(QDialog):
 
+    # NOTE: ms to wait after the last pan/zoom before reading detail from disk.
+    detail_debounce_ms = 150
+
     def __init__(self, parent, img_path: str | Path, submission: Run):
         super().__init__(parent)
         # NOTE: setting title
@@ -46,11 +49,23 @@ class GelBox(QDialog):
         setConfigOptions(antialias=True)
         # NOTE: creating image view object
         self.imv = ImageView()
-        # NOTE: Create image.
-        # NOTE: For some reason, ImageView wants to flip the image, so we have to rotate and flip the array first.
-        # NOTE: Using the Image.rotate function results in cropped image, so using np.
-        img = npflip(nprot90(nparray(Image.open(self.img_path)), 1), 0)
-        self.imv.setImage(img)
+        # NOTE: The pyramid stores levels already transposed the way ImageView wants them, and the
+        #  screen-sized overview is shown first, scaled up to full resolution coordinates.
+        self.pyramid = ImagePyramid(self.img_path)
+        overview, scale = self.pyramid.overview()
+        self.imv.setImage(overview, scale=(scale, scale))
+        # NOTE: Full detail is drawn over the overview, only for what's visible, once zoomed in far enough.
+        self.detail = ImageItem()
+        self.detail.setZValue(1)
+        self.detail.hide()
+        self.imv.getView().addItem(self.detail)
+        self.detail_timer = QTimer(self)
+        self.detail_timer.setSingleShot(True)
+        self.detail_timer.setInterval(self.detail_debounce_ms)
+        self.detail_timer.timeout.connect(self.update_detail)
+        self.imv.getView().sigRangeChanged.connect(self.detail_timer.start)
+        self.imv.getHistogramWidget().item.sigLevelsChanged.connect(self.match_detail_levels)
+        self.imv.getHistogramWidget().item.sigLookupTableChanged.connect(self.match_detail_levels)
         layout = QGridLayout()
         layout.addWidget(QLabel("DNA Core Submission Number"), 21, 1)
         self.core_number = QLineEdit()
@@ -77,6 +92,34 @@ class GelBox(QDialog):
         layout.addWidget(self.buttonBox, 23, 1, 1, 1)
         self.setLayout(layout)
 
+    def update_detail(self):
+        """
+        Shows the visible part of the gel from the coarsest pyramid level that still has a pixel
+        per screen pixel, or just the overview if that is already enough.
+        """
+        view = self.imv.getView()
+        (x0, x1), (y0, y1) = view.viewRange()
+        screen_width = max(view.width(), 1)
+        index = self.pyramid.level_for((x1 - x0) / screen_width)
+        if index == len(self.pyramid.shapes) - 1:
+            self.detail.hide()
+            return
+        pixels, (x, y, width, height) = self.pyramid.region(index, x0, y0, x1, y1)
+        if not pixels.size:
+            self.detail.hide()
+            return
+        self.detail.setImage(pixels, autoLevels=False)
+        self.detail.setRect(QRectF(x, y, width, height))
+        self.match_detail_levels()
+        self.detail.show()
+
+    def match_detail_levels(self, *args):
+        """
+        Keeps the detail drawn with the same levels/colour map as the overview's histogram.
+        """
+        self.detail.setLevels(self.imv.imageItem.getLevels())
+        self.detail.setLookupTable(self.imv.imageItem.lut)
+
     def parse_form(self) -> Tuple[str, str | Path, list]:
         """
         Get relevant values from self/form
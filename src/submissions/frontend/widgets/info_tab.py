@@ -5,17 +5,75 @@ from __future__ import annotations
 from logging import getLogger
 logger = getLogger(f"submissions.{__name__}")
 from datetime import date, datetime
-from PyQt6.QtCore import QSignalBlocker
+from PyQt6.QtCore import QSignalBlocker, QTimer, QUrl, pyqtSignal, pyqtSlot
+from PyQt6.QtWebChannel import QWebChannel
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWidgets import QWidget, QGridLayout, QPushButton, QLabel
-from tools import AlertStatus, Report, Alert
+from tools import AlertStatus, Report, Alert, track_action
 from .misc import CheckableComboBox, StartEndDatePicker
 from .functions import select_save_file, save_pdf
 
 
+class ChartView(QWebEngineView):
+    """
+    Web view that loads plotly.js once and redraws figures in place with Plotly.react.
+
+    Anything else given to setHtml (reports, messages) replaces the chart page, which is
+    reloaded the next time a figure is shown.
+    """
+
+    figureChanged = pyqtSignal(str, str)
+
+    def __init__(self, parent: QWidget | None = None):
+        super().__init__(parent)
+        self.chart_loaded = False
+        self.ready = False
+        self.pending = None
+        self.channel = QWebChannel()
+        self.channel.registerObject('backend', self)
+        self.page().setWebChannel(self.channel)
+
+    def setHtml(self, html: str, baseUrl: QUrl = QUrl()):
+        self.chart_loaded = False
+        self.ready = False
+        super().setHtml(html, baseUrl)
+
+    def load_chart_page(self):
+        from frontend.visualizations import chart_page_html, plotly_bundle
+        html = chart_page_html()
+        self.chart_loaded = True
+        self.ready = False
+        # NOTE: A file:// base lets the page load the local plotly bundle.
+        super().setHtml(html, QUrl.fromLocalFile(f"{plotly_bundle().parent}/"))
+
+    def show_figure(self, figure_json: str, message: str = ""):
+        """
+        Draw a figure, or clear the chart and show a message.
+
+        Args:
+            figure_json (str): Output of CustomFigure.json, empty for no figure.
+            message (str, optional): Text shown above the chart. Defaults to "".
+        """
+        if not self.chart_loaded:
+            self.load_chart_page()
+        if self.ready:
+            self.figureChanged.emit(figure_json, message)
+        else:
+            # NOTE: Only the latest figure matters while the page is still loading.
+            self.pending = (figure_json, message)
+
+    @pyqtSlot()
+    def pageReady(self):
+        self.ready = True
+        if self.pending is not None:
+            self.figureChanged.emit(*self.pending)
+            self.pending = None
+
+
 class InfoPane(QWidget):
 
     results_type = None
+    debounce_ms = 300
 
     def __init__(self, parent: QWidget) -> None:
         from backend.db.models import SubmissionType
@@ -23,12 +81,19 @@ class InfoPane(QWidget):
         self.app = self.window()
         self.report = Report()
         self.datepicker = StartEndDatePicker(default_start=-180)
-        self.webview = QWebEngineView()
+        self.webview = ChartView()
         self.chart_settings = {}
         self.fig = None
+        self.figure_json = ""
         self.report_obj = None
-        self.datepicker.start_date.dateChanged.connect(self.update_data)
-        self.datepicker.end_date.dateChanged.connect(self.update_data)
+        self.task = None
+        # NOTE: Wait for the user to stop scrubbing dates/ticking boxes before rebuilding the chart.
+        self.update_timer = QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.setInterval(self.debounce_ms)
+        self.update_timer.timeout.connect(self.update_data)
+        self.datepicker.start_date.dateChanged.connect(self.schedule_update)
+        self.datepicker.end_date.dateChanged.connect(self.schedule_update)
         self.layout = QGridLayout(self)
         self.layout.addWidget(self.datepicker, 0, 0, 1, 2)
         self.save_button = QPushButton("Save Chart", parent=self)
@@ -41,7 +106,7 @@ class InfoPane(QWidget):
         if rt:
             self.layout.addWidget(QLabel("Filter by Submission Type"), 1, 0, 1, 1)
             self.submission_type = CheckableComboBox(parent=self)
-            self.submission_type.model().itemChanged.connect(self.update_data)
+            self.submission_type.model().itemChanged.connect(self.schedule_update)
             self.layout.addWidget(self.submission_type, 1, 1, 1, 1)
             self.submission_type.setEditable(False)
             for submission_type in rt:
@@ -68,6 +133,57 @@ class InfoPane(QWidget):
         else:
             self.submission_types = [item.name for item in SubmissionType.query()]
         
+    def schedule_update(self, *args, **kwargs):
+        """
+        Rebuild once input has been quiet for debounce_ms; each change restarts the wait.
+        """
+        self.update_timer.start()
+
+    def run_task(self, fn, on_result, *args, name: str | None = None, **kwargs):
+        """
+        Build the pane's data off the main thread, then hand it to on_result.
+
+        A newer request supersedes one still in flight, so only the latest settings get
+        drawn. Without the app's task runner (e.g. a pane built on its own) this runs inline.
+
+        Args:
+            fn (Callable): Builds the data, see frontend.widgets.task_runner.Task for the rules.
+            on_result (Callable): Receives fn's return value on the main thread.
+            name (str | None, optional): Name of the action. Defaults to fn's qualified name.
+        """
+        name = name or fn.__qualname__
+        runner = getattr(self.app, "task_runner", None)
+        if runner is None:
+            with track_action(name):
+                result = fn(*args, **kwargs)
+            on_result(result)
+            return
+        if self.task is not None:
+            runner.cancel(self.task)
+
+        submitted = {}
+
+        def _deliver(result):
+            # NOTE: Results arrive via the event loop, after submitted has been filled in.
+            if submitted.get("task") is self.task:
+                self.task = None
+                on_result(result)
+
+        submitted["task"] = self.task = runner.submit(fn, *args, name=name, on_result=_deliver, **kwargs)
+
+    def set_chart(self, result: dict) -> None:
+        """
+        Shows a chart built by the pane's make_chart.
+
+        Args:
+            result (dict): The report's df and sheet_name, the figure's json (empty for none) and a message.
+        """
+        from backend.excel.reports import ChartReportMaker
+        self.report_obj = ChartReportMaker(df=result['df'], sheet_name=result.get('sheet_name'))
+        self.fig = None
+        self.figure_json = result.get('figure', "")
+        self.webview.show_figure(self.figure_json, message=result.get('message', ""))
+
     @classmethod
     def diff_month(cls, d1: date, d2: date) -> float:
         """
@@ -96,7 +212,12 @@ class InfoPane(QWidget):
         fname = select_save_file(obj=self,
                                  default_name=f"Plotly {self.start_date.strftime('%Y%m%d')} - {self.end_date.strftime('%Y%m%d')}",
                                  extension="png")
-        self.fig.write_image(fname.absolute().__str__(), engine="kaleido")
+        fig = self.fig
+        if fig is None:
+            # NOTE: Charts built on a worker thread only hand back their json.
+            from plotly.io import from_json
+            fig = from_json(self.figure_json)
+        fig.write_image(fname.absolute().__str__(), engine="kaleido")
 
 
 class PosNegPane(InfoPane):
@@ -105,7 +226,7 @@ class PosNegPane(InfoPane):
         # 1. Block parent signals temporarily during setup to prevent premature execution
         super().__init__(parent)
         self.pos_neg = CheckableComboBox(parent=self)
-        self.pos_neg.model().itemChanged.connect(self.update_data)
+        self.pos_neg.model().itemChanged.connect(self.schedule_update)
         self.pos_neg.setEditable(False)
         self.pos_neg.addItem("Select", header=True)
         self.pos_neg.addItem("Positive")
@@ -142,4 +263,4 @@ class PosNegPane(InfoPane):
             months=months
         )
 
-__all__ = ["InfoPane", "PosNegPane"]
\ No newline at end of file
+__all__ = ["ChartView", "InfoPane", "PosNegPane"]
\ No newline at end of file
@@ -57,8 +57,8 @@ class KrakenViewer(InfoPane):
         self.layout.addWidget(QLabel("Metadata Only"), 1, 2, 1, 1)
         self.layout.addWidget(self.metadata_box, 1, 3, 1, 1)
         self.update_data()
-        self.project_box.currentIndexChanged.connect(self.update_data)
-        self.metadata_box.checkStateChanged.connect(self.update_data)
+        self.project_box.currentIndexChanged.connect(self.schedule_update)
+        self.metadata_box.checkStateChanged.connect(self.schedule_update)
         self.save_button.pressed.connect(self.save_png)
         self.export_button.pressed.connect(self.save_excel)
 
@@ -414,7 +414,7 @@ class KrakenViewer(InfoPane):
         if issubclass(self.fig.__class__, KrakenFigure):
             self.save_button.setEnabled(True)
         # NOTE: construct html for webview
-        self.webview.setHtml(self.fig.html)
+        self.webview.show_figure(self.fig.json)
         self.webview.update()
         return report
 
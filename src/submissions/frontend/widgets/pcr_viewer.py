@@ -1,6 +1,7 @@
 from __future__ import annotations
 from logging import getLogger
 logger = getLogger(f"submissions.{__name__}")
+from pandas import DataFrame
 from frontend.widgets.info_tab import PosNegPane
 from backend.excel.reports import PCRMaker
 from frontend.visualizations.pcr_charts import PCRFigure
@@ -18,16 +19,26 @@ class PCRViewer(PosNegPane):
         super().update_data()
         if not self.chart_settings:      # nothing to plot yet
             return
+        self.run_task(self.make_chart, self.set_chart, name="PCR chart", settings=self.chart_settings)
+
+    @classmethod
+    def make_chart(cls, settings: dict) -> dict:
+        """
+        Builds the report and chart; runs on a worker thread.
+
+        Returns:
+            dict: The report's df and sheet_name and the PCRFigure's json, or a message if there is no data; see InfoPane.set_chart.
+        """
         try:
-            self.report_obj = PCRMaker(**self.chart_settings)    
+            report_obj = PCRMaker(**settings)
         except (AttributeError, TypeError) as e:
             logger.exception(f"Error occurred while creating concentration report: {e}")
-            self.report_obj = None
-        if self.report_obj is None or self.report_obj.df.empty:
+            report_obj = None
+        if report_obj is None or report_obj.df.empty:
             logger.warning("No data available for the selected date range and control types.")
-            self.webview.setHtml("<h3>No data available for the selected date range and control types.</h3>")
-            return
-        self.fig = PCRFigure(df=self.report_obj.df, settings=self.chart_settings)
-        self.webview.setHtml(self.fig.html)   
+            return dict(df=DataFrame(), figure="",
+                        message="No data available for the selected date range and control types.")
+        fig = PCRFigure(df=report_obj.df, settings=settings)
+        return dict(df=report_obj.df, sheet_name=report_obj.sheet_name, figure=fig.json)
 
 __all__ = ["PCRViewer"]
\ No newline at end of file
@@ -9,9 +9,10 @@ from datetime import datetime
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtCore import pyqtSlot, QVariant, Qt
 from typing import TYPE_CHECKING, List
+from backend.db.models import OptionCatalog
 from backend.validators import SourcedField
 from . import DefaultWebDialog
-from tools import DictMode, render_details_template, find_first_matching_dict
+from tools import render_details_template
 if TYPE_CHECKING:
     from backend.validators import PydProcedure
 
@@ -33,6 +34,7 @@ class ProcedureCreation(DefaultWebDialog):
             logger.error(str(self.proceduretype))
             return
         self.proceduretype_dict = self.procedure.reorder_proceduretype_by_procedure()
+        self._options = OptionCatalog(proceduretype=self.proceduretype)
         if isinstance(self.run.rsl_plate_number, dict):
             title = self.run.rsl_plate_number.get("value", "Unknown Run")
         else:
@@ -47,6 +49,15 @@ class ProcedureCreation(DefaultWebDialog):
             logger.error(f"Got some messed up samples here.")
         self.set_html()
 
+    @property
+    def options(self) -> OptionCatalog:
+        """
+        Dropdown choices for this form, looked up as the page asks for them and kept until it closes.
+        """
+        if getattr(self, "_options", None) is None:
+            self._options = OptionCatalog(proceduretype=self.procedure.proceduretype)
+        return self._options
+
     @property
     def constructed_sample_list(self):
         from backend.validators.pydant import PydSample, PydProcedureSampleAssociation
@@ -148,9 +159,10 @@ class ProcedureCreation(DefaultWebDialog):
                 new_lot = ReagentLot(reagent=reagent, lot=lot, expiry=expiry, active=True)
                 new_lot.save()
                 pyd.sql_instance = new_lot
-        reagentrole_idx, rr_dummy = find_first_matching_dict(key="name", value_to_match=reagentrole, list_of_dicts=self.proceduretype_dict['reagentrole'], mode=DictMode.INDEX)
-        reagent_idx, _ = find_first_matching_dict(key="name", value_to_match=reagent, list_of_dicts=rr_dummy['reagent'], mode=DictMode.POP)
-        self.proceduretype_dict['reagentrole'][reagentrole_idx]['reagent'][reagent_idx]['reagentlot'].insert(0, pyd)
+        self.options.invalidate("reagent", reagentrole)
+        self.options.invalidate("reagentlot", reagentrole)
+        # NOTE: Select the new lot, the page picks it up from get_selected_reagent when it reloads.
+        self.procedure.update_reagents(reagentrole=reagentrole, name=reagent, lot=lot)
         self.set_html()
 
     @pyqtSlot(str, str)
@@ -166,22 +178,11 @@ class ProcedureCreation(DefaultWebDialog):
 
     @pyqtSlot(str, result=list)
     def get_reagent_names(self, reagentrole_name: str):
-        from backend.db.models import ReagentRole
-        reagentrole = ReagentRole.query(name=reagentrole_name)
-        return [item.name for item in reagentrole.get_reagents(proceduretype=self.procedure.proceduretype)]
+        return self.options.reagent_names(reagentrole_name)
 
     @pyqtSlot(str, result=list)
     def get_reagentlot_names(self, reagentrole_name: str):
-        from backend.db.models import ReagentRole
-        role = ReagentRole.query(name=reagentrole_name, limit=1)
-        if not role:
-            return []
-        names = []
-        for reagent in role.get_reagents(proceduretype=self.procedure.proceduretype):
-            for lot in reagent.reagentlot:
-                if lot.active:
-                    names.append(lot.name) # reagentname - lot
-        return names
+        return self.options.reagentlot_names(reagentrole_name)
 
     @pyqtSlot(str, result=QVariant)
     def get_selected_reagent(self, reagentrole_name:str) -> dict:
@@ -198,29 +199,15 @@ class ProcedureCreation(DefaultWebDialog):
 
     @pyqtSlot(str, result=list)
     def get_equipment_names(self, equipmentrole:str) -> list:
-        from backend.db.models import EquipmentRole
-        role = EquipmentRole.query(name=equipmentrole)
-        if not role:
-            return []
-        return [eq.name for eq in role.equipment]
+        return self.options.equipment_names(equipmentrole)
 
     @pyqtSlot(str, str, result=list)
     def get_processversion_names(self, equipmentrole:str, equipment:str) -> list:
-        from backend.db.models import EquipmentRoleEquipmentAssociation
-        assoc = EquipmentRoleEquipmentAssociation.query(equipmentrole=equipmentrole, equipment=equipment, limit=1)
-        if not assoc:
-            return []
-        return [pv.name for process in assoc.process for pv in process.processversion if pv.active]
+        return self.options.processversion_names(equipmentrole, equipment)
 
     @pyqtSlot(str, str, str, result=list)
     def get_tipslot_names(self, equipmentrole:str, equipment:str, processversion:str) -> list:
-        from backend.db.models import ProcessVersion
-        pv = ProcessVersion.query(name=processversion, limit=1)
-        if not pv or getattr(pv, "process", None) is None:
-            return []
-        return [lot.name for tips in pv.process.tips
-                for lot in tips.tipslot
-                if lot.active]
+        return self.options.tipslot_names(processversion)
 
     @pyqtSlot(str, result=QVariant)
     def get_selected_equipment(self, equipmentrole:str) -> dict:
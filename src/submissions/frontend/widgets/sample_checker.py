@@ -67,7 +67,7 @@ class SampleChecker(QDialog):
     def format_sample_list(self) -> Generator[dict, None, None]:
         seen = set()
         for sample in self.samples:
-            s = sample.improved_dict
+            s = dict(sample.improved_dict)
             if s['sample_id'] in seen:
                 s['color'] = "red"
             else:
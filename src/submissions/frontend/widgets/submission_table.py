@@ -9,7 +9,7 @@ from PyQt6.QtWidgets import QMenu, QTreeView, QAbstractItemView
 from PyQt6.QtCore import QModelIndex, Qt, pyqtSignal, QAbstractItemModel
 from PyQt6.QtGui import QAction, QCursor, QStandardItem, QContextMenuEvent
 from typing import List
-from tools import get_application_from_parent
+from tools import get_application_from_parent, track_action
 
 
 def _date_sort_key(value) -> tuple:
@@ -198,6 +198,7 @@ class SubmissionsTree(QTreeView):
         # NOTE: add other required actions
         self.menu.popup(QCursor.pos())
 
+    @track_action("Load submissions")
     def set_data(self, page: int = 1, page_size: int = 250) -> None:
         """
         Rebuild the whole tree (initial load and pagination).
@@ -246,6 +247,7 @@ class SubmissionsTree(QTreeView):
         if self.model != None:
             self.model.setRowCount(0)  # works
 
+    @track_action("Open details")
     def show_details(self, sel: QModelIndex):
         if not sel.isValid():
             return
@@ -14,11 +14,12 @@ from pathlib import Path
 from tools import Report, Alert, AlertStatus, main_form_style, report_result, get_application_from_parent
 from backend.validators import PydClientSubmission, PydSample, SourcedField
 from backend.db.models import (
-    ClientLab
+    ClientLab, ImportLedger
 )
 from typing import List, Tuple, TYPE_CHECKING
 from datetime import date
 from .sample_checker import SampleChecker
+from .task_runner import run_in_background
 if TYPE_CHECKING:
     from backend.db.models import ClientSubmission, SubmissionType
 
@@ -173,9 +174,37 @@ class SubmissionFormContainer(QWidget):
         if not fname:
             report.add_result(Alert(msg=f"File {fname.__str__()} not found.", status=AlertStatus.CRITICAL.value))
             return report
+        # NOTE: Opening and hashing a large workbook is the slow part; parsing needs the database, so stays here.
+        run_in_background(self, DefaultClientSubmissionManager.read_input, Path(fname), name="Reading workbook",
+                          on_result=lambda loaded, fname=Path(fname): self.open_submission_file(fname, loaded))
+        return report
+
+    @report_result
+    def open_submission_file(self, fname: Path, loaded: dict) -> Report:
+        """
+        Parses a workbook read by import_submission_function and shows it for checking.
+
+        Args:
+            fname (Path): The workbook.
+            loaded (dict): Output of DefaultManager.read_input.
+
+        Returns:
+            Report: Object to give results of import.
+        """
+        from backend.managers import DefaultClientSubmissionManager
+        report = Report()
+        # NOTE: A workbook imported before (same contents, whatever its name) opens what it became instead.
+        previous = ImportLedger.lookup(digest=loaded['digest'])
+        if previous is not None:
+            report.add_result(Alert(msg=f"{fname.name} was already imported as {previous.clientsubmission.name} "
+                                        f"on {previous.imported:%Y-%m-%d %H:%M}. Opening it instead.",
+                                    owner=self.__class__.__name__, status=AlertStatus.WARNING.value))
+            self.edit_submission_function(previous.clientsubmission)
+            return report
         # NOTE: create sheetparser using excel sheet and context from gui
-        self.clientsubmission_manager = DefaultClientSubmissionManager(parent=self, input_object=fname)
+        self.clientsubmission_manager = DefaultClientSubmissionManager(parent=self, input_object=loaded['input_object'])
         self.pydclientsubmission = self.clientsubmission_manager.to_pydantic()
+        self.pydclientsubmission.filepath = fname
         # blank samples have no id here.
         checker = SampleChecker(self, "Sample Checker", self.pydclientsubmission.sample)
         if checker.exec():
@@ -204,7 +233,7 @@ class SubmissionFormWidget(QWidget):
         self.pyd = pyd
         # NOTE: pyd contains run up to this point.
         self.missing_info = []
-        self.submissiontype = SubmissionType.query(name=self.pyd.submissiontype.get('value'))
+        self.submissiontype = SubmissionType.cached(name=self.pyd.submissiontype.get('value'))
         self.layout = QVBoxLayout()
         self.excluded = self.pyd.class_config.excluded + ["sample_count"]
         self.recover = self.pyd.class_config.recover
@@ -252,7 +281,7 @@ class SubmissionFormWidget(QWidget):
         """
         from backend.db.models import SubmissionType
         if isinstance(submission_type, str):
-            submission_type = SubmissionType.query(name=submission_type)
+            submission_type = SubmissionType.cached(name=submission_type)
         if key not in self.excluded:
             return self.InfoItem(parent=self, key=key, value=value, submission_type=submission_type,
                                            clientsubmission_object=clientsubmission_object, disable=disable)
@@ -310,7 +339,7 @@ class SubmissionFormWidget(QWidget):
             from backend.db.models import SubmissionType
             super().__init__(parent)
             if isinstance(submission_type, str):
-                submission_type = SubmissionType.query(name=submission_type)
+                submission_type = SubmissionType.cached(name=submission_type)
             layout = QVBoxLayout()
             self.label = self.ParsedQLabel(key=key, value=value)
             self.input: QWidget = self.set_widget(parent=parent, key=key, value=value, submission_type=submission_type,
@@ -375,7 +404,7 @@ class SubmissionFormWidget(QWidget):
             """
             from backend.db.models import ClientSubmission, SubmissionType, BaseClass
             if isinstance(submission_type, str):
-                submission_type = SubmissionType.query(name=submission_type)
+                submission_type = SubmissionType.cached(name=submission_type)
             if isinstance(value, dict):
                 value = value.get('value', value)
             elif isinstance(value, SourcedField):
@@ -386,9 +415,9 @@ class SubmissionFormWidget(QWidget):
                 case 'clientlab':
                     add_widget = MyQComboBox(scrollWidget=parent)
                     # NOTE: lookup organizations suitable for clientlab (ctx: self.InfoItem.SubmissionFormWidget.SubmissionFormContainer.AddSubForm )
-                    labs = [item.name for item in ClientLab.query()]
+                    labs = list(ClientLab.reference_index().names)
                     try:
-                        looked_up_lab = ClientLab.query(name=value, limit=1)
+                        looked_up_lab = ClientLab.cached(name=value) if value else None
                     except AttributeError:
                         looked_up_lab = None
                     if looked_up_lab:
@@ -403,7 +432,7 @@ class SubmissionFormWidget(QWidget):
                 case 'submission_category':
                     add_widget = MyQComboBox(scrollWidget=parent)
                     categories = ['Diagnostic', "Surveillance", "Research"]
-                    categories += [item.name for item in SubmissionType.query()]
+                    categories += SubmissionType.reference_index().names
                     try:
                         categories.insert(0, categories.pop(categories.index(value)))
                     except ValueError:
@@ -586,6 +615,8 @@ class ClientSubmissionFormWidget(SubmissionFormWidget):
             # re-create clean associations from the saved Sample SQL objects. This avoids
             # carrying over non-serializable _misc_info from pyd objects into the DB.
             sql.save()
+            if sql.id is not None:
+                ImportLedger.record(pyd.filepath, clientsubmission=sql)
             self.app.table_widget.sub_wid.upsert_submission(sql)
         finally:
             QApplication.restoreOverrideCursor()
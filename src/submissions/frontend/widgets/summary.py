@@ -26,7 +26,7 @@ class Summary(InfoPane):
         self.org_select.addItem("Select", header=True)
         for org in [org.name for org in ClientLab.query()]:
             self.org_select.addItem(org)
-        self.org_select.model().itemChanged.connect(self.update_data)
+        self.org_select.model().itemChanged.connect(self.schedule_update)
         self.layout.addWidget(QLabel("Client"), 1, 0, 1, 1)
         self.layout.addWidget(self.org_select, 1, 1, 1, 3)
         self.update_data()
@@ -41,7 +41,17 @@ class Summary(InfoPane):
         """
         super().update_data()
         orgs = self.org_select.get_checked()
-        self.report_obj = ReportMaker(start_date=self.start_date, end_date=self.end_date, organizations=orgs)
+        self.run_task(ReportMaker, self.set_report, name="Cost report",
+                      start_date=self.start_date, end_date=self.end_date, organizations=orgs)
+
+    def set_report(self, report_obj: ReportMaker) -> None:
+        """
+        Shows a finished report.
+
+        Args:
+            report_obj (ReportMaker): Report built by update_data.
+        """
+        self.report_obj = report_obj
         self.webview.setHtml(self.report_obj.html)
         if self.report_obj.procedures:
             self.save_pdf_button.setEnabled(True)
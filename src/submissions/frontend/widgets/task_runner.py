@@ -0,0 +1,228 @@
+"""
+Runs long operations (reports, chart data) on a thread pool so the window stays responsive.
+"""
+from __future__ import annotations
+from logging import getLogger
+logger = getLogger(f"submissions.{__name__}")
+from threading import Event
+from typing import Any, Callable
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from tools import ctx, current_task, track_action, TaskCancelled, get_application_from_parent, report_result, \
+    Report, Alert, AlertStatus
+
+
+class TaskSignals(QObject):
+    """
+    Signals a Task emits. They are queued onto the main thread, so slots may touch widgets.
+    """
+
+    started = pyqtSignal()
+    progress = pyqtSignal(int, str)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+    cancelled = pyqtSignal()
+
+
+class Task(QRunnable):
+    """
+    One unit of work for the TaskRunner.
+
+    The function runs on a pool thread, so the usual rules apply:
+
+    1. It gets its own database sessions. ctx.database.session and read_session are
+       thread-local scoped sessions, so anything queried inside the task belongs to
+       this thread, and both are removed when the task ends.
+    2. ORM objects must not cross between threads. Pass ids or names in and return plain
+       data (DataFrames, html, dicts) or fully loaded objects that won't lazy load.
+    3. Widgets are only touched from the slots connected to the signals.
+
+    Long loops should call tools.report_progress or tools.check_cancelled, or iterate
+    through tools.with_progress; these are the points where cancellation takes effect.
+
+    Args:
+        fn (Callable): Function to run.
+        name (str | None, optional): Name shown in the status bar and the Performance summary.
+    """
+
+    def __init__(self, fn: Callable, *args, name: str | None = None, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.name = name or fn.__qualname__
+        self.signals = TaskSignals()
+        self._cancelled = Event()
+        # NOTE: The runner holds the reference; don't let Qt delete it out from under the signals.
+        self.setAutoDelete(False)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """
+        Ask the task to stop at its next cancellation point.
+        """
+        self._cancelled.set()
+
+    def report_progress(self, value: int, message: str = ""):
+        if self.cancelled:
+            raise TaskCancelled(self.name)
+        self.signals.progress.emit(value, message)
+
+    def run(self):
+        if self.cancelled:
+            self.signals.cancelled.emit()
+            return
+        token = current_task.set(self)
+        self.signals.started.emit()
+        try:
+            with track_action(self.name):
+                result = self.fn(*self.args, **self.kwargs)
+        except TaskCancelled:
+            logger.info(f"Task {self.name} cancelled.")
+            self.signals.cancelled.emit()
+        except Exception as e:
+            logger.exception(f"Task {self.name} failed: {e}")
+            self.signals.failed.emit(e)
+        else:
+            if self.cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(result)
+        finally:
+            current_task.reset(token)
+            self.remove_sessions()
+
+    @classmethod
+    def remove_sessions(cls):
+        """
+        Close this thread's sessions; pool threads are reused and would otherwise keep them.
+        """
+        for key in ("session", "read_session"):
+            session = ctx.database.get(key)
+            if session is None:
+                continue
+            try:
+                session.remove()
+            except Exception as e:
+                logger.exception(f"Couldn't remove worker {key}: {e}")
+
+
+class TaskRunner(QObject):
+    """
+    Shared queue of background tasks for the main window.
+
+    Args:
+        parent (QObject | None, optional): Owner of the runner. Defaults to None.
+        max_threads (int, optional): Tasks run at once, the rest wait their turn. Defaults to 2.
+    """
+
+    busy = pyqtSignal(bool)
+    progress = pyqtSignal(str, int, str)
+
+    def __init__(self, parent: QObject | None = None, max_threads: int = 2):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.tasks = []
+
+    def submit(self, fn: Callable, *args, name: str | None = None,
+               on_result: Callable[[Any], None] | None = None,
+               on_error: Callable[[Exception], None] | None = None,
+               **kwargs) -> Task:
+        """
+        Queue fn(*args, **kwargs) on the pool.
+
+        Args:
+            fn (Callable): Function to run, see Task for the rules.
+            name (str | None, optional): Name of the task. Defaults to fn's qualified name.
+            on_result (Callable | None, optional): Called on the main thread with fn's return value.
+            on_error (Callable | None, optional): Called on the main thread with the exception.
+
+        Returns:
+            Task: The queued task, which can be cancelled.
+        """
+        task = Task(fn, *args, name=name, **kwargs)
+        if on_result is not None:
+            task.signals.finished.connect(on_result)
+        if on_error is not None:
+            task.signals.failed.connect(on_error)
+        task.signals.progress.connect(lambda value, message, task=task: self.progress.emit(task.name, value, message))
+        for signal in (task.signals.finished, task.signals.failed, task.signals.cancelled):
+            signal.connect(lambda *args, task=task: self._done(task))
+        self.tasks.append(task)
+        self.busy.emit(True)
+        self.pool.start(task)
+        return task
+
+    def cancel(self, task: Task):
+        """
+        Cancel a task: dropped from the queue if it hasn't started, stopped at its next
+        cancellation point if it has.
+
+        Args:
+            task (Task): Task returned by submit.
+        """
+        task.cancel()
+        if self.pool.tryTake(task):
+            self._done(task)
+
+    def cancel_all(self):
+        for task in list(self.tasks):
+            self.cancel(task)
+
+    def wait(self, msecs: int = -1) -> bool:
+        """
+        Block until the pool is idle. Used at shutdown, before the engine is disposed.
+
+        Args:
+            msecs (int, optional): Timeout, -1 for none. Defaults to -1.
+
+        Returns:
+            bool: True if every task finished.
+        """
+        return self.pool.waitForDone(msecs)
+
+    def _done(self, task: Task):
+        try:
+            self.tasks.remove(task)
+        except ValueError:
+            return
+        if not self.tasks:
+            self.busy.emit(False)
+
+
+def run_in_background(parent: QObject | None, fn: Callable, *args, on_result: Callable[[Any], None],
+                      name: str | None = None, **kwargs) -> Task | None:
+    """
+    Run fn on the main window's TaskRunner and hand its return value to on_result on the
+    main thread. Without a runner (e.g. a widget built on its own) both run inline.
+
+    Args:
+        parent (QObject | None): Widget asking, used to find the main window.
+        fn (Callable): Function to run, see Task for the rules.
+        on_result (Callable): Called on the main thread with fn's return value.
+        name (str | None, optional): Name of the task. Defaults to fn's qualified name.
+
+    Returns:
+        Task | None: The queued task, None if it ran inline.
+    """
+    name = name or fn.__qualname__
+    runner = getattr(get_application_from_parent(parent), "task_runner", None)
+    if runner is None:
+        with track_action(name):
+            result = fn(*args, **kwargs)
+        on_result(result)
+        return None
+
+    @report_result
+    def _failed(error: Exception) -> Report:
+        report = Report()
+        report.add_result(Alert(msg=f"{name} failed: {error}", owner=name, status=AlertStatus.CRITICAL.value))
+        return report
+
+    return runner.submit(fn, *args, name=name, on_result=on_result, on_error=_failed, **kwargs)
+
+
+__all__ = ["Task", "TaskRunner", "TaskSignals", "run_in_background"]
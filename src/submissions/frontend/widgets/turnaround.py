@@ -21,14 +21,12 @@ class TurnaroundTime(InfoPane):
         self.export_button = QPushButton("Save Data", parent=self)
         self.export_button.pressed.connect(self.save_excel)
         self.layout.addWidget(self.export_button, 0, 3, 1, 1)
-        self.fig = None
-        self.report_object = None
         self.submission_typer = QComboBox(self)
         subs = ["All"] + [item.name for item in SubmissionType.query()]
         self.submission_typer.addItems(subs)
         self.layout.addWidget(QLabel("Submission Type"), 1, 0, 1, 1)
         self.layout.addWidget(self.submission_typer, 1, 1, 1, 3)
-        self.submission_typer.currentTextChanged.connect(self.update_data)
+        self.submission_typer.currentTextChanged.connect(self.schedule_update)
         self.update_data()
 
     def update_data(self) -> None:
@@ -48,12 +46,24 @@ class TurnaroundTime(InfoPane):
         else:
             submission_type = self.submission_typer.currentText()
             subtype_obj = SubmissionType.query(name = submission_type)
-        self.report_obj = TurnaroundMaker(start_date=self.start_date, end_date=self.end_date, submission_types=submission_type)
         if subtype_obj:
             threshold = subtype_obj.turnaround_time.days + 0.5
         else:
             threshold = None
-        self.fig = TurnaroundChart(df=self.report_obj.df, settings=chart_settings, modes=[], threshold=threshold, months=months)
-        self.webview.setHtml(self.fig.html)
+        self.run_task(self.make_chart, self.set_chart, name="Turnaround report", submission_type=submission_type,
+                      settings=chart_settings, threshold=threshold, months=months)
+
+    @classmethod
+    def make_chart(cls, submission_type: str | None, settings: dict, threshold: float | None, months: int) -> dict:
+        """
+        Builds the report and chart; runs on a worker thread.
+
+        Returns:
+            dict: The report's df and sheet_name and the TurnaroundChart's json, see InfoPane.set_chart.
+        """
+        report_obj = TurnaroundMaker(start_date=settings['start_date'], end_date=settings['end_date'],
+                                     submission_types=submission_type)
+        fig = TurnaroundChart(df=report_obj.df, settings=settings, modes=[], threshold=threshold, months=months)
+        return dict(df=report_obj.df, sheet_name=report_obj.sheet_name, figure=fig.json)
  
 __all__ = ["TurnaroundTime"]
\ No newline at end of file
@@ -116,7 +116,7 @@ var checkboxes = document.getElementsByClassName("procedure_checkbox");
 
 for(let i = 0; i < checkboxes.length; i++) {
 
-    checkboxes[i].addEventListener("input", function() {
+    checkboxes[i].addEventListener("input", async function() {
         neighbour = document.getElementById(checkboxes[i].name);
         neighbour.disabled = !checkboxes[i].checked;
         if (neighbour.classList.contains("equipmentrole")) {
@@ -124,8 +124,10 @@ for(let i = 0; i < checkboxes.length; i++) {
             process.disabled = !checkboxes[i].checked;
             tips = document.getElementById(checkboxes[i].name + "_tips");
             tips.disabled = !checkboxes[i].checked;
-            backend.update_equipment(neighbour.name, neighbour.value, process.value, tips.value, checkboxes[i].checked);
+            if (checkboxes[i].checked && !neighbour.value) { await updateEquipmentChoices(neighbour.name); }
+            backend.update_equipment(neighbour.name, neighbour.value, process.value, getSelectValues(tips), checkboxes[i].checked);
         } else if (neighbour.classList.contains("reagentrole")) {
+            if (checkboxes[i].checked) { await loadReagentLots(neighbour); }
             backend.update_reagent(neighbour.name, neighbour.value, checkboxes[i].checked);
         };
     });
@@ -159,16 +161,47 @@ window.addEventListener('load', function () {
     }
 });
 
+// NOTE: Option lists are fetched when a dropdown is about to be opened (or its role switched on), not
+// when the page loads. Until then a dropdown only holds its current selection. Hovering starts the
+// fetch so the list is usually in place by the time the popup opens.
+function onFirstOpen(dropdown, load) {
+    if (dropdown.dataset.lazy) { return; }
+    dropdown.dataset.lazy = "true";
+    var opened = function() { load(); };
+    ["mouseenter", "focus", "mousedown"].forEach(function(name) { dropdown.addEventListener(name, opened); });
+}
+
+function fillOptions(dropdown, names, selected) {
+    dropdown.innerHTML = ""; // Clear existing options
+    names.forEach(function(name) { dropdown.appendChild(new Option(name, name)); });
+    if (selected && names.includes(selected)) { dropdown.value = selected; }
+}
+
+async function loadReagentLots(selector) {
+    if (selector.dataset.loaded) { return; }
+    selector.dataset.loaded = "true";
+    var current = selector.value;
+    var names = await backend.get_reagentlot_names(selector.id);
+    fillOptions(selector, names, current);
+    selector.appendChild(new Option("--New--", "--New--"));
+}
+
 async function reagentrole_startup(container) {
     var selector = container.querySelector(".reagentrole");
     var checkbox = container.querySelector(".procedure_checkbox");
     var role_name = selector.id;
-    selector.innerHTML = ""; // Clear existing options
-    var names = await backend.get_reagentlot_names(role_name);
-    names.forEach(function(name) { selector.appendChild(new Option(name, name)); });
-    selector.appendChild(new Option("--New--", "--New--"));
+    if (selector.dataset.started) { return; }
+    selector.dataset.started = "true";
+    onFirstOpen(selector, function() { loadReagentLots(selector); });
     var selected = await backend.get_selected_reagent(role_name);
-    if (selected && selected.reagentlot) { selector.value = selected.reagentlot; }
+    if (selected && selected.reagentlot) {
+        fillOptions(selector, [selected.reagentlot], selected.reagentlot);
+    } else if (checkbox.checked) {
+        // NOTE: A role in use needs a default, which is the first lot on offer.
+        await loadReagentLots(selector);
+    } else {
+        return;
+    }
     backend.update_reagent(role_name, selector.value, checkbox.checked);
 }
 
@@ -176,45 +209,76 @@ async function equipment_startup(role_name) {
     var eq_dropdown = document.getElementById(role_name);
     var proc_dropdown = document.getElementById(role_name + "_process");
     var tips_dropdown = document.getElementById(role_name + "_tips");
-    eq_dropdown.addEventListener("change", function(){ updateProcessChoices(role_name); updateBackend(role_name); });
-    proc_dropdown.addEventListener("change", function(){ updateTipChoices(role_name); updateBackend(role_name); });
+    var checkbox = document.getElementById(role_name + "_check");
+    if (eq_dropdown.dataset.started) { return; }
+    eq_dropdown.dataset.started = "true";
+    eq_dropdown.addEventListener("change", async function(){ await updateProcessChoices(role_name); updateBackend(role_name); });
+    proc_dropdown.addEventListener("change", async function(){ await updateTipChoices(role_name); updateBackend(role_name); });
     tips_dropdown.addEventListener("change", function(){ updateBackend(role_name); });
+    onFirstOpen(eq_dropdown, function() { loadEquipment(role_name); });
+    onFirstOpen(proc_dropdown, function() { loadProcessVersions(role_name); });
+    onFirstOpen(tips_dropdown, function() { loadTips(role_name); });
     var selected = await backend.get_selected_equipment(role_name);
-    await updateEquipmentChoices(role_name, selected);
+    if (selected && selected.equipment) {
+        fillOptions(eq_dropdown, [selected.equipment], selected.equipment);
+        fillOptions(proc_dropdown, selected.processversion ? [selected.processversion] : [], selected.processversion);
+        fillOptions(tips_dropdown, selected.tipslot || [], null);
+        Array.prototype.forEach.call(tips_dropdown.options, function(opt) { opt.selected = true; });
+    } else if (checkbox && checkbox.checked) {
+        await updateEquipmentChoices(role_name);
+    } else {
+        return;
+    }
     updateBackend(role_name);
 }
 
-async function updateEquipmentChoices(role_name, selected) {
+async function loadEquipment(role_name) {
     var dd = document.getElementById(role_name);
-    dd.innerHTML = ""; // Clear existing options
+    if (dd.dataset.loaded) { return; }
+    dd.dataset.loaded = "true";
     var names = await backend.get_equipment_names(role_name);
-    names.forEach(function(name) { dd.appendChild(new Option(name, name)); });
-    if (selected && selected.equipment) { dd.value = selected.equipment; }
-    await updateProcessChoices(role_name, selected);
+    fillOptions(dd, names, dd.value);
 }
 
-async function updateProcessChoices(role_name, selected) {
+async function loadProcessVersions(role_name) {
     var dd = document.getElementById(role_name + "_process");
-    dd.innerHTML = ""; // Clear existing options
     var equipment = document.getElementById(role_name).value;
+    if (dd.dataset.loaded === equipment) { return; }
+    dd.dataset.loaded = equipment;
     var names = await backend.get_processversion_names(role_name, equipment);
-    names.forEach(function(name) { dd.appendChild(new Option(name, name)); });
-    if (selected && selected.processversion) { dd.value = selected.processversion; }
-    await updateTipChoices(role_name, selected);
+    fillOptions(dd, names, dd.value);
 }
 
-async function updateTipChoices(role_name, selected) {
+async function loadTips(role_name) {
     var dd = document.getElementById(role_name + "_tips");
-    dd.innerHTML = ""; // Clear existing options
     var equipment = document.getElementById(role_name).value;
     var processversion = document.getElementById(role_name + "_process").value;
+    if (dd.dataset.loaded === processversion) { return; }
+    dd.dataset.loaded = processversion;
+    var chosen = getSelectValues(dd);
     var names = await backend.get_tipslot_names(role_name, equipment, processversion);
-    var chosen = (selected && selected.tipslot) ? selected.tipslot : [];
-    names.forEach(function(name) {
-        var opt = new Option(name, name);
-        if (chosen.includes(name)) { opt.selected = true; }
-        dd.appendChild(opt);
-    });
+    fillOptions(dd, names, null);
+    Array.prototype.forEach.call(dd.options, function(opt) { opt.selected = chosen.includes(opt.value); });
+}
+
+async function updateEquipmentChoices(role_name) {
+    await loadEquipment(role_name);
+    await updateProcessChoices(role_name);
+}
+
+async function updateProcessChoices(role_name) {
+    var dd = document.getElementById(role_name + "_process");
+    dd.innerHTML = ""; // A different piece of equipment has its own processes
+    delete dd.dataset.loaded;
+    await loadProcessVersions(role_name);
+    await updateTipChoices(role_name);
+}
+
+async function updateTipChoices(role_name) {
+    var dd = document.getElementById(role_name + "_tips");
+    dd.innerHTML = ""; // A different process has its own tips
+    delete dd.dataset.loaded;
+    await loadTips(role_name);
 }
 
 function getSelectValues(select) {
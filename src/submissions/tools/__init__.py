@@ -2,7 +2,7 @@
 Contains miscellaenous functions used by both frontend and backend.
 """
 from __future__ import annotations
-from logging import handlers, Logger, Formatter, WARNING, INFO, DEBUG, CRITICAL, ERROR, getLogger, StreamHandler
+from logging import handlers, Logger, Formatter, Handler, WARNING, INFO, DEBUG, CRITICAL, ERROR, getLogger, StreamHandler
 logger = getLogger(f"submissions.{__name__}")
 from html import escape as html_escape
 from itertools import chain
@@ -20,14 +20,19 @@ from collections import OrderedDict
 from datetime import date, datetime, timedelta
 from json import JSONDecodeError, dumps as jdumps, loads as jloads
 from pprint import pformat
-from threading import Thread
-from inspect import getmembers, isfunction, stack, currentframe
+from threading import Thread, Lock
+from queue import SimpleQueue
+import atexit
+from contextvars import ContextVar
+from heapq import heappush, heappushpop
+from inspect import stack, currentframe
+from ast import parse as ast_parse, FunctionDef, AsyncFunctionDef
 from dateutil.easter import easter
 from jinja2 import Environment, FileSystemLoader, Template
 from pathlib import Path
 from sqlalchemy.orm import scoped_session, sessionmaker
 from contextlib import contextmanager
-from sqlalchemy import create_engine, text, MetaData
+from sqlalchemy import create_engine, text, event as sql_event
 from pydantic import ValidationError, field_validator, BaseModel, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict, PydanticBaseSettingsSource, YamlConfigSettingsSource
 from typing import Any, Tuple, Literal, List, Generator, Callable, TypeVar
@@ -67,6 +72,40 @@ main_form_style = '''
 
 page_size = 250
 
+# NOTE: Database tuning, overridable per key under 'database: performance:' in config.yml.
+database_performance = dict(
+    cache_size=-65536,  # NOTE: negative is KiB, so 64MB of page cache per connection
+    mmap_size=268435456,  # NOTE: 256MB of memory-mapped I/O
+    temp_store="MEMORY",
+    maintenance_interval=30,  # NOTE: minutes between PRAGMA optimize/wal_checkpoint, 0 to disable
+    checkpoint_mode="PASSIVE",
+    pool_size=5,
+    max_overflow=10,
+    pool_recycle=3600,
+    fast_executemany=True,
+    slow_query_ms=250,  # NOTE: statements slower than this go to logs/slow_queries.log
+    worker_threads=2,  # NOTE: background tasks (reports, charts) run at once
+    report_cache_seconds=300  # NOTE: chart records are reused this long, so other users' changes show up after it
+)
+
+# NOTE: Backups made by scripts/backup_database.py, overridable under 'database: backup:' in config.yml.
+database_backup = dict(
+    pages=256,  # NOTE: sqlite pages copied per step, writers get the lock between steps
+    sleep_ms=50,
+    compresslevel=6,
+    verify=True,
+    keep=14,  # NOTE: newest backups kept, 0 for no limit
+    max_age_days=90  # NOTE: older backups removed, 0 for no limit
+)
+
+database_concurrency = dict(
+    busy_timeout_ms=5000,  # NOTE: sqlite busy_timeout / mssql LOCK_TIMEOUT, how long a statement waits on a lock
+    lock_timeout_ms=1000,  # NOTE: the same, for one attempt of BaseClass.save, which retries
+    retries=4,  # NOTE: further attempts at a save that hit a lock
+    backoff_ms=100,  # NOTE: wait before the first retry, doubled each time, with jitter
+    backoff_max_ms=2000
+)
+
 F = TypeVar("F", bound=Callable[..., Any])
 _MAX = 300  # per-value repr cap
 
@@ -208,7 +247,7 @@ def get_first_blank_df_row(df: DataFrame) -> int:
 
 def timer(func):
     """
-    Performs timing of wrapped function
+    Performs timing of wrapped function, including the SQL it issued.
 
     Args:
         func (__function__): incoming function
@@ -217,16 +256,243 @@ def timer(func):
 
     @wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = perf_counter()
-        value = func(*args, **kwargs)
-        end_time = perf_counter()
-        run_time = end_time - start_time
-        print(f"Finished {func.__name__}() in {run_time:.4f} secs")
+        with track_action(func.__qualname__, own_stats=True) as stats:
+            value = func(*args, **kwargs)
+        logger.info(f"Finished {func.__name__}() in {stats.wall_time:.4f} secs "
+                    f"({stats.statements} statements, {stats.db_time:.4f} secs in database)")
         return value
 
     return wrapper
 
 
+# SQL instrumentation
+
+class ActionStats(object):
+    """
+    Statement count, database time and slowest statements attributed to one UI action.
+
+    Args:
+        name (str): Name of the action, e.g. the qualified name of the slot that ran it.
+        keep (int): How many of the slowest statements to hold on to.
+    """
+
+    def __init__(self, name: str, keep: int = 5, parent: ActionStats | None = None):
+        self.name = name
+        self.keep = keep
+        # NOTE: A nested block's statements are charged to the enclosing action as well.
+        self.parent = parent
+        self.calls = 0
+        self.statements = 0
+        self.db_time = 0.0
+        self.wall_time = 0.0
+        # NOTE: min-heap of (seconds, statement), so the fastest of the slow ones drops off first.
+        self.slowest = []
+
+    def add_statement(self, statement: str, duration: float):
+        if self.parent is not None:
+            self.parent.add_statement(statement, duration)
+        self.statements += 1
+        self.db_time += duration
+        if len(self.slowest) < self.keep:
+            heappush(self.slowest, (duration, statement))
+        elif duration > self.slowest[0][0]:
+            heappushpop(self.slowest, (duration, statement))
+
+    def merge(self, other: ActionStats):
+        self.calls += other.calls
+        self.statements += other.statements
+        self.db_time += other.db_time
+        self.wall_time += other.wall_time
+        for item in other.slowest:
+            if len(self.slowest) < self.keep:
+                heappush(self.slowest, item)
+            elif item[0] > self.slowest[0][0]:
+                heappushpop(self.slowest, item)
+
+    def to_dict(self) -> dict:
+        return dict(action=self.name, calls=self.calls, statements=self.statements,
+                    statements_per_call=round(self.statements / max(self.calls, 1), 1),
+                    db_time=round(self.db_time, 4), wall_time=round(self.wall_time, 4),
+                    slowest=[dict(seconds=round(seconds, 4), statement=statement)
+                             for seconds, statement in sorted(self.slowest, reverse=True)])
+
+
+_current_action: ContextVar[ActionStats | None] = ContextVar("current_action", default=None)
+_action_totals: dict[str, ActionStats] = {}
+_action_lock = Lock()
+slow_query_logger = getLogger("submissions.slow_queries")
+
+
+@contextmanager
+def track_action(name: str, own_stats: bool = False) -> Generator[ActionStats, None, None]:
+    """
+    Attribute SQL issued inside the block to the UI action 'name'.
+
+    Nested actions fold into the outermost one, so a report opened from a menu is counted
+    once, under the menu action. Totals are collected for performance_summary.
+
+    Args:
+        name (str): Name of the action.
+        own_stats (bool, optional): When nested, time the block with its own stats (its statements
+            still count towards the outer action) rather than handing back the outer ones. Defaults to False.
+
+    Returns:
+        ActionStats: The stats for the block, or for the outermost action if nested without own_stats.
+    """
+    current = _current_action.get()
+    if current is not None and not own_stats:
+        yield current
+        return
+    stats = ActionStats(name, parent=current)
+    token = _current_action.set(stats)
+    start = perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.wall_time = perf_counter() - start
+        stats.calls = 1
+        _current_action.reset(token)
+        if current is None:
+            with _action_lock:
+                _action_totals.setdefault(name, ActionStats(name)).merge(stats)
+
+
+def performance_summary() -> List[dict]:
+    """
+    Totals per UI action since startup (or the last reset), heaviest database users first.
+
+    Returns:
+        List[dict]: One dict per action, see ActionStats.to_dict.
+    """
+    with _action_lock:
+        rows = [stats.to_dict() for stats in _action_totals.values()]
+    return sorted(rows, key=lambda row: row['db_time'], reverse=True)
+
+
+def reset_performance_summary():
+    with _action_lock:
+        _action_totals.clear()
+
+
+def _slow_query_handler() -> handlers.RotatingFileHandler:
+    """
+    Attach the rotating slow-query log on first use, so nothing is created until it's needed.
+    """
+    if not slow_query_logger.handlers:
+        Settings.logdir.mkdir(parents=True, exist_ok=True)
+        handler = GroupWriteRotatingFileHandler(Settings.logdir.joinpath("slow_queries.log"),
+                                                maxBytes=1024 * 1024, backupCount=3, delay=True)
+        handler.setFormatter(Formatter("%(asctime)s - %(message)s"))
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.setLevel(WARNING)
+        slow_query_logger.propagate = False
+    return slow_query_logger.handlers[0]
+
+
+def instrument_engine(engine, slow_query_ms: float | None = None):
+    """
+    Time every statement on 'engine', charge it to the active action, and log slow ones.
+
+    Args:
+        engine (Engine): Engine to hook.
+        slow_query_ms (float | None, optional): Threshold for the slow-query log. None disables it.
+    """
+    threshold = slow_query_ms / 1000 if slow_query_ms else None
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = perf_counter() - conn.info["query_start"].pop()
+        stats = _current_action.get()
+        if stats is not None:
+            stats.add_statement(statement, duration)
+        if threshold is not None and duration >= threshold:
+            _slow_query_handler()
+            action = stats.name if stats is not None else "-"
+            slow_query_logger.warning(f"{duration * 1000:.1f}ms [{action}] {statement} {_safe_repr(parameters)}")
+
+    def handle_error(context):
+        # NOTE: A failed statement never reaches after_cursor_execute; don't leave its start time behind.
+        if context.connection is not None and context.connection.info.get("query_start"):
+            context.connection.info["query_start"].pop()
+
+    sql_event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    sql_event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    sql_event.listen(engine, "handle_error", handle_error)
+
+
+# Background tasks
+
+class TaskCancelled(Exception):
+    """
+    Raised inside a background task once it has been asked to stop.
+    """
+
+
+# NOTE: Set by frontend.widgets.task_runner.Task for the duration of a task.
+current_task: ContextVar[Any] = ContextVar("current_task", default=None)
+
+
+def report_progress(value: int, message: str = "") -> None:
+    """
+    Report progress from inside a background task. Does nothing when run on the main thread.
+
+    Also a cancellation point: raises TaskCancelled if the task has been cancelled.
+
+    Args:
+        value (int): Percent complete.
+        message (str, optional): Short description of the current step. Defaults to "".
+    """
+    task = current_task.get()
+    if task is not None:
+        task.report_progress(value, message)
+
+
+def check_cancelled() -> None:
+    """
+    Cancellation point for background tasks. Does nothing when run on the main thread.
+
+    Raises:
+        TaskCancelled: If the running task has been cancelled.
+    """
+    task = current_task.get()
+    if task is not None and task.cancelled:
+        raise TaskCancelled(task.name)
+
+
+def with_progress(items: Iterable, message: str = "", total: int | None = None) -> Generator[Any, None, None]:
+    """
+    Yields items, reporting progress each time the percentage moves on. Every item is a
+    cancellation point. Does nothing extra when run on the main thread.
+
+    Args:
+        items (Iterable): Items being worked through.
+        message (str, optional): Shown alongside the percentage. Defaults to "".
+        total (int | None, optional): Number of items, if items has no len(). Defaults to None.
+
+    Yields:
+        Any: items, in order.
+    """
+    if current_task.get() is None:
+        yield from items
+        return
+    if total is None:
+        try:
+            total = len(items)
+        except TypeError:
+            total = 0
+    last = -1
+    for index, item in enumerate(items):
+        percent = int(index * 100 / total) if total else 0
+        if percent != last:
+            report_progress(percent, message)
+            last = percent
+        else:
+            check_cancelled()
+        yield item
+
+
 def check_if_app() -> bool:
     """
     Checks if the program is running from pyinstaller compiled
@@ -292,13 +558,95 @@ class CustomFormatter(Formatter):
         CRITICAL: bcolors.FAIL + log_format + bcolors.ENDC
     }
 
-    def format(self, record):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # NOTE: Build one formatter per level up front rather than one per record.
         if check_if_app():
-            log_fmt = self.log_format
+            self.formatters = {level: Formatter(self.log_format) for level in self.FORMATS}
         else:
-            log_fmt = self.FORMATS.get(record.levelno)
-        formatter = Formatter(log_fmt)
-        return formatter.format(record)
+            self.formatters = {level: Formatter(log_fmt) for level, log_fmt in self.FORMATS.items()}
+        self.default_formatter = Formatter(self.log_format)
+
+    def format(self, record):
+        return self.formatters.get(record.levelno, self.default_formatter).format(record)
+
+
+# NOTE: Loggers only put records on the queue; formatting and I/O happen on the listener's thread.
+log_queue = SimpleQueue()
+queue_handler = handlers.QueueHandler(log_queue)
+queue_handler.name = "Queue"
+_log_listener: handlers.QueueListener | None = None
+
+
+def logging_handlers(file_logging: bool = False, logdir: Path | None = None,
+                     batch_size: int = 100) -> List[Handler]:
+    """
+    Builds the handlers that run behind the logging queue.
+
+    Args:
+        file_logging (bool, optional): Also write to a rotating file. Defaults to False.
+        logdir (Path | None, optional): Directory of the log file. Defaults to Settings.logdir.
+        batch_size (int, optional): Records buffered before a file write. Defaults to 100.
+
+    Returns:
+        List[Handler]: Handlers for the QueueListener.
+    """
+    ch = StreamHandler(stream=sys.stdout)
+    ch.name = "Stream"
+    ch.setLevel(INFO if check_if_app() else DEBUG)
+    ch.setFormatter(CustomFormatter())
+    output = [ch]
+    if file_logging:
+        logdir = logdir or Settings.logdir
+        logdir.mkdir(parents=True, exist_ok=True)
+        fh = GroupWriteRotatingFileHandler(logdir.joinpath("submissions.log"), maxBytes=5 * 1024 * 1024,
+                                           backupCount=5, encoding="utf-8", delay=True)
+        fh.setFormatter(Formatter(CustomFormatter.log_format))
+        # NOTE: Writes go out in batches, or at once for warnings and up so problems are never held back.
+        batched = handlers.MemoryHandler(capacity=batch_size, flushLevel=WARNING, target=fh, flushOnClose=True)
+        batched.name = "File"
+        output.append(batched)
+    return output
+
+
+def start_logging(file_logging: bool | None = None, logdir: Path | None = None) -> handlers.QueueListener:
+    """
+    Starts the thread that drains the logging queue. Safe to call more than once.
+
+    Args:
+        file_logging (bool | None, optional): Also write to a file. Defaults to ctx.logging_enabled.
+        logdir (Path | None, optional): Directory of the log file. Defaults to Settings.logdir.
+
+    Returns:
+        handlers.QueueListener: The running listener.
+    """
+    global _log_listener
+    if _log_listener is not None:
+        return _log_listener
+    if file_logging is None:
+        try:
+            file_logging = ctx.logging_enabled
+        except NameError:
+            # NOTE: A logger created while tools is still importing, before ctx exists.
+            file_logging = False
+    _log_listener = handlers.QueueListener(log_queue, *logging_handlers(file_logging=file_logging, logdir=logdir),
+                                           respect_handler_level=True)
+    _log_listener.start()
+    return _log_listener
+
+
+@atexit.register
+def stop_logging():
+    """
+    Stops the listener after it has written everything queued, and flushes the file batch.
+    """
+    global _log_listener
+    if _log_listener is None:
+        return
+    listener, _log_listener = _log_listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
 
 
 class CustomLogger(Logger):
@@ -309,13 +657,9 @@ class CustomLogger(Logger):
         super().__init__(name, level)
         self.extra_info = None
         self.propagate = False
-        ch = StreamHandler(stream=sys.stdout)
-        ch.name = "Stream"
-        ch.setLevel(self.level)
-        # NOTE: create formatter and add it to the handlers
-        ch.setFormatter(CustomFormatter())
-        # NOTE: add the handlers to the logger
-        self.addHandler(ch)
+        # NOTE: every logger shares the one queue handler; see start_logging
+        self.addHandler(queue_handler)
+        start_logging()
         sys.excepthook = self.handle_exception
 
     def info(self, msg, *args, xtra=None, **kwargs):
@@ -827,7 +1171,8 @@ def report_result(func):
 
     @wraps(func)
     def wrapper(*args, **kwargs):
-        output = func(*args, **kwargs)
+        with track_action(func.__qualname__):
+            output = func(*args, **kwargs)
         match output:
             case Report():
                 report = output
@@ -1154,6 +1499,80 @@ class AlembicModes(Enum):
         PASS = "pass"
 
 
+def set_sqlite_query_only(dbapi_connection, connection_record):
+    """
+    Makes connections from the read engine refuse writes.
+
+    Args:
+        dbapi_connection (_type_): raw sqlite3 connection
+        connection_record (_type_): pool record for the connection
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+def table_exists(engine, name: str) -> bool:
+    """
+    Checks for a table with the dialect's own lookup (sqlite_master, INFORMATION_SCHEMA, ...)
+    rather than reflecting the whole schema.
+
+    Args:
+        engine (Engine): Database engine.
+        name (str): Table name.
+
+    Returns:
+        bool: True if the table exists.
+    """
+    with engine.connect() as connection:
+        return engine.dialect.has_table(connection, name)
+
+
+class LazyScript(object):
+    """
+    A startup/teardown script, known by name until it first runs, when its module is imported.
+
+    Args:
+        name (str): Function name.
+        module (str): Module (in the scripts folder) that defines it.
+    """
+
+    def __init__(self, name: str, module: str):
+        self.__name__ = name
+        self.module = module
+        self.function = None
+
+    def __call__(self, *args, **kwargs):
+        if self.function is None:
+            try:
+                self.function = getattr(import_module(self.module), self.__name__)
+            except (ImportError, AttributeError) as e:
+                logger.exception(f"Error loading script {self.__name__} from {self.module}: {e}")
+                return None
+        return self.function(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"<LazyScript({self.module}.{self.__name__})>"
+
+    @classmethod
+    def function_names(cls, module: Path) -> List[str]:
+        """
+        Top level function names in a module's source, without importing it.
+
+        Args:
+            module (Path): .py file.
+
+        Returns:
+            List[str]: Function names.
+        """
+        try:
+            tree = ast_parse(module.read_text(encoding="utf-8"), filename=str(module))
+        except (OSError, SyntaxError, ValueError) as e:
+            logger.exception(f"Error reading module: {e}")
+            return []
+        return [node.name for node in tree.body if isinstance(node, (FunctionDef, AsyncFunctionDef))]
+
+
 class Settings(BaseSettings, extra="allow"):
     """
     Pydantic model to hold settings
@@ -1279,9 +1698,30 @@ class Settings(BaseSettings, extra="allow"):
                 db_name = database.name
         database_path = template.render(database=database, value=value, db_name=db_name)
         print(f"Using {database_path} for database path")
-        engine = create_engine(database_path)
+        performance = DotDict({**database_performance, **(database.get("performance") or {})})
+        database.performance = performance
+        match database.schema:
+            case "mssql+pyodbc":
+                engine = create_engine(database_path, pool_size=performance.pool_size,
+                                       max_overflow=performance.max_overflow, pool_recycle=performance.pool_recycle,
+                                       pool_pre_ping=True, fast_executemany=performance.fast_executemany)
+                # NOTE: The pool already hands each session its own connection.
+                read_engine = engine
+            case "sqlite":
+                engine = create_engine(database_path)
+                # NOTE: Separate pool so report reads never queue behind (or hold up) form saves under WAL.
+                read_engine = create_engine(database_path)
+                sql_event.listen(read_engine, "connect", set_sqlite_query_only)
+            case _:
+                engine = create_engine(database_path)
+                read_engine = engine
+        instrument_engine(engine, slow_query_ms=performance.slow_query_ms)
+        if read_engine is not engine:
+            instrument_engine(read_engine, slow_query_ms=performance.slow_query_ms)
         database.engine = engine
         database.session = scoped_session(sessionmaker(bind=engine))
+        database.read_engine = read_engine
+        database.read_session = scoped_session(sessionmaker(bind=read_engine, autoflush=False))
         return database
     
     @field_validator('package', mode="before")
@@ -1329,6 +1769,20 @@ class Settings(BaseSettings, extra="allow"):
                 logger.exception(f"Error closing database session: {e}")
             finally:
                 self.database.session = None
+        if self.database.get("read_session") is not None:
+            try:
+                self.database.read_session.close()
+            except Exception as e:
+                logger.exception(f"Error closing read-only session: {e}")
+            finally:
+                self.database.read_session = None
+        read_engine = self.database.get("read_engine")
+        if read_engine is not None and read_engine is not engine:
+            try:
+                read_engine.dispose()
+            except Exception as e:
+                logger.exception(f"Error disposing read-only engine: {e}")
+        self.database.read_engine = None
         if engine is not None:
             try:
                 engine.dispose()
@@ -1346,14 +1800,13 @@ class Settings(BaseSettings, extra="allow"):
                           )
         else:
             session = self.database.session
-            metadata = MetaData()
             try:
-                metadata.reflect(bind=self.database.engine)
+                found = table_exists(self.database.engine, "_configitem")
             except AttributeError as e:
                 print(f"Error getting tables: {e}")
                 return
-            if "_configitem" not in metadata.tables.keys():
-                print(f"Couldn't find _configitems in {metadata.tables.keys()}.")
+            if not found:
+                print(f"Couldn't find _configitem in {self.database.engine.url.database}.")
                 return
             config_items = session.execute(text("SELECT * FROM _configitem")).all()
             output = {}
@@ -1366,12 +1819,17 @@ class Settings(BaseSettings, extra="allow"):
             if not hasattr(self, k):
                 self.__setattr__(k, v)
 
-    def set_scripts(self):
+    def set_scripts(self, path: Path | None = None):
         """
-        Imports all functions from "scripts" folder, adding them to ctx scripts
+        Registers functions in the "scripts" folder named in the startup/teardown scripts config.
+        Modules are only read here; each is imported the first time one of its scripts runs.
+
+        Args:
+            path (Path | None, optional): Scripts folder. Defaults to the app's "scripts" folder.
         """
-        
-        if check_if_app():
+        if path is not None:
+            p = path
+        elif check_if_app():
             p = Path(sys._MEIPASS).joinpath("files", "scripts")
         else:
             p = Path(__file__).parents[2].joinpath("scripts").absolute()
@@ -1380,29 +1838,22 @@ class Settings(BaseSettings, extra="allow"):
         # NOTE: Get all .py files that don't have __ in them.
         modules = p.glob("[!__]*.py")
         for module in modules:
-            try:
-                mod = import_module(module.stem)
-            except ImportError as e:
-                logger.exception(f"Error loading module: {e}")
-                continue
-            for function in getmembers(mod, isfunction):
-                name = function[0]
-                func = function[1]
+            for name in LazyScript.function_names(module):
                 # NOTE: assign function based on its name being in config: startup/teardown
                 # NOTE: scripts must be registered using {name: Null} in the database
                 try:
                     if name in self.startup_scripts.keys():
-                        self.model_extra['startup_scripts'][name] = func
+                        self.model_extra['startup_scripts'][name] = LazyScript(name, module.stem)
                 except AttributeError as e:
                     print(f"Couldn't set startup function due to {e}")
                     pass
                 try:
                     if name in self.teardown_scripts.keys():
-                        self.model_extra['teardown_scripts'][name] = func
+                        self.model_extra['teardown_scripts'][name] = LazyScript(name, module.stem)
                 except AttributeError as e:
                     print(f"Couldn't set teardown function due to {e}")
                     pass
-        
+
     @timer
     def run_startup(self):
         """
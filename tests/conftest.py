@@ -96,17 +96,51 @@ def db():
 
     prev = (tools.ctx.database.get("engine"),
             tools.ctx.database.get("session"),
-            tools.ctx.database.get("schema"))
+            tools.ctx.database.get("schema"),
+            tools.ctx.database.get("read_session"))
     tools.ctx.database.engine = engine
     tools.ctx.database.session = Session
     tools.ctx.database.schema = "sqlite"
+    # NOTE: One in-memory connection can't host a separate reader, so reads share the session.
+    tools.ctx.database.read_session = None
 
     try:
         yield Session
     finally:
         Session.remove()
         engine.dispose()
-        tools.ctx.database.engine, tools.ctx.database.session, tools.ctx.database.schema = prev
+        (tools.ctx.database.engine, tools.ctx.database.session,
+         tools.ctx.database.schema, tools.ctx.database.read_session) = prev
+
+
+@pytest.fixture()
+def file_db(tmp_path):
+    """
+    Like ``db``, but on a SQLite file with an ordinary connection pool, so separate
+    connections hold (and wait on) locks the way they do on a shared database.
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import scoped_session, sessionmaker
+
+    import tools
+    from backend.db.models import Base
+
+    keys = ("engine", "session", "schema", "read_session")
+    prev = tuple(tools.ctx.database.get(key) for key in keys)
+    engine = create_engine(f"sqlite:///{tmp_path.joinpath('shared.db')}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = scoped_session(sessionmaker(bind=engine))
+    tools.ctx.database.engine = engine
+    tools.ctx.database.session = Session
+    tools.ctx.database.schema = "sqlite"
+    tools.ctx.database.read_session = None
+    try:
+        yield Session
+    finally:
+        Session.remove()
+        engine.dispose()
+        for key, value in zip(keys, prev):
+            tools.ctx.database[key] = value
 
 
 @pytest.fixture()
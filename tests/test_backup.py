@@ -0,0 +1,134 @@
+"""
+Database backups.
+
+``backup_database`` copies sqlite databases with the online backup API a few pages at
+a time, gzips the copy once it passes ``PRAGMA integrity_check`` and prunes old
+backups by count and age. These run against a throwaway sqlite file rather than the
+in-memory test database.
+"""
+from __future__ import annotations
+
+import gzip
+import os
+import sqlite3
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture()
+def source(tmp_path):
+    path = tmp_path.joinpath("live.db")
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("CREATE TABLE sample (id INTEGER PRIMARY KEY, name TEXT)")
+    connection.executemany("INSERT INTO sample (name) VALUES (?)", [(f"sample-{i}",) for i in range(2000)])
+    connection.commit()
+    yield path, connection
+    connection.close()
+
+
+def _rows(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT count(*) FROM sample").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_backup_is_compressed_and_restorable(source, tmp_path):
+    from backend.db.backup import backup_sqlite, verify_backup
+
+    path, _ = source
+    backup = backup_sqlite(path, tmp_path.joinpath("backups", "live_2026-10-18.db.gz"), pages=4)
+    assert verify_backup(backup)
+    assert not list(backup.parent.glob("*.partial"))
+    restored = tmp_path.joinpath("restored.db")
+    restored.write_bytes(gzip.decompress(backup.read_bytes()))
+    assert _rows(restored) == 2000
+
+
+def test_writers_are_not_blocked(source, tmp_path, monkeypatch):
+    """Commits between steps go through, and the backup is the snapshot it started from."""
+    import backend.db.backup as module
+
+    path, connection = source
+    written = []
+
+    def _step(*args):
+        connection.execute("INSERT INTO sample (name) VALUES ('during')")
+        connection.commit()
+        written.append(True)
+
+    monkeypatch.setattr(module.logger, "debug", _step)
+    backup = module.backup_sqlite(path, tmp_path.joinpath("live.db.gz"), pages=1, sleep_ms=0)
+    restored = tmp_path.joinpath("restored.db")
+    restored.write_bytes(gzip.decompress(backup.read_bytes()))
+    assert written
+    assert _rows(restored) == 2000
+    assert _rows(path) == 2000 + len(written)
+
+
+def test_truncated_backup_fails_verification(source, tmp_path):
+    from backend.db.backup import backup_sqlite, verify_backup
+
+    path, _ = source
+    backup = backup_sqlite(path, tmp_path.joinpath("live.db.gz"))
+    backup.write_bytes(backup.read_bytes()[:-64])
+    assert not verify_backup(backup)
+
+
+def test_retention_by_count_and_age(tmp_path):
+    from backend.db.backup import prune_backups
+
+    today = date(2026, 10, 18)
+    for days in range(6):
+        backup = tmp_path.joinpath(f"live_{today - timedelta(days=days * 30)}.db.gz")
+        backup.write_bytes(b"")
+        stamp = (today - timedelta(days=days * 30) - date(1970, 1, 1)).days * 86400 + 43200
+        os.utime(backup, (stamp, stamp))
+    tmp_path.joinpath("other_2020-01-01.db.gz").write_bytes(b"")
+    removed = prune_backups(tmp_path, "live_*.db.gz", keep=4, max_age_days=65, today=today)
+    assert sorted(item.name for item in removed) == [
+        "live_2026-05-21.db.gz", "live_2026-06-20.db.gz", "live_2026-07-20.db.gz"]
+    assert tmp_path.joinpath("other_2020-01-01.db.gz").exists()
+
+
+def test_newest_backup_is_always_kept(tmp_path):
+    from backend.db.backup import prune_backups
+
+    backup = tmp_path.joinpath("live_2020-01-01.db.gz")
+    backup.write_bytes(b"")
+    os.utime(backup, (0, 0))
+    assert prune_backups(tmp_path, "live_*.db.gz", keep=1, max_age_days=1) == []
+    assert backup.exists()
+
+
+def test_backup_database_once_a_day(source, tmp_path):
+    from sqlalchemy import create_engine
+    from backend.db.backup import backup_database
+    from tools import DotDict
+
+    path, _ = source
+    engine = create_engine(f"sqlite:///{path}")
+    ctx = SimpleNamespace(
+        database=DotDict(schema="sqlite", engine=engine, name="live", backup=dict(keep=3)),
+        directories=DotDict(backup=str(tmp_path.joinpath("backups"))))
+    try:
+        first = backup_database(ctx)
+        assert first.name == f"live_{date.today().isoformat()}.db.gz"
+        stamp = first.stat().st_mtime_ns
+        assert backup_database(ctx) == first
+        assert first.stat().st_mtime_ns == stamp
+    finally:
+        engine.dispose()
+
+
+def test_unsupported_schema_is_skipped(tmp_path):
+    from backend.db.backup import backup_database
+    from tools import DotDict
+
+    ctx = SimpleNamespace(database=DotDict(schema="postgresql", engine=object()),
+                          directories=DotDict(backup=str(tmp_path)))
+    assert backup_database(ctx) is None
@@ -0,0 +1,107 @@
+"""
+``backend.excel.batch_import``: headless import of many client submission workbooks.
+
+Workbooks are parsed in worker processes and come back as plain dicts; the calling
+process is the only writer and commits them in batches, one savepoint per file, so a
+bad workbook is reported without taking the rest of its batch down with it.
+"""
+from __future__ import annotations
+
+import pickle
+from pathlib import Path
+
+import pytest
+
+
+def _parsed(graph, plate_id):
+    from backend.excel.batch_import import strip_sql_instances
+
+    pyd = graph["submissions"][0].to_pydantic()
+    data = strip_sql_instances(pyd.model_dump(exclude={"run", "clientsubmissionsampleassociation"}))
+    data["submitter_plate_id"] = plate_id
+    return data
+
+
+def _unpickle(path: Path) -> dict:
+    # NOTE: Module level, so a spawned worker can find it.
+    return pickle.loads(Path(path).read_bytes())
+
+
+def test_parsed_data_crosses_processes(graph):
+    data = _parsed(graph, "BATCH-1")
+    assert pickle.loads(pickle.dumps(data)) == data
+
+
+def test_bad_file_does_not_sink_its_batch(graph):
+    from backend.db.models import ClientSubmission
+    from backend.excel.batch_import import write_submissions
+
+    outcomes = write_submissions([
+        dict(file="good.xlsx", data=_parsed(graph, "BATCH-1")),
+        dict(file="bad.xlsx", data=dict(sample="not a list")),
+        dict(file="also_good.xlsx", data=_parsed(graph, "BATCH-2")),
+    ])
+    assert [outcome.status for outcome in outcomes] == ["imported", "failed", "imported"]
+    assert outcomes[1].stage == "write" and outcomes[1].message
+    assert outcomes[0].submission == "BATCH-1"
+    graph["session"].expire_all()
+    assert ClientSubmission.query(submitter_plate_id="BATCH-1") is not None
+    assert ClientSubmission.query(submitter_plate_id="BATCH-2") is not None
+
+
+def test_batch_import_reports_every_file(graph, tmp_path):
+    from backend.excel.batch_import import batch_import, write_report
+
+    for name in ["a.xlsx", "b.xlsx", "c.xlsx", "~$a.xlsx"]:
+        # NOTE: Distinct contents, identical files would be skipped as already imported.
+        tmp_path.joinpath(name).write_text(name)
+    datas = {"a.xlsx": _parsed(graph, "BATCH-A"), "c.xlsx": _parsed(graph, "BATCH-C")}
+
+    def _parse(path):
+        return datas[path.name]
+
+    outcomes = list(batch_import([tmp_path], workers=0, batch_size=1, parse=_parse))
+    by_file = {outcome.file.rsplit("/", 1)[-1]: outcome for outcome in outcomes}
+    assert set(by_file) == {"a.xlsx", "b.xlsx", "c.xlsx"}
+    assert by_file["b.xlsx"].status == "failed" and by_file["b.xlsx"].stage == "parse"
+    assert by_file["a.xlsx"].status == by_file["c.xlsx"].status == "imported"
+    report = write_report(outcomes, tmp_path.joinpath("report.csv"))
+    assert len(report.read_text().splitlines()) == 4
+
+
+def test_real_workbook_round_trips(graph, tmp_path):
+    pytest.importorskip("PyQt6.QtWebEngineWidgets", reason="PyQt6-WebEngine is required by the managers",
+                        exc_type=ImportError)
+    from openpyxl import Workbook
+    from backend.db.models import ClientSubmission
+    from backend.excel.batch_import import parse_workbook, write_submissions
+    from backend.managers import DefaultClientSubmissionManager
+
+    submission = graph["submissions"][0]
+    pyd = submission.to_pydantic()
+    workbook = DefaultClientSubmissionManager(parent=None, input_object=pyd).write(Workbook())
+    workbook.properties.category = submission.submissiontype.name
+    path = tmp_path.joinpath("round_trip.xlsx")
+    workbook.save(path)
+    # NOTE: The worker's output has to come back through pickle and validate in the writer.
+    data = parse_workbook(path)
+    assert pickle.loads(pickle.dumps(data)) == data
+    data["submitter_plate_id"] = "BATCH-REAL"
+    outcome, = write_submissions([dict(file=str(path), data=data)])
+    assert outcome.status == "imported", outcome.message
+    assert outcome.samples == len([item for item in pyd.sample if item.sample_id])
+    graph["session"].expire_all()
+    assert ClientSubmission.query(submitter_plate_id="BATCH-REAL") is not None
+
+
+def test_worker_pool_parses_in_other_processes(graph, tmp_path):
+    from backend.excel.batch_import import batch_import
+
+    for plate_id in ["BATCH-P1", "BATCH-P2"]:
+        tmp_path.joinpath(f"{plate_id}.xlsx").write_bytes(pickle.dumps(_parsed(graph, plate_id)))
+    tmp_path.joinpath("broken.xlsx").write_bytes(b"not a pickle")
+    outcomes = list(batch_import([tmp_path], workers=1, batch_size=1, parse=_unpickle))
+    by_file = {Path(outcome.file).name: outcome for outcome in outcomes}
+    assert by_file["broken.xlsx"].status == "failed" and by_file["broken.xlsx"].stage == "parse"
+    assert by_file["BATCH-P1.xlsx"].status == by_file["BATCH-P2.xlsx"].status == "imported"
+    assert {by_file[name].submission for name in ["BATCH-P1.xlsx", "BATCH-P2.xlsx"]} == {"BATCH-P1", "BATCH-P2"}
@@ -0,0 +1,146 @@
+"""
+Several users saving to one database.
+
+Submissions, runs, procedures and reagent lots carry a ``version_id`` checked on every
+UPDATE, so a save made from a stale copy is refused instead of silently overwriting
+someone else's edit. A save blocked by another user's lock waits a short while, then is
+rolled back and retried with backoff instead of failing outright.
+"""
+from __future__ import annotations
+
+import sqlite3
+from threading import Timer
+
+import pytest
+
+
+@pytest.fixture()
+def db(tmp_path):
+    """
+    Overrides the in-memory ``db`` with a file, so separate connections (and users) can
+    hold locks against each other.
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import scoped_session, sessionmaker
+
+    import tools
+    from backend.db.models import Base
+
+    keys = ("engine", "session", "schema", "read_session", "concurrency")
+    prev = tuple(tools.ctx.database.get(key) for key in keys)
+    tools.ctx.database.schema = "sqlite"
+    tools.ctx.database.concurrency = dict(lock_timeout_ms=50, retries=8, backoff_ms=50, backoff_max_ms=200)
+    path = tmp_path.joinpath("shared.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = scoped_session(sessionmaker(bind=engine))
+    tools.ctx.database.engine = engine
+    tools.ctx.database.session = Session
+    tools.ctx.database.read_session = None
+    try:
+        yield Session
+    finally:
+        Session.remove()
+        engine.dispose()
+        for key, value in zip(keys, prev):
+            tools.ctx.database[key] = value
+
+
+def _hold_write_lock(path, seconds):
+    other = sqlite3.connect(path, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    timer = Timer(seconds, other.commit)
+    timer.start()
+    return other, timer
+
+
+def test_version_counts_updates(graph):
+    submission = graph["submissions"][0]
+    version = submission.version_id
+    submission.submission_category = "Research"
+    submission.save()
+    assert submission.version_id == version + 1
+
+
+def test_stale_save_is_refused(graph, db):
+    from sqlalchemy.orm import Session
+    from backend.db.models import ClientSubmission
+
+    mine = graph["submissions"][0]
+    mine.submission_category  # NOTE: loaded before the other user's edit.
+    with Session(db.get_bind()) as session:
+        theirs = session.get(ClientSubmission, mine.id)
+        theirs.submission_category = "Theirs"
+        session.commit()
+    mine.submission_category = "Mine"
+    report = ClientSubmission.save.__wrapped__(mine)
+    assert [alert.status for alert in report.results] == ["Warning"]
+    db.expire_all()
+    assert db.get(ClientSubmission, mine.id).submission_category == "Theirs"
+
+
+def test_save_waits_out_a_lock(graph, db):
+    from backend.db.models import ClientSubmission, ConfigItem
+
+    submission = graph["submissions"][0]
+    version = submission.version_id
+    submission.submission_category = "Retried"
+    config = ConfigItem(key="retried", value="yes")
+    db.add(config)
+    other, timer = _hold_write_lock(db.get_bind().url.database, 0.3)
+    try:
+        assert ClientSubmission.save.__wrapped__(submission) is None
+    finally:
+        timer.join()
+        other.close()
+    db.expire_all()
+    assert db.get(ClientSubmission, submission.id).submission_category == "Retried"
+    assert submission.version_id == version + 1
+    assert db.query(ConfigItem).filter_by(key="retried").one().value == "yes"
+
+
+def test_save_leaves_connections_with_the_usual_lock_wait(graph, db):
+    """Only the save's own attempt waits briefly; queries, sequences and the like wait longer."""
+    from backend.db.models import ClientSubmission
+
+    submission = graph["submissions"][0]
+    submission.submission_category = "Waited"
+    assert ClientSubmission.save.__wrapped__(submission) is None
+    with db.get_bind().connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+
+
+def test_save_is_not_retried_after_an_earlier_flush(graph, db, monkeypatch):
+    """
+    Writes flushed before the save (here by an explicit flush) are lost by the rollback and
+    can't be re-applied, so a blocked commit must fail rather than report success.
+    """
+    from sqlalchemy.exc import OperationalError
+    from backend.db.models import ClientSubmission, ConfigItem
+
+    db.add(ConfigItem(key="flushed", value="earlier"))
+    db.flush()
+    submission = graph["submissions"][0]
+    submission.submission_category = "Flushed"
+
+    def locked():
+        raise OperationalError("COMMIT", {}, sqlite3.OperationalError("database is locked"))
+
+    monkeypatch.setattr(db(), "commit", locked)
+    with pytest.raises(OperationalError):
+        ClientSubmission.save.__wrapped__(submission)
+    monkeypatch.undo()
+    assert db.query(ConfigItem).filter_by(key="flushed").first() is None
+
+
+def test_lock_errors_are_recognised():
+    from sqlalchemy.exc import OperationalError
+    from backend.db.models import BaseClass
+
+    def error(message):
+        return OperationalError("UPDATE", {}, Exception(message))
+
+    assert BaseClass.is_transient_lock_error(error("database is locked"))
+    assert BaseClass.is_transient_lock_error(error("('40001', '[40001] ... was deadlocked on lock resources ... (1205)')"))
+    assert BaseClass.is_transient_lock_error(error("('HYT00', '[HYT00] Lock request time out period exceeded. (1222)')"))
+    assert not BaseClass.is_transient_lock_error(error("no such table: _run"))
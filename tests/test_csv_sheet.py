@@ -0,0 +1,72 @@
+"""
+``CSVSheet``: csv exports read straight into the parsers.
+
+Managers used to copy every csv into an openpyxl Workbook before parsing it. The
+parsers now take a ``CSVSheet`` wherever they take a ``Worksheet``; these tests hold
+it to what the Workbook copy produced.
+"""
+from __future__ import annotations
+
+from csv import reader as csvreader
+
+import pytest
+
+QUBIT = (
+    "Run ID,Assay Name,Test Name,Test Date,Qubit tube conc.,Qubit units,Original sample conc.,Units\n"
+    "2026-01-05_101010,dsDNA HS,Sample 1,2026-01-05 10:10:10,1.23,ng/mL,24.6,ng/uL\n"
+    "2026-01-05_101010,dsDNA HS,Sample 2,2026-01-05 10:11:10,Out of range,ng/mL,,ng/uL\n"
+    "\n"
+    "2026-01-05_101010,dsDNA HS,Sample 3,2026-01-05 10:12:10,2.5\n"
+)
+
+
+@pytest.fixture()
+def export(tmp_path):
+    path = tmp_path.joinpath("qubit.csv")
+    path.write_text(QUBIT)
+    return path
+
+
+def _workbook_copy(path):
+    from openpyxl import Workbook
+
+    worksheet = Workbook().active
+    with open(path, "r") as f:
+        for row in csvreader(f):
+            worksheet.append(row)
+    return worksheet
+
+
+def test_sheet_matches_workbook_copy(export):
+    from backend.excel.parsers import CSVSheet
+
+    sheet, worksheet = CSVSheet.from_file(export), _workbook_copy(export)
+    assert sheet.file == export
+    assert (sheet.min_row, sheet.max_row, sheet.max_column) == (worksheet.min_row, worksheet.max_row, worksheet.max_column)
+    assert list(sheet.iter_rows(values_only=True)) == list(worksheet.iter_rows(values_only=True))
+    assert list(sheet.iter_rows(min_row=2, max_row=3, min_col=3, max_col=4, values_only=True)) == \
+        list(worksheet.iter_rows(min_row=2, max_row=3, min_col=3, max_col=4, values_only=True))
+    assert [[cell.value for cell in row] for row in sheet.rows] == [[cell.value for cell in row] for row in worksheet.rows]
+    assert sheet.cell(2, 3).value == worksheet.cell(2, 3).value == "Sample 1"
+    assert sheet.cell(5, 8).value is None
+
+
+@pytest.mark.parametrize("parser_name", ["DefaultResultsInfoParser", "DefaultResultsSampleParser"])
+def test_parsers_read_sheet_like_workbook(export, parser_name):
+    import backend.excel.parsers as parsers
+
+    parser = getattr(parsers, parser_name)
+    from_sheet = parser(worksheet=parsers.CSVSheet.from_file(export), results_type="Qubit")
+    from_workbook = parser(worksheet=_workbook_copy(export), results_type="Qubit")
+    assert (from_sheet.start_row, from_sheet.end_row) == (from_workbook.start_row, from_workbook.end_row)
+    assert list(from_sheet.parsed_info) == list(from_workbook.parsed_info)
+
+
+def test_empty_file(tmp_path):
+    from backend.excel.parsers import CSVSheet
+
+    path = tmp_path.joinpath("empty.csv")
+    path.write_text("")
+    sheet = CSVSheet.from_file(path)
+    assert (sheet.max_row, sheet.max_column) == (1, 1)
+    assert list(sheet.iter_rows(values_only=True)) == [(None,)]
@@ -0,0 +1,141 @@
+"""
+Database performance profile and the read-only session.
+
+``set_sqlite_pragma`` now applies the tunable part of ``database: performance:`` on
+every new connection, ``maintain_database`` runs the periodic optimize/checkpoint, and
+``read_only_session`` sends report and chart queries through a session bound to a
+separate, write-refusing engine. The in-memory ``db`` fixture can't host a second
+connection, so the engine-level behaviour is checked against a throwaway file.
+"""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+
+@pytest.fixture()
+def file_engine(db, tmp_path):
+    import backend.db  # noqa: F401 -- registers the connect listener
+
+    engine = create_engine(f"sqlite:///{tmp_path.joinpath('profile.db')}")
+    yield engine
+    engine.dispose()
+
+
+def test_pragmas_follow_performance_profile(file_engine):
+    from tools import database_performance
+
+    with file_engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA cache_size").scalar() == database_performance['cache_size']
+        assert connection.exec_driver_sql("PRAGMA mmap_size").scalar() == database_performance['mmap_size']
+        # NOTE: 2 is MEMORY
+        assert connection.exec_driver_sql("PRAGMA temp_store").scalar() == 2
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+
+
+def test_config_overrides_profile(file_engine):
+    import tools
+
+    previous = tools.ctx.database.get("performance")
+    tools.ctx.database.performance = dict(cache_size=-1024)
+    try:
+        with file_engine.connect() as connection:
+            assert connection.exec_driver_sql("PRAGMA cache_size").scalar() == -1024
+            assert connection.exec_driver_sql("PRAGMA temp_store").scalar() == 2
+    finally:
+        tools.ctx.database.performance = previous
+
+
+def test_read_engine_refuses_writes(file_engine, tmp_path):
+    from tools import set_sqlite_query_only
+
+    with file_engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE t (x INTEGER)")
+    read_engine = create_engine(f"sqlite:///{tmp_path.joinpath('profile.db')}")
+    event.listen(read_engine, "connect", set_sqlite_query_only)
+    try:
+        with read_engine.connect() as connection:
+            assert connection.exec_driver_sql("SELECT count(*) FROM t").scalar() == 0
+            with pytest.raises(OperationalError):
+                connection.exec_driver_sql("INSERT INTO t VALUES (1)")
+    finally:
+        read_engine.dispose()
+
+
+def test_maintain_database_checkpoints(file_engine):
+    import tools
+    from backend.db import maintain_database
+
+    with file_engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE t (x INTEGER)")
+        connection.exec_driver_sql("INSERT INTO t VALUES (1)")
+    previous = tools.ctx.database.engine
+    tools.ctx.database.engine = file_engine
+    try:
+        maintain_database()
+    finally:
+        tools.ctx.database.engine = previous
+
+
+def test_read_only_session_routes_queries(db, file_engine):
+    import tools
+    from backend.db.models import BaseClass, read_only_session
+
+    read_session = scoped_session(sessionmaker(bind=file_engine, autoflush=False))
+    tools.ctx.database.read_session = read_session
+    try:
+        with read_only_session() as session:
+            assert session is read_session
+            assert BaseClass.__database_session__ is read_session
+            session.execute(text("SELECT 1"))
+            assert read_session().in_transaction()
+        assert not read_session().in_transaction()
+        assert BaseClass.__database_session__ is db
+    finally:
+        read_session.remove()
+
+
+def test_read_only_session_on_a_file_database(file_db):
+    """
+    The read engine built the way Settings builds it for sqlite: a second engine on the same
+    file with query_only set on connect. Reads see what the main session committed; writes
+    are refused.
+    """
+    import tools
+    from sqlalchemy import select
+    from backend.db.models import BaseClass, ReagentRole, read_only_session
+    from tools import set_sqlite_query_only
+
+    file_db.add(ReagentRole(name="Committed Role"))
+    file_db.commit()
+    read_engine = create_engine(tools.ctx.database.engine.url)
+    event.listen(read_engine, "connect", set_sqlite_query_only)
+    read_session = scoped_session(sessionmaker(bind=read_engine, autoflush=False))
+    tools.ctx.database.read_session = read_session
+    try:
+        with read_only_session() as session:
+            assert session.get_bind() is read_engine
+            assert session.connection().exec_driver_sql("PRAGMA query_only").scalar() == 1
+            names = BaseClass.__database_session__.execute(select(ReagentRole.name)).scalars().all()
+            assert "Committed Role" in names
+            session.add(ReagentRole(name="Refused Role"))
+            with pytest.raises(OperationalError, match="readonly"):
+                session.flush()
+            session.rollback()
+        assert file_db.execute(select(ReagentRole).where(ReagentRole.name == "Refused Role")).first() is None
+    finally:
+        read_session.remove()
+        read_engine.dispose()
+
+
+def test_fallback_leaves_main_session_alone(db):
+    from backend.db.models import BaseClass, ReagentRole, read_only_session
+
+    role = ReagentRole(name="Pending Role")
+    db.add(role)
+    with read_only_session() as session:
+        assert session is db
+        assert BaseClass.__database_session__ is db
+    assert role in db.new
@@ -0,0 +1,80 @@
+"""
+``Run.hitpick_lists``: hitpick entries for many runs from one query.
+
+``RunSampleAssociation.hitpicked`` used to build each entry from the association's
+``details_dict`` with its own Jinja environment. Associations, samples and plate
+positions for any number of runs now come from a single select, rendered with one
+shared tooltip template.
+"""
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture()
+def counted(graph):
+    import tools
+    from tools import instrument_engine, reset_performance_summary
+
+    instrument_engine(tools.ctx.database.engine)
+    reset_performance_summary()
+    yield graph
+    reset_performance_summary()
+
+
+def test_one_statement_for_every_run(counted):
+    from backend.db.models import Run
+    from tools import track_action
+
+    runs = counted["runs"]
+    ids = [run.id for run in runs]
+    with track_action("hitpicks") as stats:
+        lists = Run.hitpick_lists(ids)
+    assert stats.statements == 1
+    assert set(lists) == {run.rsl_plate_number for run in runs}
+    for run in runs:
+        assert len(lists[run.rsl_plate_number]) == len(run.runsampleassociation)
+
+
+def test_entries_follow_rank_and_position(graph):
+    from backend.db.models import Run
+
+    run = graph["runs"][0]
+    entries = run.hitpicked
+    assert [item['run_rank'] for item in entries] == sorted(assoc.run_rank for assoc in run.runsampleassociation)
+    latest = max(run.procedure, key=lambda procedure: procedure.id)
+    wells = {assoc.sample.sample_id: assoc.well for assoc in latest.proceduresampleassociation}
+    for item in entries:
+        assert item['well'] == wells.get(item['sample_id'])
+        assert item['sample_id'] in item['tooltip']
+        assert item['Name'] == item['sample_id'][:10]
+        assert item['background_color'] == ("rgb(128, 203, 196)" if item['is_control'] else "rgb(105, 216, 79)")
+
+
+def test_association_entry_matches_the_run_list(graph):
+    run = next(run for run in graph["runs"] if len(run.runsampleassociation) > 1)
+    assoc = run.runsampleassociation[1]
+    assert assoc.hitpicked in run.hitpicked
+    assert assoc.hitpicked['sample_id'] == assoc.sample.sample_id
+
+
+def test_association_entry_reads_only_its_sample(counted):
+    from backend.db.models import Run
+    from tools import track_action
+
+    run = next(run for run in counted["runs"] if len(run.runsampleassociation) > 1)
+    entries = Run.hitpick_lists([run])[run.rsl_plate_number]
+    assoc = run.runsampleassociation[0]
+    with track_action("hitpicked") as stats:
+        entry = assoc.hitpicked
+    assert entry in entries
+    assert Run.hitpick_lists([run], samples=[assoc.sample])[run.rsl_plate_number] == [entry]
+    # NOTE: The run and sample are already loaded, so only the hitpick query itself runs.
+    assert stats.statements == 1
+
+
+def test_unknown_runs_are_empty(graph):
+    from backend.db.models import Run
+
+    assert Run.hitpick_lists([]) == {}
+    assert Run.hitpick_lists(["RSL-NOPE-26-0000"]) == {}
@@ -0,0 +1,72 @@
+"""
+``ImagePyramid``: gel scans stored as downsampled levels for the gel checker.
+
+``GelBox`` used to decode the full scan and rotate/flip the whole array every time it
+opened. The pyramid decodes it once, keeps each level on disk in the orientation
+ImageView wants, and the viewer opens the screen-sized level first.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from PIL import Image
+
+
+@pytest.fixture()
+def scan(tmp_path):
+    pixels = (np.arange(1500 * 2300, dtype=np.uint32) % 65521).astype(np.uint16).reshape(1500, 2300)
+    path = tmp_path.joinpath("gel.tif")
+    Image.fromarray(pixels).save(path)
+    return path, np.asarray(Image.open(path))
+
+
+def test_levels_halve_down_to_min_size(scan, tmp_path):
+    from backend.db import ImagePyramid
+
+    path, pixels = scan
+    pyramid = ImagePyramid(path, cache=tmp_path.joinpath("cache"), min_size=500)
+    assert pyramid.size == (2300, 1500)
+    assert [shape[:2] for shape in pyramid.shapes] == [(2300, 1500), (1150, 750), (575, 375), (287, 187)]
+    overview, scale = pyramid.overview()
+    assert scale == 8 and overview.shape == (287, 187) and overview.dtype == pixels.dtype
+
+
+def test_full_level_matches_old_orientation(scan, tmp_path):
+    from backend.db import ImagePyramid
+
+    path, pixels = scan
+    pyramid = ImagePyramid(path, cache=tmp_path.joinpath("cache"))
+    # NOTE: What GelBox used to hand ImageView.
+    assert np.array_equal(pyramid.level(0), np.flip(np.rot90(pixels, 1), 0))
+    assert pyramid.level(1)[3, 5] == pixels[10:12, 6:8].mean().astype(np.uint16)
+
+
+def test_built_once_and_rebuilt_when_the_file_changes(scan, tmp_path, monkeypatch):
+    from backend.db import ImagePyramid
+
+    path, pixels = scan
+    cache = tmp_path.joinpath("cache")
+    first = ImagePyramid(path, cache=cache)
+    builds = []
+    monkeypatch.setattr(ImagePyramid, "build", lambda self: builds.append(True))
+    assert ImagePyramid(path, cache=cache).directory == first.directory
+    assert builds == []
+    monkeypatch.undo()
+    Image.fromarray(pixels[:100, :100]).save(path)
+    changed = ImagePyramid(path, cache=cache)
+    assert changed.directory != first.directory and changed.size == (100, 100)
+
+
+def test_region_and_level_choice(scan, tmp_path):
+    from backend.db import ImagePyramid
+
+    path, pixels = scan
+    pyramid = ImagePyramid(path, cache=tmp_path.joinpath("cache"), min_size=500)
+    assert pyramid.level_for(0.5) == 0
+    assert pyramid.level_for(2.5) == 1
+    assert pyramid.level_for(100) == 3
+    region, rect = pyramid.region(0, 100.5, 200, 140, 260)
+    assert rect == (100, 200, 40, 60)
+    assert np.array_equal(region, pixels[200:260, 100:140].T)
+    region, rect = pyramid.region(2, -50, -50, 10000, 10000)
+    assert rect == (0, 0, 2300, 1500) and region.shape == (575, 375)
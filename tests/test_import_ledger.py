@@ -0,0 +1,80 @@
+"""
+``ImportLedger``: files are recognised by their contents when dropped in again.
+
+Each imported workbook or instrument export is hashed and recorded with the records it
+became. Importing the same contents again, under any name, opens (or reports) those
+records instead of parsing and writing the file a second time.
+"""
+from __future__ import annotations
+
+
+def _parsed(graph, plate_id):
+    from backend.excel.batch_import import strip_sql_instances
+
+    pyd = graph["submissions"][0].to_pydantic()
+    data = strip_sql_instances(pyd.model_dump(exclude={"run", "clientsubmissionsampleassociation"}))
+    data["submitter_plate_id"] = plate_id
+    return data
+
+
+def test_lookup_matches_contents_not_names(graph, tmp_path):
+    from backend.db.models import ImportLedger
+
+    submission = graph["submissions"][0]
+    original = tmp_path.joinpath("original.xlsx")
+    original.write_bytes(b"workbook")
+    renamed = tmp_path.joinpath("copy of original.xlsx")
+    renamed.write_bytes(b"workbook")
+    edited = tmp_path.joinpath("edited.xlsx")
+    edited.write_bytes(b"workbook, edited")
+    assert ImportLedger.lookup(original) is None
+    entry = ImportLedger.record(original, clientsubmission=submission)
+    assert entry.size == len(b"workbook") and entry.filename == "original.xlsx"
+    assert ImportLedger.lookup(renamed).clientsubmission is submission
+    assert ImportLedger.lookup(edited) is None
+    assert ImportLedger.lookup(renamed, kind="Qubit") is None
+
+
+def test_results_are_per_procedure(graph, tmp_path):
+    from backend.db.models import ImportLedger
+
+    first, second = graph["runs"][0].procedure[:2]
+    export = tmp_path.joinpath("qubit.csv")
+    export.write_text("Sample,Conc.\n")
+    ImportLedger.record(export, kind="Qubit", procedure=first, results=first.results)
+    assert ImportLedger.lookup(export, kind="Qubit", procedure=first) is not None
+    assert ImportLedger.lookup(export, kind="Qubit", procedure=second) is None
+
+
+def test_deleting_the_submission_forgets_the_file(graph, tmp_path):
+    from backend.db.models import ImportLedger
+    from backend.db.purge import purge
+
+    workbook = tmp_path.joinpath("submission.xlsx")
+    workbook.write_bytes(b"workbook")
+    ImportLedger.record(workbook, clientsubmission=graph["submissions"][0])
+    purge([graph["submissions"][0]])
+    assert ImportLedger.lookup(workbook) is None
+
+
+def test_batch_import_skips_files_seen_before(graph, tmp_path):
+    from backend.excel.batch_import import batch_import
+
+    for name, contents in [("a.xlsx", "a"), ("a2.xlsx", "a"), ("b.xlsx", "b")]:
+        tmp_path.joinpath(name).write_text(contents)
+    datas = {"a": _parsed(graph, "LEDGER-A"), "b": _parsed(graph, "LEDGER-B")}
+    parsed = []
+
+    def _parse(path):
+        parsed.append(path.name)
+        return datas[path.read_text()]
+
+    first = {outcome.file.rsplit("/", 1)[-1]: outcome for outcome in batch_import([tmp_path], workers=0, parse=_parse)}
+    assert sorted(parsed) == ["a.xlsx", "b.xlsx"]
+    assert first["a2.xlsx"].status == "duplicate" and first["a2.xlsx"].message == "Same contents as a.xlsx"
+    assert first["a.xlsx"].status == first["b.xlsx"].status == "imported"
+    parsed.clear()
+    again = list(batch_import([tmp_path], workers=0, parse=_parse))
+    assert not parsed
+    assert {outcome.status for outcome in again} == {"duplicate"}
+    assert sorted(outcome.submission for outcome in again) == ["LEDGER-A", "LEDGER-A", "LEDGER-B"]
@@ -0,0 +1,106 @@
+"""
+``PydBaseClass.improved_dict`` is memoized.
+
+It used to be rebuilt on every access, and the Excel writers, ``to_sql``, ``fields``
+and ``to_html`` all read it repeatedly -- a 96-row sample table rebuilt it hundreds
+of times. It is now built once and handed out as a read-only view, and the cache is
+rebuilt whenever a public attribute is assigned or a field is changed in place. Keys
+read through the sql_instance's relationships (a run's procedures, a submission's runs)
+are kept until the relationship holds different rows. These tests pin that contract:
+reuse, invalidation, and read-only-ness.
+"""
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture()
+def role(db):
+    from backend.validators.pydant import PydBaseClass, PydReagentRole
+
+    PydBaseClass.improved_dict_stats(reset=True)
+    return PydReagentRole(name="Wash Buffer")
+
+
+def test_repeated_access_reuses_the_cache(role):
+    from backend.validators.pydant import PydBaseClass
+
+    assert role.improved_dict == role.improved_dict
+    assert PydBaseClass.improved_dict_stats()["PydReagentRole"]["misses"] == 1
+
+
+def test_assignment_invalidates(role):
+    before = role.improved_dict
+    role.name = "Lysis Buffer"
+    after = role.improved_dict
+    assert after is not before
+    assert after["name"] == "Lysis Buffer"
+
+
+def test_view_is_read_only(role):
+    with pytest.raises(TypeError):
+        role.improved_dict["name"] = "changed"
+
+
+def test_copies_are_independent(role):
+    """Callers that need to edit the result copy it; the cache must not see the edit."""
+    copy = dict(role.improved_dict)
+    copy["name"] = "changed"
+    assert role.improved_dict["name"] == "Wash Buffer"
+
+
+def test_list_changed_in_place_is_noticed(role):
+    role.reagent = ["Buffer A"]
+    assert role.improved_dict["reagent"] == ["Buffer A"]
+    role.reagent.append("Buffer B")
+    assert role.improved_dict["reagent"] == ["Buffer A", "Buffer B"]
+
+
+def test_in_place_changes_invalidate(graph):
+    from backend.validators.pydant import PydSample
+
+    run = graph["runs"][0].to_pydantic()
+    before = run.improved_dict["sample_count"]
+    run.add_samples(PydSample(sample_id="ADDED-IN-PLACE"))
+    assert run.improved_dict["sample_count"] == before + 1
+
+
+def test_relationship_keys_are_reused(graph):
+    from backend.validators.pydant import PydBaseClass
+
+    pyd = graph["runs"][0].to_pydantic()
+    pyd.improved_dict
+    PydBaseClass.improved_dict_stats(reset=True)
+    for _ in range(3):
+        pyd.improved_dict
+    stats = PydBaseClass.improved_dict_stats()
+    assert "PydProcedure" not in stats
+    assert stats["PydRun"]["misses"] == 0
+
+
+def test_relationship_keys_follow_the_rows(graph):
+    """PydRun.improved_dict['procedure'] is read through the sql_instance, which changes underneath it."""
+    from backend.db.models import Procedure
+
+    run = graph["runs"][0]
+    pyd = run.to_pydantic()
+    before = len(pyd.improved_dict["procedure"])
+    procedure = Procedure(name="Added later", proceduretype=run.procedure[0].proceduretype)
+    run.procedure.append(procedure)
+    try:
+        assert len(pyd.improved_dict["procedure"]) == before + 1
+    finally:
+        run.procedure.remove(procedure)
+        graph["session"].expunge(procedure)
+
+
+def test_stats_count_hits_and_misses(role):
+    from backend.validators.pydant import PydBaseClass
+
+    role.improved_dict
+    role.improved_dict
+    role.improved_dict
+    stats = PydBaseClass.improved_dict_stats()["PydReagentRole"]
+    assert stats["misses"] == 1
+    assert stats["hits"] == 2
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
@@ -0,0 +1,69 @@
+"""
+The queue-based logging pipeline.
+
+``CustomLogger`` instances only enqueue records; a single ``QueueListener`` thread
+formats them with formatters built once per level and writes to stdout and, when
+``logging_enabled`` is set, to a file in batches. ``stop_logging`` drains the queue,
+so each test stops the listener before looking at what was written.
+"""
+from __future__ import annotations
+
+from logging import DEBUG, INFO, WARNING, LogRecord
+
+import pytest
+
+
+@pytest.fixture()
+def pipeline():
+    import tools
+
+    tools.stop_logging()
+    yield tools
+    tools.stop_logging()
+
+
+def _record(level: int, msg: str = "message") -> LogRecord:
+    return LogRecord("submissions.test", level, __file__, 1, msg, None, None)
+
+
+def test_formatters_are_built_once():
+    from tools import CustomFormatter
+
+    formatter = CustomFormatter()
+    debug = formatter.formatters[DEBUG]
+    assert "message" in formatter.format(_record(DEBUG))
+    assert "message" in formatter.format(_record(WARNING))
+    assert formatter.formatters[DEBUG] is debug
+
+
+def test_loggers_share_one_queue_handler(pipeline):
+    first = pipeline.CustomLogger("submissions.test.first")
+    second = pipeline.CustomLogger("submissions.test.second")
+    assert first.handlers == [pipeline.queue_handler]
+    assert second.handlers == [pipeline.queue_handler]
+
+
+def test_records_reach_stdout_through_listener(pipeline, capsys):
+    log = pipeline.CustomLogger("submissions.test.stream")
+    log.warning("through the queue %s", 42)
+    pipeline.stop_logging()
+    assert "through the queue 42" in capsys.readouterr().out
+
+
+def test_file_batch_is_written_on_stop(pipeline, tmp_path):
+    pipeline.start_logging(file_logging=True, logdir=tmp_path)
+    log = pipeline.CustomLogger("submissions.test.file", level=DEBUG)
+    log.info("buffered")
+    pipeline.stop_logging()
+    assert "buffered" in tmp_path.joinpath("submissions.log").read_text()
+
+
+def test_warnings_flush_immediately(pipeline, tmp_path):
+    listener = pipeline.start_logging(file_logging=True, logdir=tmp_path)
+    batched = next(handler for handler in listener.handlers if handler.name == "File")
+    batched.handle(_record(INFO, "held"))
+    assert batched.buffer
+    batched.handle(_record(WARNING, "urgent"))
+    assert not batched.buffer
+    text = tmp_path.joinpath("submissions.log").read_text()
+    assert "held" in text and "urgent" in text
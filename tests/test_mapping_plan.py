@@ -0,0 +1,81 @@
+"""
+``SqlMappingPlan``: per-Pyd-class reflection, compiled once.
+
+``to_sql`` and ``prevalidate`` used to call ``inspect.signature``, ``dir(self)`` and
+``sqlalchemy.inspect`` on every instance, which dominated the cost of validating and
+persisting a large submission. Those answers now live on a plan compiled per class.
+
+The plan has to give *exactly* the answers the per-instance reflection gave, so the
+first test recomputes them the old way for one row of every model and compares.
+"""
+from __future__ import annotations
+
+from inspect import signature
+
+from sqlalchemy import inspect as sql_inspect
+
+
+def _pyd_instances(graph):
+    from backend.validators.pydant import PydBaseClass
+
+    for pyd_class in list(PydBaseClass.subclasses):
+        try:
+            sql_class = pyd_class._sql_class
+        except AttributeError:
+            continue
+        if not hasattr(sql_class, "__table__"):
+            continue
+        for row in graph["session"].query(sql_class).limit(1).all():
+            try:
+                yield row.to_pydantic()
+            except Exception:
+                continue
+
+
+def test_plan_matches_per_instance_reflection(graph):
+    mismatches = []
+    for pyd in _pyd_instances(graph):
+        cls = type(pyd)
+        plan = cls._mapping_plan
+        lookup = {name for name in signature(cls._sql_class.query).parameters
+                  if not name.startswith("_") and name not in ("limit", "kwargs")
+                  and name in dir(pyd)}
+        mapper = sql_inspect(cls._sql_class)
+        sql_fields = ({attr.key for attr in mapper.column_attrs}
+                      | {rel.key for rel in mapper.relationships})
+        composite = len(cls._sql_class.__table__.primary_key.columns) > 1
+        if (not plan.complete or set(plan.lookup_names) != lookup
+                or plan.sql_field_names != sql_fields or plan.composite_key != composite):
+            mismatches.append(cls.__name__)
+    assert not mismatches, f"plans disagree with reflection: {mismatches}"
+
+
+def test_complete_plan_is_reused(graph):
+    from backend.validators.pydant import PydSample
+
+    graph["samples"][0].to_pydantic()
+    plan = PydSample._mapping_plan
+    assert plan.complete
+    assert PydSample._mapping_plan is plan
+
+
+def test_plan_without_sql_class_is_reused(db):
+    from sqlalchemy.orm import configure_mappers
+    from backend.validators.pydant import PydAbstract
+
+    configure_mappers()
+    plan = PydAbstract._mapping_plan
+    assert plan.complete and not plan.sql_field_names
+    assert PydAbstract._mapping_plan is plan
+
+
+def test_relationship_fields_resolve_forward_references(db):
+    """
+    ``PydProcedure`` refers to models defined after it, so pydantic can't see its
+    ``RelationshipField`` markers when the class is created. The plan must not
+    freeze that half-built view.
+    """
+    from backend.validators.pydant import PydProcedure
+
+    PydProcedure.model_rebuild()
+    assert {"run", "sample", "reagentlot", "equipment"} <= set(PydProcedure._relationship_fields)
@@ -0,0 +1,105 @@
+"""
+``OptionCatalog``: the procedure form's dropdown choices, fetched on demand.
+
+The form used to expand the procedure type's whole reagent/equipment/process tree
+before it opened. It now renders role names only; each dropdown asks the catalog for
+its choices when opened, and the catalog keeps them for the rest of the form session.
+"""
+from __future__ import annotations
+
+import re
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture()
+def counted(db):
+    import tools
+    from tools import instrument_engine, reset_performance_summary
+
+    instrument_engine(tools.ctx.database.engine)
+    reset_performance_summary()
+    yield
+    reset_performance_summary()
+
+
+def _expected_lots(role, proceduretype):
+    return [lot.name for reagent in role.get_reagents(proceduretype=proceduretype)
+            for lot in reagent.reagentlot if lot.active]
+
+
+def test_reagentlots_match_the_role(graph):
+    from backend.db.models import OptionCatalog, ProcedureType
+
+    for proceduretype in ProcedureType.query():
+        catalog = OptionCatalog(proceduretype=proceduretype)
+        for role in graph["reagent_roles"].values():
+            assert catalog.reagentlot_names(role.name) == _expected_lots(role, proceduretype)
+
+
+def test_equipment_chain(graph):
+    from backend.db.models import OptionCatalog
+
+    catalog = OptionCatalog()
+    role = next(role for role in graph["equipment_roles"].values() if role.equipment)
+    equipment = catalog.equipment_names(role.name)
+    assert equipment == [item.name for item in role.equipment]
+    versions = [name for item in equipment for name in catalog.processversion_names(role.name, item)]
+    assert all(isinstance(name, str) for name in versions)
+    for version in versions:
+        assert all(isinstance(name, str) for name in catalog.tipslot_names(version))
+
+
+def test_lists_are_cached_per_catalog(graph, counted):
+    from backend.db.models import OptionCatalog, ProcedureType
+    from tools import track_action
+
+    proceduretype = ProcedureType.query()[0]
+    role = next(iter(graph["reagent_roles"].values())).name
+    catalog = OptionCatalog(proceduretype=proceduretype)
+    with track_action("first open") as first:
+        names = catalog.reagentlot_names(role)
+    with track_action("reopen") as again:
+        assert catalog.reagentlot_names(role) == names
+    assert first.statements > 0
+    assert again.statements == 0
+    catalog.invalidate("reagentlot", role)
+    with track_action("after invalidate") as refreshed:
+        catalog.reagentlot_names(role)
+    assert refreshed.statements > 0
+
+
+def test_unknown_role_is_empty(graph):
+    from backend.db.models import OptionCatalog
+
+    catalog = OptionCatalog()
+    assert catalog.reagentlot_names("No Such Role") == []
+    assert catalog.equipment_names("No Such Role") == []
+    assert catalog.processversion_names("No Such Role", "Nothing") == []
+
+
+def test_form_data_has_role_names_only(graph):
+    run = next(run for run in graph["runs"] if run.allowed_procedures)
+    proceduretype = run.allowed_procedures[0]
+    procedure = proceduretype.construct_dummy_procedure(run=run)
+    form = procedure.reorder_proceduretype_by_procedure()
+    assert all(isinstance(name, str) for name in form["reagentrole"] + form["equipmentrole"])
+    assert {"previous", "platemap"} <= set(form)
+
+
+def test_procedure_form_lists_equipment_roles(graph):
+    from tools import render_details_template
+
+    procedure = next(procedure for run in graph["runs"] for procedure in run.procedure
+                     if procedure.proceduretype.equipmentrole)
+    pyd = procedure.to_pydantic()
+    proceduretype = pyd.reorder_proceduretype_by_procedure()
+    html = render_details_template(template="procedure_creation", js_in=["procedure_form", "grid_drag", "context_menu"],
+                                   proceduretype=proceduretype, run=pyd.run.improved_dict, procedure=pyd,
+                                   platemap=proceduretype['platemap'], now=datetime.now(), preprocessing_buttons=[],
+                                   edit=False)
+    line = next(line for line in html.splitlines() if "window.equipment_json" in line)
+    assert "Undefined" not in line
+    names = re.findall(r"""['"]([^'"]+)['"]""", line.split("=", 1)[1])
+    assert names == [role.name for role in procedure.proceduretype.equipmentrole]
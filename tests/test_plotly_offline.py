@@ -0,0 +1,60 @@
+"""
+Offline plotly.
+
+Charts used to pull plotly.js from the CDN on every render. The bundled copy is now
+written once next to the config, figures point at it, and the chart panes load a
+single page that redraws with ``Plotly.react`` when a new figure's json arrives.
+"""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+
+@pytest.fixture()
+def figure():
+    from pandas import DataFrame
+    from frontend.visualizations import CustomFigure
+
+    df = DataFrame({"submitted_date": ["2026-01-05", "2026-01-12"], "count": [1, 2]})
+    fig = CustomFigure(df=df, settings={})
+    fig.add_bar(x=["a", "b"], y=[1, 2])
+    return fig
+
+
+def test_bundle_is_written_once(tmp_path):
+    from frontend.visualizations import plotly_bundle
+
+    bundle = plotly_bundle(tmp_path)
+    assert bundle.exists() and bundle.parent == tmp_path
+    stamp = bundle.stat().st_mtime_ns
+    assert plotly_bundle(tmp_path) == bundle
+    assert bundle.stat().st_mtime_ns == stamp
+    assert not list(tmp_path.glob("*.partial"))
+
+
+def test_figure_html_uses_local_bundle(figure):
+    from frontend.visualizations import plotly_bundle
+
+    html = figure.html
+    assert "cdn.plot.ly" not in html
+    assert plotly_bundle().as_uri() in html
+    # NOTE: The library itself is not inlined.
+    assert len(html) < len(plotly_bundle().read_text(encoding="utf-8"))
+
+
+def test_chart_page_redraws_in_place(tmp_path):
+    from frontend.visualizations import chart_page_html, plotly_bundle
+
+    page = chart_page_html(tmp_path)
+    assert plotly_bundle(tmp_path).as_uri() in page
+    assert "Plotly.react" in page
+    assert "QWebChannel" in page
+
+
+def test_json_round_trips(figure):
+    payload = json.loads(figure.json)
+    assert payload["data"][0]["type"] == "bar"
+    assert payload["data"][0]["y"] == [1, 2]
+    assert "layout" in payload
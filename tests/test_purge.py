@@ -0,0 +1,120 @@
+"""
+``purge``: removing a submission or run tree with bulk statements.
+
+``ClientSubmission.delete``/``Run.delete`` used to let the ORM load every association,
+procedure and result and delete them one at a time. The tree is now removed with a
+few DELETEs, leaving the rest to the ON DELETE CASCADE foreign keys, and can be copied
+to an archive database first.
+"""
+from __future__ import annotations
+
+import pytest
+
+
+def _count(session, plan, roots=None):
+    from sqlalchemy import func, select
+    from backend.db.purge import row_filter
+
+    counts = {}
+    for table in plan:
+        query = select(func.count()).select_from(table)
+        if roots is not None:
+            query = query.where(row_filter(table, plan, roots))
+        counts[table.name] = session.execute(query).scalar()
+    return counts
+
+
+@pytest.fixture()
+def counted(db):
+    import tools
+    from tools import instrument_engine, reset_performance_summary
+
+    instrument_engine(tools.ctx.database.engine)
+    reset_performance_summary()
+    yield
+    reset_performance_summary()
+
+
+def test_plan_covers_the_tree(db):
+    from backend.db.purge import cascade_plan
+    from backend.db.models import ClientSubmission
+
+    plan = [table.name for table in cascade_plan(ClientSubmission.__table__)]
+    assert plan[0] == "_clientsubmission"
+    assert {"_run", "_procedure", "_proceduresampleassociation", "_procedureequipmenttipslotassociation",
+            "_results", "_resultsvalue"} <= set(plan)
+    # NOTE: Parents before children.
+    assert plan.index("_run") < plan.index("_procedure") < plan.index("_results") < plan.index("_resultsvalue")
+
+
+def test_purge_removes_only_the_tree(graph, counted):
+    from backend.db.purge import cascade_plan, purge
+    from backend.db.models import ClientSubmission
+    from tools import track_action
+
+    session = graph["session"]
+    plan = cascade_plan(ClientSubmission.__table__)
+    submission, *others = graph["submissions"]
+    before = _count(session, plan)
+    tree = _count(session, plan, ClientSubmission.id.in_([submission.id]))
+    assert tree["_results"] and tree["_procedureequipmenttipslotassociation"]
+    with track_action("purge") as stats:
+        purge([submission])
+    assert stats.statements <= 12
+    assert submission not in session
+    assert _count(session, plan) == {name: count - tree[name] for name, count in before.items()}
+    assert all(other.run for other in others)
+
+
+def test_purge_archives_first(graph, tmp_path):
+    from sqlalchemy import create_engine, func, select
+    from backend.db.purge import archive_engine, cascade_plan, purge
+    from backend.db.models import ClientSubmission
+
+    session = graph["session"]
+    plan = cascade_plan(ClientSubmission.__table__)
+    submission = graph["submissions"][0]
+    tree = _count(session, plan, ClientSubmission.id.in_([submission.id]))
+    archive = tmp_path.joinpath("archive.db")
+    assert purge([submission], archive=archive) == tree
+    engine = archive_engine(archive)
+    with engine.connect() as connection:
+        archived = {table.name: connection.execute(select(func.count()).select_from(table)).scalar()
+                    for table in plan}
+    engine.dispose()
+    assert archived == tree
+    assert session.get(ClientSubmission, submission.id) is None
+
+
+def test_repeats_of_purged_procedures_are_kept(graph):
+    from backend.db.purge import purge
+    from backend.db.models import Procedure
+
+    session = graph["session"]
+    run, other = graph["runs"][:2]
+    original = run.procedure[0]
+    repeat = other.procedure[0]
+    repeat.repeat_of_id = original.id
+    session.commit()
+    purge([run])
+    session.expire_all()
+    assert session.get(Procedure, repeat.id).repeat_of_id is None
+
+
+def test_purge_without_foreign_keys(graph):
+    from sqlalchemy import text
+    from backend.db.purge import cascade_plan, purge
+    from backend.db.models import Run
+
+    session = graph["session"]
+    plan = cascade_plan(Run.__table__)
+    run = graph["runs"][0]
+    before = _count(session, plan)
+    tree = _count(session, plan, Run.id.in_([run.id]))
+    session.commit()
+    session.execute(text("PRAGMA foreign_keys=OFF"))
+    try:
+        purge([run])
+    finally:
+        session.execute(text("PRAGMA foreign_keys=ON"))
+    assert _count(session, plan) == {name: count - tree[name] for name, count in before.items()}
@@ -0,0 +1,154 @@
+"""
+``ReferenceMixin``: read-mostly lookup tables served from a per-session index.
+
+Submission types, procedure types, roles and labs were re-queried by every form widget
+and every ``RSLNamer``, and ``SubmissionType.regexes`` recompiled a combined pattern from
+all rows on each access. Those tables are now loaded once per session and kept until a
+transaction that wrote to them ends, or until ``refresh()`` is called.
+
+The tests count SQL statements on the engine, since "zero queries once warm" is the
+whole point of the cache.
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+
+@contextmanager
+def count_statements(session):
+    statements = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+
+@pytest.fixture()
+def warm(graph):
+    from backend.db.models import ReferenceMixin
+
+    ReferenceMixin.refresh()
+    return graph
+
+
+def test_warm_lookups_issue_no_sql(warm):
+    from backend.db.models import SubmissionType, ClientLab
+
+    name = warm["submissiontypes"]["Bacterial Culture"].name
+    lab = warm["labs"][0].name
+    SubmissionType.cached(name=name)
+    ClientLab.cached(name=lab)
+    with count_statements(warm["session"]) as statements:
+        SubmissionType.cached(name=name)
+        SubmissionType.cached(name={"value": name, "missing": False})
+        ClientLab.cached(name=lab)
+        ClientLab.reference_index().names
+        SubmissionType.regexes
+    assert statements == []
+
+
+def test_cached_rows_are_session_identities(warm):
+    from backend.db.models import SubmissionType
+
+    submissiontype = warm["submissiontypes"]["Bacterial Culture"]
+    assert SubmissionType.cached(name=submissiontype.name) is submissiontype
+    assert SubmissionType.cached(id=submissiontype.id) is submissiontype
+
+
+def test_miss_falls_back_on_query(warm):
+    from backend.db.models import ClientLab
+
+    lab = warm["labs"][0]
+    assert ClientLab.cached(name=lab.name[:3]) is not None
+
+
+def test_commit_to_reference_table_invalidates(warm):
+    from backend.db.models import ReagentRole
+
+    before = ReagentRole.reference_index()
+    role = ReagentRole(name="Brand New Role")
+    warm["session"].add(role)
+    warm["session"].commit()
+    after = ReagentRole.reference_index()
+    assert after is not before
+    assert after.by_name["Brand New Role"] is role
+
+
+def test_rollback_invalidates(warm):
+    from backend.db.models import ReagentRole
+
+    warm["session"].add(ReagentRole(name="Never Committed"))
+    warm["session"].flush()
+    assert "Never Committed" in ReagentRole.reference_index().by_name
+    warm["session"].rollback()
+    assert "Never Committed" not in ReagentRole.reference_index().by_name
+
+
+def test_commit_to_other_table_keeps_index(warm):
+    from backend.db.models import SubmissionType
+
+    before = SubmissionType.reference_index()
+    sample = warm["samples"][0]
+    sample.sample_id = f"{sample.sample_id}-x"
+    warm["session"].commit()
+    assert SubmissionType.reference_index() is before
+
+
+def test_refresh_drops_index(warm):
+    from backend.db.models import ReferenceMixin, SubmissionType, ReagentRole
+
+    submissiontypes = SubmissionType.reference_index()
+    reagentroles = ReagentRole.reference_index()
+    SubmissionType.refresh()
+    assert SubmissionType.reference_index() is not submissiontypes
+    assert ReagentRole.reference_index() is reagentroles
+    ReferenceMixin.refresh()
+    assert ReagentRole.reference_index() is not reagentroles
+
+
+def test_building_the_index_does_not_flush(warm):
+    from backend.db.models import ReagentRole
+
+    session = warm["session"]
+    pending = ReagentRole(name="Pending Role")
+    session.add(pending)
+    ReagentRole.refresh()
+    assert "Pending Role" not in ReagentRole.reference_index().names
+    assert pending in session.new
+    session.expunge(pending)
+
+
+def test_index_follows_the_read_only_session(warm):
+    import tools
+    from sqlalchemy.orm import scoped_session, sessionmaker
+    from backend.db.models import SubmissionType, read_only_session
+
+    read_session = scoped_session(sessionmaker(bind=warm["session"].get_bind(), autoflush=False))
+    tools.ctx.database.read_session = read_session
+    try:
+        main = SubmissionType.reference_index()
+        with read_only_session():
+            index = SubmissionType.reference_index()
+        assert index is not main
+        assert read_session.info["reference_indexes"][SubmissionType] is index
+        SubmissionType.refresh()
+        assert SubmissionType not in read_session.info["reference_indexes"]
+    finally:
+        read_session.remove()
+
+
+def test_regexes_are_precompiled(warm):
+    from backend.db.models import SubmissionType
+
+    assert SubmissionType.regexes is SubmissionType.regexes
+    submissiontype = warm["submissiontypes"]["Wastewater"]
+    assert SubmissionType.get_regex(submissiontype.name) is SubmissionType.get_regex(submissiontype.name)
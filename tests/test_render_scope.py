@@ -0,0 +1,49 @@
+"""
+``render_scope``: each row is serialized once per detail page.
+
+Run and submission pages expand procedures, samples, reagents and results, and the
+same sample or reagent lot turns up under many procedures. ``to_pydantic``,
+``details_dict`` and ``improved_dict_expand_fields`` used to rebuild it every time;
+inside a render scope they hand back what was built for that row the first time.
+"""
+from __future__ import annotations
+
+
+def test_rows_are_converted_once_inside_a_scope(graph):
+    from backend.db.models import render_scope
+
+    sample = graph["samples"][0]
+    assert sample.to_pydantic() is not sample.to_pydantic()
+    with render_scope():
+        pyd = sample.to_pydantic()
+        assert sample.to_pydantic() is pyd
+        with render_scope():
+            assert sample.to_pydantic() is pyd
+        details = sample.details_dict
+        details["changed"] = True
+        assert "changed" not in sample.details_dict
+    assert sample.to_pydantic() is not pyd
+
+
+def test_arguments_are_part_of_the_key(graph):
+    from backend.db.models import render_scope
+
+    pyd = graph["runs"][0].to_pydantic()
+    with render_scope():
+        flat = pyd.improved_dict_expand_fields(fields=["sample"])
+        assert pyd.improved_dict_expand_fields(fields=["sample"]) == flat
+        nested = pyd.improved_dict_expand_fields(fields=[{"procedure": ["sample"]}], include_procedures=True)
+        assert "procedure" in nested
+
+
+def test_submission_page_builds_each_row_once(graph):
+    from backend.db.models import Results, Sample
+    from backend.validators.pydant import PydBaseClass
+
+    submission = graph["submissions"][0].to_pydantic()
+    PydBaseClass.improved_dict_stats(reset=True)
+    assert submission.to_html().strip()
+    stats = PydBaseClass.improved_dict_stats(reset=True)
+    session = graph["session"]
+    assert stats["PydSample"]["misses"] <= session.query(Sample).count()
+    assert stats["PydResults"]["misses"] <= session.query(Results).count()
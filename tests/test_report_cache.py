@@ -0,0 +1,159 @@
+"""
+``RecordCache``: chart records reused across date-range changes.
+
+The turnaround, PCR and concentration charts rebuild on every date edit. Their makers
+now keep per-submission records keyed by (maker, filters) along with the days those
+records cover, so a repeat or narrower range is answered from memory and a wider one
+only queries the days it adds. A commit clears everything, and records older than
+``report_cache_seconds`` are queried again so other users' changes show up.
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+
+import pytest
+
+
+@pytest.fixture()
+def span(graph):
+    from backend.excel.reports import report_cache
+
+    report_cache.clear()
+    dates = [s.submitted_date.date() for s in graph["submissions"] if s.submitted_date]
+    return min(dates), max(dates)
+
+
+@pytest.fixture()
+def built(monkeypatch):
+    """Record the day ranges the makers actually query."""
+    from backend.excel.reports import TurnaroundMaker
+
+    ranges = []
+    original = TurnaroundMaker.query_records.__func__
+
+    def _query_records(cls, start_date, end_date, submission_types):
+        ranges.append((start_date, end_date))
+        return original(cls, start_date, end_date, submission_types)
+
+    monkeypatch.setattr(TurnaroundMaker, "query_records", classmethod(_query_records))
+    return ranges
+
+
+def test_repeat_range_is_served_from_cache(span, built):
+    from backend.excel.reports import TurnaroundMaker
+
+    start, end = span
+    first = TurnaroundMaker(start_date=start, end_date=end, submission_types=None)
+    second = TurnaroundMaker(start_date=start, end_date=end, submission_types=None)
+    assert built == [(start, end)]
+    assert second.df.equals(first.df)
+
+
+def test_narrower_range_filters_cached_records(span, built):
+    from backend.excel.reports import TurnaroundMaker, report_cache
+
+    start, end = span
+    middle = start + (end - start) / 2
+    TurnaroundMaker(start_date=start, end_date=end, submission_types=None)
+    narrow = TurnaroundMaker(start_date=start, end_date=middle, submission_types=None)
+    assert len(built) == 1
+    report_cache.clear()
+    fresh = TurnaroundMaker(start_date=start, end_date=middle, submission_types=None)
+    assert len(narrow.df) == len(fresh.df)
+
+
+def test_extended_range_queries_only_the_delta(span, built):
+    from backend.excel.reports import TurnaroundMaker, report_cache
+
+    start, end = span
+    middle = start + (end - start) / 2
+    TurnaroundMaker(start_date=middle, end_date=end, submission_types=None)
+    extended = TurnaroundMaker(start_date=start, end_date=end, submission_types=None)
+    assert built == [(middle, end), (start, middle - timedelta(days=1))]
+    report_cache.clear()
+    assert len(extended.df) == len(TurnaroundMaker(start_date=start, end_date=end, submission_types=None).df)
+
+
+def test_filters_are_part_of_the_key(span, built):
+    from backend.excel.reports import TurnaroundMaker
+
+    start, end = span
+    TurnaroundMaker(start_date=start, end_date=end, submission_types=None)
+    TurnaroundMaker(start_date=start, end_date=end, submission_types="Bacterial Culture")
+    assert len(built) == 2
+
+
+def test_commit_clears_cache(graph, span, built):
+    from backend.excel.reports import TurnaroundMaker
+
+    start, end = span
+    TurnaroundMaker(start_date=start, end_date=end, submission_types=None)
+    submission = graph["submissions"][0]
+    submission.submitter_plate_id = f"{submission.submitter_plate_id}-x"
+    graph["session"].commit()
+    report = TurnaroundMaker(start_date=start, end_date=end, submission_types=None)
+    assert len(built) == 2
+    assert f"{submission.submitter_plate_id}" in set(report.df["name"])
+
+
+def test_results_makers_share_the_cache(span):
+    from backend.excel.reports import PCRMaker, report_cache
+
+    start, end = span
+    include = ["Positive", "Negative", "Samples"]
+    first = PCRMaker(start_date=start, end_date=end, submission_types=None, include=include)
+    assert len(report_cache.entries) == 1
+    second = PCRMaker(start_date=start, end_date=end, submission_types=None, include=list(reversed(include)))
+    assert len(report_cache.entries) == 1
+    assert len(second.df) == len(first.df)
+
+
+def test_records_expire(span, built, monkeypatch):
+    from backend.excel import reports
+    from backend.excel.reports import TurnaroundMaker
+
+    start, end = span
+    now = [1000.0]
+    monkeypatch.setattr(reports, "monotonic", lambda: now[0])
+    monkeypatch.setattr(reports.report_cache, "max_age", 60)
+    TurnaroundMaker(start_date=start, end_date=end, submission_types=None)
+    now[0] += 59
+    TurnaroundMaker(start_date=start, end_date=end, submission_types=None)
+    assert len(built) == 1
+    now[0] += 2
+    TurnaroundMaker(start_date=start, end_date=end, submission_types=None)
+    assert built == [(start, end), (start, end)]
+
+
+def test_purge_clears_cache(graph, span, built):
+    from backend.db.purge import purge
+    from backend.excel.reports import TurnaroundMaker
+
+    start, end = span
+    TurnaroundMaker(start_date=start, end_date=end, submission_types=None)
+    submission = graph["submissions"][0]
+    name = str(submission.submitter_plate_id)
+    purge([submission])
+    report = TurnaroundMaker(start_date=start, end_date=end, submission_types=None)
+    assert len(built) == 2
+    assert name not in set(report.df["name"])
+
+
+@pytest.mark.parametrize("kind", ["submissions", "runs"])
+def test_delete_clears_cache(graph, span, built, monkeypatch, kind):
+    pytest.importorskip("PyQt6.QtWebEngineWidgets", reason="PyQt6-WebEngine is required by the pop ups",
+                        exc_type=ImportError)
+    from frontend.widgets.pop_ups import QuestionAsker
+    from backend.excel.reports import TurnaroundMaker
+
+    monkeypatch.setattr(QuestionAsker, "exec", lambda self: True)
+    start, end = span
+    TurnaroundMaker(start_date=start, end_date=end, submission_types=None)
+    record = graph[kind][0]
+    submission = record if kind == "submissions" else record.clientsubmission
+    name = str(submission.submitter_plate_id)
+    record.delete()
+    report = TurnaroundMaker(start_date=start, end_date=end, submission_types=None)
+    assert len(built) == 2
+    if kind == "submissions":
+        assert name not in set(report.df["name"])
@@ -56,7 +56,74 @@ def test_report_maker_filters_by_organization(graph, span):
 
     assert len(filtered.procedures) <= len(everything.procedures)
     for procedure in filtered.procedures:
-        assert procedure.run.clientsubmission.clientlab.name == lab_name
+        assert procedure["clientlab"] == lab_name
+
+
+def _orm_objects(value):
+    """Every ORM object reachable from value through containers and DataFrame cells."""
+    from pandas import DataFrame
+
+    from backend.db.models import BaseClass
+
+    match value:
+        case BaseClass():
+            yield value
+        case DataFrame():
+            for cell in value.to_numpy().ravel():
+                yield from _orm_objects(cell)
+        case dict():
+            for item in value.values():
+                yield from _orm_objects(item)
+        case list() | tuple() | set():
+            for item in value:
+                yield from _orm_objects(item)
+
+
+@pytest.mark.parametrize("maker_name", ["ReportMaker", "TurnaroundMaker", "PCRMaker"])
+def test_makers_hold_only_plain_data(graph, span, maker_name):
+    """
+    The makers run on worker threads and are handed to the main thread, so nothing they
+    keep may be an ORM object (see frontend.widgets.task_runner.Task, rule 2).
+    """
+    import backend.excel.reports as reports
+
+    start, end = span
+    kwargs = dict(start_date=start, end_date=end)
+    if maker_name != "ReportMaker":
+        kwargs['submission_types'] = None
+    report = getattr(reports, maker_name)(**kwargs)
+    assert not list(_orm_objects(vars(report)))
+
+
+def test_makers_report_progress_and_stop_when_cancelled(graph, span):
+    """Inside a task, the makers' loops report progress and are cancellation points."""
+    from backend.excel.reports import ReportMaker
+    from tools import TaskCancelled, current_task
+
+    class FakeTask:
+        name = "fake"
+        cancelled = False
+
+        def __init__(self):
+            self.progress = []
+
+        def report_progress(self, value, message=""):
+            # NOTE: As Task.report_progress.
+            if self.cancelled:
+                raise TaskCancelled(self.name)
+            self.progress.append(value)
+
+    start, end = span
+    task = FakeTask()
+    token = current_task.set(task)
+    try:
+        ReportMaker(start_date=start, end_date=end)
+        assert task.progress and task.progress[0] == 0
+        task.cancelled = True
+        with pytest.raises(TaskCancelled):
+            ReportMaker(start_date=start, end_date=end)
+    finally:
+        current_task.reset(token)
 
 
 def test_turnaround_maker_builds(graph, span):
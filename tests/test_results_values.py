@@ -0,0 +1,138 @@
+"""
+``ResultsValue``: the flattened copy of ``Results._result``.
+
+Every value in a results payload gets a row (path, key, number, value) written in the
+same flush as the payload, so the PCR and concentration reports fetch what they need
+with one query instead of walking each JSON blob.
+"""
+from __future__ import annotations
+
+import pytest
+
+
+PCR = {"Plate 1": {"N1": {"cq": "31.25", "well_position": "A1"},
+                   "RP": {"cq": "Undetermined", "well_position": "A1"},
+                   "operator": "lwark"},
+       "instrument": "QS7"}
+
+
+@pytest.fixture()
+def association(graph):
+    from backend.excel.reports import report_cache
+
+    report_cache.clear()
+    run = next(run for run in graph["runs"] if run.completed_date is not None
+               and any(procedure.proceduresampleassociation for procedure in run.procedure))
+    procedure = next(procedure for procedure in run.procedure if procedure.proceduresampleassociation)
+    return procedure.proceduresampleassociation[0]
+
+
+@pytest.fixture()
+def pcr_result(graph, association):
+    from backend.db.models import Results
+
+    result = Results(procedure=association.procedure, sampleprocedureassociation=association,
+                     resultstype=graph["resultstypes"]["Diomni PCR"], result=PCR)
+    graph["session"].add(result)
+    graph["session"].commit()
+    return result
+
+
+def _rows(session, result):
+    from backend.db.models import ResultsValue
+
+    return session.query(ResultsValue).filter(ResultsValue.results_id == result.id).order_by(ResultsValue.position).all()
+
+
+def test_flatten():
+    from backend.db.models import ResultsValue
+
+    rows = list(ResultsValue.flatten(PCR))
+    assert [(ResultsValue.split_path(row["path"]), row["key"]) for row in rows] == [
+        (("Plate 1", "N1"), "cq"), (("Plate 1", "N1"), "well_position"),
+        (("Plate 1", "RP"), "cq"), (("Plate 1", "RP"), "well_position"), (("Plate 1",), "operator"), ((), "instrument")]
+    assert [row["number"] for row in rows if row["key"] == "cq"] == [31.25, None]
+    assert [row["position"] for row in rows] == list(range(6))
+
+
+def test_keys_holding_the_separator_dont_collide():
+    from backend.db.models import ResultsValue
+
+    rows = list(ResultsValue.flatten({"P": {"A-B": {"C": {"cq": 1}}, "A": {"B-C": {"cq": 2}}}}))
+    assert len({row["path"] for row in rows}) == 2
+
+
+def test_values_are_written_on_save(graph, pcr_result):
+    from backend.db.models import ResultsValue
+
+    rows = _rows(graph["session"], pcr_result)
+    assert [(ResultsValue.split_path(row.path), row.depth, row.key, row.value) for row in rows][:2] == [
+        (("Plate 1", "N1"), 2, "cq", "31.25"), (("Plate 1", "N1"), 2, "well_position", "A1")]
+
+
+def test_values_follow_payload_changes(graph, pcr_result):
+    pcr_result.result = {"original_sample_conc.": "12.5"}
+    graph["session"].commit()
+    rows = _rows(graph["session"], pcr_result)
+    assert [(row.key, row.number) for row in rows] == [("original_sample_conc.", 12.5)]
+
+
+def test_values_go_with_their_results(graph, pcr_result):
+    from backend.db.models import ResultsValue
+
+    results_id = pcr_result.id
+    graph["session"].delete(pcr_result)
+    graph["session"].commit()
+    assert not graph["session"].query(ResultsValue).filter(ResultsValue.results_id == results_id).count()
+
+
+def test_pcr_records(graph, association, pcr_result):
+    from backend.excel.reports import PCRMaker
+
+    submitted = association.procedure.run.clientsubmission.submitted_date
+    report = PCRMaker(start_date=submitted.date(), end_date=submitted.date(), submission_types=None,
+                      include=["Positive", "Negative", "Samples"])
+    rows = report.df[report.df["sample_id"] == association.sample.sample_id]
+    assert list(rows["path"]) == ["Plate 1-N1", "Plate 1-RP"]
+    assert list(rows["cq"]) == [31.25, -1.0]
+    assert set(rows["instrument"]) == {"QS7"}
+    # NOTE: Only dicts holding a cq become records.
+    assert "operator" not in rows
+    assert set(rows["procedure"]) == {association.procedure.name}
+
+
+def test_pcr_records_come_from_the_first_branch_with_a_cq(graph, association, pcr_result):
+    from backend.excel.reports import PCRMaker
+
+    pcr_result.result = {"instrument": "QS7", "Plate 1": {"N-1": {"cq": "30"}, "N": {"1": {"cq": "31"}}},
+                         "Plate 2": {"N1": {"cq": "32"}}}
+    graph["session"].commit()
+    submitted = association.procedure.run.clientsubmission.submitted_date
+    report = PCRMaker(start_date=submitted.date(), end_date=submitted.date(), submission_types=None,
+                      include=["Positive", "Negative", "Samples"])
+    rows = report.df[report.df["sample_id"] == association.sample.sample_id]
+    assert list(rows["cq"]) == [30.0, 31.0]
+
+
+def test_concentration_records(graph, association, pcr_result):
+    from backend.excel.reports import ConcentrationMaker
+
+    pcr_result.result = {"original_sample_conc.": "12.5", "units": "ng/uL"}
+    graph["session"].commit()
+    submitted = association.procedure.run.clientsubmission.submitted_date
+    report = ConcentrationMaker(start_date=submitted.date(), end_date=submitted.date(), submission_types=None,
+                                include=["Positive", "Negative", "Samples"])
+    rows = report.df[report.df["sample_id"] == association.sample.sample_id]
+    assert list(rows["original_sample_conc."]) == [12.5]
+    assert list(rows["units"]) == ["ng/uL"]
+
+
+def test_control_filter(graph, association, pcr_result):
+    from backend.excel.reports import PCRMaker
+
+    association.sample.is_control = 1
+    graph["session"].commit()
+    submitted = association.procedure.run.clientsubmission.submitted_date
+    report = PCRMaker(start_date=submitted.date(), end_date=submitted.date(), submission_types=None,
+                      include=["Samples"])
+    assert report.df.empty or association.sample.sample_id not in set(report.df["sample_id"])
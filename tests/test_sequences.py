@@ -0,0 +1,96 @@
+"""
+``IDSequence``: named counters for plate numbers.
+
+``RSLNamer.construct_new_plate_name`` used to load the day's runs to count them. It now
+takes the next value from a counter row, updated and returned in one statement inside
+the caller's transaction, so concurrent imports can't be handed the same number and a
+run that is never saved doesn't use one up.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+
+def test_next_value_counts_on_from_seed(db):
+    from backend.db.models import IDSequence
+
+    seeds = []
+
+    def _seed(connection):
+        seeds.append(True)
+        return 41
+
+    assert IDSequence.next_value("plates", seed=_seed) == 42
+    assert IDSequence.next_value("plates", seed=_seed) == 43
+    assert IDSequence.next_value("plates", increment=3) == 46
+    assert IDSequence.next_value("other") == 1
+    assert seeds == [True]
+
+
+def test_increment_must_be_positive(db):
+    from backend.db.models import IDSequence
+
+    with pytest.raises(ValueError):
+        IDSequence.next_value("plates", increment=0)
+
+
+def test_plate_numbers_carry_on_from_existing_runs(graph):
+    from backend.db.models import Run
+    from backend.validators import RSLNamer
+
+    graph["session"].add(Run(clientsubmission=graph["submissions"][0], rsl_plate_number="RSL-BC-20261018-4"))
+    graph["session"].commit()
+    data = dict(abbreviation="BC", submitted_date=date(2026, 10, 18))
+    assert RSLNamer.construct_new_plate_name(data=dict(data)) == "RSL-BC-20261018-5"
+    assert RSLNamer.construct_new_plate_name(data=dict(data)) == "RSL-BC-20261018-6"
+    assert RSLNamer.construct_new_plate_name(data=dict(data, submitted_date="2026-10-19")) == "RSL-BC-20261019-1"
+
+
+def test_proposed_plate_names_are_not_taken(graph):
+    from backend.validators import RSLNamer
+
+    data = dict(abbreviation="BC", submitted_date=date(2026, 10, 18))
+    assert RSLNamer.construct_new_plate_name(data=dict(data), allocate=False) == "RSL-BC-20261018-1"
+    assert RSLNamer.construct_new_plate_name(data=dict(data), allocate=False) == "RSL-BC-20261018-1"
+    assert RSLNamer.construct_new_plate_name(data=dict(data)) == "RSL-BC-20261018-1"
+    assert RSLNamer.construct_new_plate_name(data=dict(data), allocate=False) == "RSL-BC-20261018-2"
+
+
+def test_rolled_back_numbers_are_handed_out_again(graph):
+    from backend.db.models import IDSequence
+
+    session = graph["session"]
+    assert IDSequence.next_value("plates") == 1
+    session.commit()
+    assert IDSequence.next_value("plates") == 2
+    session.rollback()
+    assert IDSequence.next_value("plates") == 2
+
+
+def test_allocating_after_a_flush_does_not_lock(file_db):
+    from backend.db.models import ConfigItem, IDSequence
+
+    # NOTE: The flush holds the file's write lock, a second connection would wait on it.
+    file_db.add(ConfigItem(key="flushed", value="yes"))
+    file_db.flush()
+    assert IDSequence.next_value("plates") == 1
+    file_db.commit()
+    assert file_db.query(IDSequence).one().value == 1
+
+
+def test_concurrent_allocations_are_unique(tmp_path):
+    from sqlalchemy import create_engine
+    from backend.db.models import IDSequence
+
+    engine = create_engine(f"sqlite:///{tmp_path.joinpath('sequences.db')}",
+                           connect_args={"timeout": 30})
+    IDSequence.__table__.create(engine)
+    try:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            values = list(pool.map(lambda _: IDSequence.next_value("plates", engine=engine), range(100)))
+    finally:
+        engine.dispose()
+    assert sorted(values) == list(range(1, 101))
@@ -0,0 +1,92 @@
+"""
+``copy_xl_sheet``: copying a template sheet, styles included, into another workbook.
+
+Cells used to get a copy of every style object each; the copier now translates each
+distinct style once and only walks cells that exist, with merged ranges and row/column
+dimensions rebuilt on the target sheet.
+"""
+from __future__ import annotations
+
+from copy import copy
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell.cell import MergedCell
+from openpyxl.comments import Comment
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+
+
+def _template():
+    book = Workbook()
+    sheet = book.active
+    header = NamedStyle(name="template header", font=Font(bold=True, size=14))
+    book.add_named_style(header)
+    thin = Side(style="thin")
+    for row in range(1, 201):
+        for column in range(1, 13):
+            cell = sheet.cell(row=row, column=column, value=row * column)
+            cell.font = Font(name="Calibri", bold=column % 2 == 0, color="FF0000" if row % 3 else "0000FF")
+            cell.border = Border(left=thin, right=thin)
+            cell.fill = PatternFill("solid", fgColor="DDDDDD" if row % 2 else "FFFFFF")
+            cell.number_format = "0.000" if column == 3 else "#,##0.0"
+            cell.alignment = Alignment(horizontal="center")
+    sheet["A1"].style = "template header"
+    sheet["A1"].comment = Comment("from the template", "tester")
+    sheet.merge_cells("B2:D3")
+    sheet.row_dimensions[5].height = 40
+    sheet.column_dimensions["C"].width = 25
+    sheet.column_dimensions["E"].hidden = True
+    sheet.freeze_panes = "B2"
+    return book, sheet
+
+
+def _style(cell):
+    return (copy(cell.font), copy(cell.fill), copy(cell.border), cell.number_format, copy(cell.alignment))
+
+
+def test_copy_into_another_workbook(tmp_path):
+    from backend.excel import copy_xl_sheet
+
+    source_book, source = _template()
+    target_book = Workbook()
+    target = target_book.active
+    copy_xl_sheet(source, target)
+    path = tmp_path.joinpath("copy.xlsx")
+    target_book.save(path)
+    copied = load_workbook(path).active
+    for row in (1, 4, 77, 200):
+        for column in (1, 3, 8):
+            original, cell = source.cell(row=row, column=column), copied.cell(row=row, column=column)
+            assert cell.value == original.value
+            assert _style(cell) == _style(original)
+    assert copied["A1"].style == "template header"
+    assert copied["A1"].comment.text == "from the template"
+    assert [str(merged) for merged in copied.merged_cells.ranges] == ["B2:D3"]
+    assert copied.row_dimensions[5].height == 40
+    assert copied.column_dimensions["C"].width == 25
+    assert copied.column_dimensions["E"].hidden
+    assert copied.freeze_panes == "B2"
+
+
+def test_styles_are_shared_not_duplicated():
+    from backend.excel import StyleInterner, copy_cells
+
+    source_book, source = _template()
+    target_book = Workbook()
+    styles = StyleInterner(source_book, target_book)
+    copy_cells(source, target_book.active, styles=styles)
+    distinct = {tuple(cell._style) for cell in source._cells.values()
+                if cell.has_style and not isinstance(cell, MergedCell)}
+    assert len(styles.cache) == len(distinct)
+    assert len(target_book._fonts) <= len(source_book._fonts)
+    assert len(target_book._fills) <= len(source_book._fills)
+
+
+def test_copy_within_a_workbook():
+    from backend.excel import copy_xl_sheet
+
+    book, source = _template()
+    target = book.create_sheet("copy")
+    fonts = len(book._fonts)
+    copy_xl_sheet(source, target)
+    assert target["C7"].value == 21 and target["C7"].number_format == "0.000"
+    assert len(book._fonts) == fonts
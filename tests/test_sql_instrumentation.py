@@ -0,0 +1,122 @@
+"""
+Per-action SQL instrumentation.
+
+``instrument_engine`` hooks an engine's cursor events, and every statement run inside
+``track_action`` is charged to that action: count, database time and the slowest few.
+Statements over the configured threshold also go to the slow-query log. Each test
+uses its own in-memory engine so the counts are exact.
+"""
+from __future__ import annotations
+
+import logging
+
+import pytest
+from sqlalchemy import create_engine, text
+
+
+@pytest.fixture()
+def engine():
+    from tools import instrument_engine, reset_performance_summary
+
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    reset_performance_summary()
+    yield engine
+    reset_performance_summary()
+    engine.dispose()
+
+
+def test_statements_are_charged_to_action(engine):
+    from tools import track_action
+
+    with engine.connect() as connection:
+        with track_action("Open details") as stats:
+            for _ in range(3):
+                connection.execute(text("SELECT 1"))
+        connection.execute(text("SELECT 2"))
+    assert stats.statements == 3
+    assert stats.calls == 1
+    assert stats.db_time <= stats.wall_time
+    assert [statement for _, statement in stats.slowest] == ["SELECT 1"] * 3
+
+
+def test_nested_actions_fold_into_outermost(engine):
+    from tools import track_action, performance_summary
+
+    with engine.connect() as connection:
+        with track_action("Cost report") as outer:
+            connection.execute(text("SELECT 1"))
+            with track_action("inner") as inner:
+                connection.execute(text("SELECT 2"))
+    assert inner is outer
+    assert outer.statements == 2
+    assert [row['action'] for row in performance_summary()] == ["Cost report"]
+
+
+def test_nested_timer_has_its_own_stats(engine, caplog):
+    from tools import track_action, performance_summary, timer
+
+    @timer
+    def inner(connection):
+        connection.execute(text("SELECT 2"))
+
+    with engine.connect() as connection, caplog.at_level(logging.INFO, logger="submissions.tools"):
+        with track_action("Cost report") as outer:
+            connection.execute(text("SELECT 1"))
+            inner(connection)
+    assert outer.statements == 2
+    assert [row['action'] for row in performance_summary()] == ["Cost report"]
+    message, = [record.getMessage() for record in caplog.records if "inner()" in record.getMessage()]
+    assert "(1 statements," in message
+
+
+def test_summary_totals_across_calls(engine):
+    from tools import track_action, performance_summary
+
+    with engine.connect() as connection:
+        for _ in range(2):
+            with track_action("Load submissions"):
+                connection.execute(text("SELECT 1"))
+                connection.execute(text("SELECT 2"))
+    row, = performance_summary()
+    assert row['calls'] == 2
+    assert row['statements'] == 4
+    assert row['statements_per_call'] == 2
+
+
+def test_slowest_keeps_the_top_few():
+    from tools import ActionStats
+
+    stats = ActionStats("x", keep=2)
+    for seconds in (0.1, 0.5, 0.2, 0.4):
+        stats.add_statement(f"q{seconds}", seconds)
+    assert [item['statement'] for item in stats.to_dict()['slowest']] == ["q0.5", "q0.4"]
+    assert stats.statements == 4
+
+
+def test_slow_queries_are_logged(tmp_path):
+    from tools import instrument_engine, slow_query_logger, track_action
+
+    handler = logging.FileHandler(tmp_path.joinpath("slow.log"))
+    slow_query_logger.addHandler(handler)
+    engine = create_engine("sqlite://")
+    # NOTE: A threshold this low catches everything.
+    instrument_engine(engine, slow_query_ms=1e-6)
+    try:
+        with engine.connect() as connection, track_action("Import"):
+            connection.execute(text("SELECT 42"))
+    finally:
+        slow_query_logger.removeHandler(handler)
+        handler.close()
+        engine.dispose()
+    logged = tmp_path.joinpath("slow.log").read_text()
+    assert "[Import] SELECT 42" in logged
+
+
+def test_failed_statement_does_not_leak_start_time(engine):
+    from sqlalchemy.exc import OperationalError
+
+    with engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.execute(text("SELECT * FROM missing_table"))
+        assert not connection.info.get("query_start")
@@ -0,0 +1,75 @@
+"""
+Startup configuration: probing for ``_configitem`` and registering scripts.
+
+``Settings.set_from_db`` used to reflect the whole schema to see whether the config
+table existed, and ``set_scripts`` imported every module in the scripts folder. The
+table is now looked up with the dialect's own check, and scripts are registered by
+name from their source and imported the first time they run.
+"""
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+
+def test_table_exists(db):
+    import tools
+    from tools import table_exists
+
+    assert table_exists(tools.ctx.database.engine, "_configitem")
+    assert not table_exists(tools.ctx.database.engine, "_nosuchtable")
+
+
+@pytest.fixture()
+def scripts(tmp_path, monkeypatch):
+    folder = tmp_path.joinpath("scripts")
+    folder.mkdir()
+    folder.joinpath("startup_probe_mod.py").write_text(
+        "def hello(ctx):\n"
+        "    return f'hello {ctx}'\n"
+        "def _helper():\n"
+        "    pass\n"
+    )
+    folder.joinpath("teardown_probe_mod.py").write_text(
+        "raise ImportError('only importable where its driver is installed')\n"
+        "def goodbye(ctx):\n"
+        "    return 'bye'\n"
+    )
+    folder.joinpath("__init__.py").write_text("")
+    monkeypatch.syspath_prepend(str(folder))
+    yield folder
+    import sys
+    for name in ("startup_probe_mod", "teardown_probe_mod"):
+        sys.modules.pop(name, None)
+
+
+def _settings():
+    startup, teardown = dict(hello=None), dict(goodbye=None)
+    return SimpleNamespace(startup_scripts=startup, teardown_scripts=teardown,
+                           model_extra=dict(startup_scripts=startup, teardown_scripts=teardown))
+
+
+def test_scripts_register_without_importing(scripts):
+    import sys
+    from tools import LazyScript, Settings
+
+    settings = _settings()
+    Settings.set_scripts(settings, path=scripts)
+    hello, goodbye = settings.startup_scripts['hello'], settings.teardown_scripts['goodbye']
+    assert isinstance(hello, LazyScript) and hello.__name__ == "hello"
+    assert isinstance(goodbye, LazyScript) and goodbye.module == "teardown_probe_mod"
+    assert "startup_probe_mod" not in sys.modules
+    assert hello("ctx") == "hello ctx"
+    assert "startup_probe_mod" in sys.modules
+    assert hello.function is sys.modules["startup_probe_mod"].hello
+    # NOTE: A script whose module can't be imported fails when it runs, not at startup.
+    assert goodbye("ctx") is None
+
+
+def test_function_names_are_top_level_only(scripts):
+    from tools import LazyScript
+
+    assert LazyScript.function_names(scripts.joinpath("startup_probe_mod.py")) == ["hello", "_helper"]
+    scripts.joinpath("broken.py").write_text("def (:\n")
+    assert LazyScript.function_names(scripts.joinpath("broken.py")) == []
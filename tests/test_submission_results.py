@@ -0,0 +1,57 @@
+"""
+``ClientSubmission.query_procedure_sample_results``: results by sample kind in one statement.
+
+``get_procedure_sample_results`` used to walk run -> procedure -> association -> sample
+-> results through lazy relationships and filter controls in Python. It now asks one
+joined, filtered query, which also takes many submissions at once.
+"""
+from __future__ import annotations
+
+import pytest
+
+KINDS = [set(), {"samples"}, {"positive"}, {"negative"}, {"positive", "negative"},
+         {"positive", "negative", "samples"}]
+
+
+def _walked(clientsubmission, include):
+    # NOTE: The relationship walk this replaces.
+    flags = {1: "positive", 0: "samples", -1: "negative"}
+    for run in clientsubmission.run:
+        if run.completed_date is None:
+            continue
+        for procedure in run.procedure:
+            for assoc in procedure.proceduresampleassociation:
+                flag = flags.get(assoc.sample.is_control)
+                if flag is not None and flag not in include:
+                    continue
+                yield from assoc.results
+
+
+@pytest.mark.parametrize("include", KINDS)
+def test_same_results_as_the_walk(graph, include):
+    for clientsubmission in graph["submissions"]:
+        expected = sorted(result.id for result in _walked(clientsubmission, include))
+        found = sorted(result.id for result in clientsubmission.get_procedure_sample_results(include=include))
+        assert found == expected
+
+
+def test_many_submissions_in_one_statement(graph):
+    import tools
+    from backend.db.models import ClientSubmission
+    from tools import instrument_engine, reset_performance_summary, track_action
+
+    include = {"positive", "negative", "samples"}
+    submissions = graph["submissions"]
+    expected = sorted(result.id for item in submissions for result in _walked(item, include))
+    assert expected
+    keys = [item.id for item in submissions[:2]] + [item.submitter_plate_id for item in submissions[2:]]
+    graph["session"].expire_all()
+    instrument_engine(tools.ctx.database.engine)
+    reset_performance_summary()
+    with track_action("results") as stats:
+        results = ClientSubmission.query_procedure_sample_results(keys, include=include)
+        sample_ids = [result.sampleprocedureassociation.sample.sample_id for result in results]
+    assert stats.statements == 1
+    assert sorted(result.id for result in results) == expected
+    assert all(sample_ids)
+    assert ClientSubmission.query_procedure_sample_results([]) == []
@@ -0,0 +1,110 @@
+"""
+The background task runner.
+
+``TaskRunner`` queues work on a ``QThreadPool`` and reports back through signals on
+the main thread. The rules it enforces are the ones that keep worker threads safe:
+each task gets its own scoped sessions (removed when it ends), progress and
+cancellation are cooperative, and a cancelled task never delivers a result.
+
+These need a ``QApplication`` and the ``frontend.widgets`` package, so they skip
+where PyQt6-WebEngine is unavailable, like ``test_widgets``.
+"""
+from __future__ import annotations
+
+from threading import Event
+
+import pytest
+
+pytest.importorskip("PyQt6.QtWidgets", reason="PyQt6 is required for the task runner tests")
+pytest.importorskip("PyQt6.QtWebEngineWidgets", reason="PyQt6-WebEngine is required", exc_type=ImportError)
+
+
+@pytest.fixture(scope="module")
+def qapp():
+    from PyQt6.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication(["", "--no-sandbox"])
+
+
+@pytest.fixture()
+def runner(qapp):
+    from frontend.widgets.task_runner import TaskRunner
+
+    runner = TaskRunner(max_threads=1)
+    yield runner
+    runner.cancel_all()
+    runner.wait(5000)
+    qapp.processEvents()
+
+
+def _settle(qapp, runner):
+    runner.wait(5000)
+    # NOTE: Results come back as queued signals; let the event loop deliver them.
+    for _ in range(5):
+        qapp.processEvents()
+
+
+def test_result_is_delivered_on_main_thread(qapp, runner):
+    from threading import current_thread, main_thread
+
+    results = []
+    runner.submit(lambda: current_thread() is main_thread(), on_result=results.append)
+    _settle(qapp, runner)
+    assert results == [False]
+
+
+def test_errors_go_to_on_error(qapp, runner):
+    errors = []
+
+    def _fail():
+        raise ValueError("bad")
+
+    runner.submit(_fail, on_error=errors.append)
+    _settle(qapp, runner)
+    assert [str(e) for e in errors] == ["bad"]
+
+
+def test_progress_and_cancellation(qapp, runner):
+    from tools import report_progress
+
+    started, release = Event(), Event()
+    progress, results, cancelled = [], [], []
+
+    def _work():
+        report_progress(10, "first")
+        started.set()
+        release.wait(5)
+        report_progress(50, "second")
+        return "done"
+
+    task = runner.submit(_work, name="work", on_result=results.append)
+    task.signals.cancelled.connect(lambda: cancelled.append(True))
+    runner.progress.connect(lambda name, value, message: progress.append((name, value, message)))
+    assert started.wait(5)
+    runner.cancel(task)
+    release.set()
+    _settle(qapp, runner)
+    assert results == []
+    assert cancelled == [True]
+    assert ("work", 10, "first") in progress
+
+
+def test_queued_task_can_be_dropped(qapp, runner):
+    release = Event()
+    results = []
+    runner.submit(release.wait, 5)
+    queued = runner.submit(lambda: "never", on_result=results.append)
+    runner.cancel(queued)
+    release.set()
+    _settle(qapp, runner)
+    assert results == []
+    assert not runner.tasks
+
+
+def test_worker_uses_its_own_session(qapp, runner, db):
+    import tools
+
+    sessions = []
+    runner.submit(lambda: sessions.append(tools.ctx.database.session()))
+    _settle(qapp, runner)
+    assert sessions and sessions[0] is not db()